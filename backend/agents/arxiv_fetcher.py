@@ -0,0 +1,139 @@
+import asyncio
+import contextlib
+import time
+import httpx
+import xml.etree.ElementTree as ET
+from datetime import datetime
+from typing import List, Dict, Any, AsyncIterator, Optional
+from ..database.neo4j_client import paper_key
+from ..models.logger import setup_logger
+from ..models.metrics import registry
+
+ARXIV_REQUEST_SECONDS = registry.histogram("arxiv_request_seconds", "arXiv API page request latency", ("outcome",))
+ARXIV_RATE_LIMIT_WAIT_SECONDS = registry.histogram(
+    "arxiv_rate_limit_wait_seconds", "Time spent waiting for the shared arXiv rate limiter"
+)
+
+ATOM_NS = {
+    "atom": "http://www.w3.org/2005/Atom",
+    "opensearch": "http://a9.com/-/spec/opensearch/1.1/",
+}
+
+class ArxivRateLimiter:
+    # arXiv asks API clients for no more than one request every three seconds.
+    # Services shares one instance between its fetchers so concurrent searches queue up
+    # here. The lock binds to the event loop that first waits on it, so an instance
+    # belongs to a single loop; nothing module-level holds one across loops.
+    def __init__(self, min_interval: float = 3.0):
+        self.min_interval = min_interval
+        self._lock = asyncio.Lock()
+        self._last_request = 0.0
+
+    async def wait(self):
+        async with self._lock:
+            delay = self._last_request + self.min_interval - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._last_request = time.monotonic()
+
+class ArxivFetcher:
+    def __init__(self, base_url: str = "http://export.arxiv.org/api/query", page_size: int = 50,
+                 rate_limiter: Optional[ArxivRateLimiter] = None, timeout: float = 30.0,
+                 max_retries: int = 3, client: Optional[httpx.AsyncClient] = None):
+        self.base_url = base_url
+        self.page_size = page_size
+        self.rate_limiter = rate_limiter or ArxivRateLimiter()
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.client = client
+        self.logger = setup_logger(__name__)
+
+    @staticmethod
+    def build_query(topic: str, start_year: int, end_year: int) -> str:
+        # The date range is applied by arXiv, so every page we fetch is already in range
+        return f"({topic}) AND submittedDate:[{start_year}01010000 TO {end_year}12312359]"
+
+    async def fetch(self, topic: str, start_year: int, end_year: int, max_results: int) -> List[Dict[str, Any]]:
+        # Returns up to max_results papers inside the year range, fetching only as many pages as needed
+        # aclosing runs the generator's cleanup (closing a per-call client) as soon as we stop early
+        papers = []
+        page_size = min(self.page_size, max_results)
+        async with contextlib.aclosing(self.iter_papers(topic, start_year, end_year, page_size)) as results:
+            async for paper in results:
+                papers.append(paper)
+                if len(papers) >= max_results:
+                    break
+        return papers
+
+    async def iter_papers(self, topic: str, start_year: int, end_year: int,
+                          page_size: Optional[int] = None) -> AsyncIterator[Dict[str, Any]]:
+        page_size = page_size or self.page_size
+        params = {
+            "search_query": self.build_query(topic, start_year, end_year),
+            "sortBy": "submittedDate",
+            "sortOrder": "descending",
+            "max_results": page_size,
+        }
+
+        # Without a shared client (see Services) each call opens and closes its own
+        client = self.client or httpx.AsyncClient(timeout=self.timeout)
+        try:
+            start = 0
+            while True:
+                feed = await self._fetch_page(client, {**params, "start": start})
+                entries = feed.findall("atom:entry", ATOM_NS)
+                for entry in entries:
+                    paper = self._parse_entry(entry, topic)
+                    # Guard against entries whose published date differs from the submitted range
+                    if start_year <= int(paper["published_date"][:4]) <= end_year:
+                        yield paper
+
+                total = int(feed.findtext("opensearch:totalResults", "0", ATOM_NS))
+                start += len(entries)
+                if not entries or start >= total:
+                    break
+        finally:
+            if self.client is None:
+                await client.aclose()
+
+    async def _fetch_page(self, client: httpx.AsyncClient, params: Dict[str, Any]) -> ET.Element:
+        for attempt in range(self.max_retries + 1):
+            with ARXIV_RATE_LIMIT_WAIT_SECONDS.time():
+                await self.rate_limiter.wait()
+            started = time.perf_counter()
+            try:
+                response = await client.get(self.base_url, params=params)
+                response.raise_for_status()
+                feed = ET.fromstring(response.content)
+                ARXIV_REQUEST_SECONDS.observe(time.perf_counter() - started, outcome="ok")
+                return feed
+            except (httpx.HTTPError, ET.ParseError) as e:
+                ARXIV_REQUEST_SECONDS.observe(time.perf_counter() - started, outcome="error")
+                if attempt == self.max_retries:
+                    raise
+                self.logger.warning(f"arXiv request failed (attempt {attempt + 1}): {e}")
+                await asyncio.sleep(2 ** attempt)
+
+    @staticmethod
+    def _parse_entry(entry: ET.Element, topic: str) -> Dict[str, Any]:
+        published = datetime.fromisoformat(
+            entry.findtext("atom:published", "", ATOM_NS).replace("Z", "+00:00")
+        ).replace(tzinfo=None)
+        entry_id = entry.findtext("atom:id", "", ATOM_NS)
+
+        pdf_url = None
+        for link in entry.findall("atom:link", ATOM_NS):
+            if link.get("title") == "pdf":
+                pdf_url = link.get("href")
+        if pdf_url is None:
+            pdf_url = entry_id.replace("/abs/", "/pdf/")
+
+        return {
+            "id": paper_key({"url": entry_id}),
+            "title": " ".join(entry.findtext("atom:title", "", ATOM_NS).split()),
+            "authors": [author.findtext("atom:name", "", ATOM_NS) for author in entry.findall("atom:author", ATOM_NS)],
+            "abstract": " ".join(entry.findtext("atom:summary", "", ATOM_NS).split()),
+            "published_date": published.isoformat(),
+            "url": pdf_url,
+            "topic": topic
+        }
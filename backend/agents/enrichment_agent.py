@@ -0,0 +1,132 @@
+import asyncio
+import json
+import re
+from datetime import datetime
+from typing import List, Dict, Any, Optional
+from ..models.llm_manager import LLMManager
+from ..models.logger import setup_logger
+
+_JSON_OBJECT = re.compile(r"\{.*\}", re.DOTALL)
+
+class EnrichmentAgent:
+    # Precomputes a summary, keywords and a method/result digest for newly stored
+    # papers in the background, so question-time prompts can use them instead of raw abstracts
+    def __init__(self, llm_manager: LLMManager, db_client, workers: int = 2,
+                 max_queue_size: int = 1000, max_retries: int = 3, retry_delay: float = 2.0):
+        self.llm_manager = llm_manager
+        self.db_client = db_client
+        self.workers = workers
+        self.max_queue_size = max_queue_size
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.logger = setup_logger(__name__)
+
+        self.queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self.enriched = 0
+        self.failed = 0
+        self.dropped = 0
+
+    def start(self):
+        if self._tasks:
+            return
+        self.queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        self.logger.info(f"Started {self.workers} enrichment workers")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    @property
+    def queue_depth(self) -> int:
+        return self.queue.qsize() if self.queue is not None else 0
+
+    async def submit(self, papers: List[Dict[str, Any]]):
+        # Waits for room in the queue, applying backpressure to bulk producers
+        for paper in papers:
+            await self.queue.put(paper)
+
+    async def submit_new(self, papers: List[Dict[str, Any]]) -> int:
+        # Like submit_nowait, but first drops papers the database already has enriched
+        # (fetched results never carry a summary, even for papers stored long ago)
+        enriched = await self.db_client.get_enriched_ids([paper["id"] for paper in papers if paper.get("id")])
+        return self.submit_nowait([paper for paper in papers if paper.get("id") not in enriched])
+
+    def submit_nowait(self, papers: List[Dict[str, Any]]) -> int:
+        # Never blocks the caller; papers that do not fit are dropped and counted
+        pending = [paper for paper in papers if not paper.get("summary")]
+        if self.queue is None:
+            self.dropped += len(pending)
+            return 0
+        queued = 0
+        for paper in pending:
+            try:
+                self.queue.put_nowait(paper)
+                queued += 1
+            except asyncio.QueueFull:
+                self.dropped += 1
+        if queued < len(pending):
+            self.logger.warning(f"Enrichment queue full, queued {queued} of {len(pending)} papers")
+        return queued
+
+    async def _worker(self, worker_id: int):
+        while True:
+            paper = await self.queue.get()
+            try:
+                await self._enrich_with_retry(paper)
+            finally:
+                self.queue.task_done()
+
+    async def _enrich_with_retry(self, paper: Dict[str, Any]):
+        for attempt in range(self.max_retries):
+            try:
+                # Retries bypass the response cache so a malformed answer is not replayed
+                metadata = await self.enrich(paper, use_cache=attempt == 0)
+                await self.db_client.update_paper_metadata(paper["id"], metadata)
+                self.enriched += 1
+                return
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.warning(f"Enrichment of '{paper['title'][:50]}' failed (attempt {attempt + 1}): {e}")
+                if attempt + 1 < self.max_retries:
+                    await asyncio.sleep(self.retry_delay * 2 ** attempt)
+        self.failed += 1
+
+    async def enrich(self, paper: Dict[str, Any], use_cache: bool = True) -> Dict[str, Any]:
+        response = await self.llm_manager.generate_response(self._construct_enrichment_prompt(paper),
+                                                            use_cache=use_cache, task="summary")
+        match = _JSON_OBJECT.search(response)
+        if not match:
+            raise ValueError("model did not return a JSON object")
+        data = json.loads(match.group(0))
+
+        keywords = data.get("keywords") or []
+        if isinstance(keywords, str):
+            keywords = [keyword.strip() for keyword in keywords.split(",")]
+        metadata = {
+            "summary": str(data.get("summary", "")).strip(),
+            "keywords": [str(keyword) for keyword in keywords if keyword],
+            "digest": str(data.get("digest", "")).strip(),
+        }
+        if not metadata["summary"]:
+            raise ValueError("model returned an empty summary")
+        metadata["enriched_at"] = datetime.now().isoformat()
+        return metadata
+
+    @staticmethod
+    def _construct_enrichment_prompt(paper: Dict[str, Any]) -> str:
+        return f"""Read the following research paper abstract and respond with a JSON object only.
+
+Title: {paper['title']}
+Abstract: {paper['abstract']}
+
+The JSON object must have these keys:
+"summary": a 2-3 sentence summary of the paper,
+"keywords": a list of 3-6 keywords,
+"digest": one sentence on the method and one sentence on the main result.
+
+JSON:"""
@@ -1,27 +1,111 @@
-from typing import List, Dict, Any
+import hashlib
+import json
+from typing import List, Dict, Any, AsyncIterator, Callable, Optional
 from datetime import datetime
 from ..models.llm_manager import LLMManager
 
+REVIEW_MODES = ("single", "map_reduce")
+
+class ReviewGenerationError(RuntimeError):
+    pass
+
 class FutureWorksAgent:
-    def __init__(self, llm_manager: LLMManager, db_client):
+    def __init__(self, llm_manager: LLMManager, db_client, mode: str = "map_reduce",
+                 max_papers: int = 50, fan_in: int = 8, max_depth: int = 3):
+        if mode not in REVIEW_MODES:
+            raise ValueError(f"Unknown review mode '{mode}', expected one of {REVIEW_MODES}")
         self.llm_manager = llm_manager
         self.db_client = db_client
+        self.mode = mode
+        # map_reduce settings: how many papers are summarised, how many summaries
+        # each reduce call merges, and how many reduce levels are allowed
+        self.max_papers = max_papers
+        self.fan_in = fan_in
+        self.max_depth = max_depth
 
-    async def generate_review(self, topic: str) -> str:
-        # Get papers for the topic from the last 5 years
-        current_year = datetime.now().year
-        papers = self.db_client.get_papers_by_topic(topic, current_year - 5, current_year)
-        
-        # Reduce context length by limiting the number of papers and abstract size
-        papers = self._reduce_paper_context(papers)
+    async def generate_review(self, topic: str, progress: Optional[Callable[[float], None]] = None) -> str:
+        if self.mode == "map_reduce":
+            return await self.llm_manager.generate_response(await self._map_reduce_prompt(topic, progress))
+
+        papers = await self._get_review_papers(topic)
 
         # Generate a single consolidated review prompt to save time and memory
         review = await self._generate_consolidated_review(topic, papers)
         
         return review
 
+    async def stream_review(self, topic: str) -> AsyncIterator[str]:
+        # The prompt is built before this returns (map and intermediate reduce stages run
+        # to completion), so their errors reach the caller before any response has been
+        # started; the returned iterator only streams the final review
+        if self.mode == "map_reduce":
+            prompt = await self._map_reduce_prompt(topic)
+        else:
+            prompt = self._construct_review_prompt(topic, await self._get_review_papers(topic))
+        return self.llm_manager.stream_response(prompt)
+
+    async def _get_papers(self, topic: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        # Get papers for the topic from the last 5 years
+        current_year = datetime.now().year
+        return await self.db_client.get_papers_by_topic(topic, current_year - 5, current_year, limit=limit)
+
+    async def paper_set_key(self, topic: str) -> str:
+        # Identifies the topic together with the papers a review would currently be built from
+        papers = await self._get_papers(topic, limit=self.max_papers)
+        ids = sorted(paper.get("id") or paper["title"] for paper in papers)
+        return hashlib.sha256(json.dumps([topic, self.mode, ids]).encode("utf-8")).hexdigest()
+
+    async def _get_review_papers(self, topic: str) -> List[Dict[str, Any]]:
+        # Reduce context length by limiting the number of papers and abstract size
+        return self._reduce_paper_context(await self._get_papers(topic))
+
+    async def _map_reduce_prompt(self, topic: str, progress: Optional[Callable[[float], None]] = None) -> str:
+        # progress, when given, is called with the completed fraction of the work
+        report = progress or (lambda fraction: None)
+        papers = await self._get_papers(topic, limit=self.max_papers)
+
+        # Map: one summary per paper, generated concurrently under the LLM concurrency limit
+        # and by the smaller summary model when one is configured.
+        # Prompts depend only on the paper content (not the topic), so the response
+        # cache makes papers seen in an earlier review free.
+        # Papers already summarised by the enrichment stage are not sent to the model again.
+        pending = [paper for paper in papers if not paper.get("summary")]
+        generated = iter(await self.llm_manager.batch_generate([
+            self._construct_summary_prompt(paper) for paper in pending
+        ], task="summary"))
+        summaries = [paper.get("summary") or next(generated) for paper in papers]
+        # An empty summary means the prompt was rejected or failed; leaving the paper
+        # out would silently produce a review of only part of the corpus
+        failed = [paper["title"] for paper, summary in zip(papers, summaries) if not summary.strip()]
+        if failed:
+            raise ReviewGenerationError(f"Could not summarise {len(failed)} of {len(papers)} papers: {failed[:3]}")
+        summaries = [
+            f"{paper['title']} ({paper['published_date'][:4]}): {summary.strip()}"
+            for paper, summary in zip(papers, summaries)
+        ]
+        report(0.6)
+
+        # Reduce: merge groups of fan_in summaries until they fit in one prompt
+        depth = 0
+        while len(summaries) > self.fan_in and depth < self.max_depth:
+            groups = [summaries[i:i + self.fan_in] for i in range(0, len(summaries), self.fan_in)]
+            merged = await self.llm_manager.batch_generate([
+                self._construct_merge_prompt(topic, group) for group in groups
+            ])
+            if not all(summary.strip() for summary in merged):
+                raise ReviewGenerationError(f"Could not merge summaries at reduce level {depth + 1}")
+            summaries = [summary.strip() for summary in merged]
+            depth += 1
+            report(0.6 + 0.3 * depth / self.max_depth)
+
+        report(0.9)
+        return self._construct_final_review_prompt(topic, summaries)
+
     async def _generate_consolidated_review(self, topic: str, papers: List[Dict[str, Any]]) -> str:
-        prompt = f"""Write a concise research review on the topic '{topic}'.
+        return await self.llm_manager.generate_response(self._construct_review_prompt(topic, papers))
+
+    def _construct_review_prompt(self, topic: str, papers: List[Dict[str, Any]]) -> str:
+        return f"""Write a concise research review on the topic '{topic}'.
 Consider the following papers as reference:
 
 {self._format_papers_for_prompt(papers)}
@@ -33,8 +117,42 @@ Focus on:
 4. Possible future research directions.
 
 Review:"""
-        
-        return await self.llm_manager.generate_response(prompt)
+
+    def _construct_summary_prompt(self, paper: Dict[str, Any]) -> str:
+        return f"""Summarize the following paper in 2-3 sentences.
+Mention its approach, key findings and any open challenges.
+
+{self._format_papers_for_prompt([paper])}
+
+Summary:"""
+
+    @staticmethod
+    def _construct_merge_prompt(topic: str, summaries: List[str]) -> str:
+        joined = "\n".join(f"- {summary}" for summary in summaries)
+        return f"""The following are summaries of research papers on '{topic}':
+
+{joined}
+
+Combine them into one short paragraph describing the shared approaches, key findings
+and open challenges. Keep paper titles when referring to specific work.
+
+Combined summary:"""
+
+    @staticmethod
+    def _construct_final_review_prompt(topic: str, summaries: List[str]) -> str:
+        joined = "\n".join(f"- {summary}" for summary in summaries)
+        return f"""Write a concise research review on the topic '{topic}'.
+Base it on the following summaries of recent papers:
+
+{joined}
+
+Focus on:
+1. A brief introduction to the topic.
+2. Major approaches and key findings.
+3. Main challenges faced in the field.
+4. Possible future research directions.
+
+Review:"""
 
     def _reduce_paper_context(self, papers: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         # Limit to 2 papers to reduce context length and memory usage
@@ -1,48 +1,200 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, AsyncIterator, Collection, Optional, Tuple
+from .qa_sessions import QA_TURNS, QASession, SessionStore
 from ..models.llm_manager import LLMManager
+from ..models.logger import setup_logger
+from ..models.retrieval import PassageRetriever
 
 class QAAgent:
-    def __init__(self, llm_manager: LLMManager, db_client):
+    def __init__(self, llm_manager: LLMManager, db_client, max_papers: int = 10,
+                 retriever: Optional[PassageRetriever] = None, top_k: int = 6,
+                 sessions: Optional[SessionStore] = None):
         self.llm_manager = llm_manager
         self.db_client = db_client
+        self.max_papers = max_papers
+        # With a retriever the prompt holds the top_k passages most similar to the
+        # question instead of a truncated abstract of every paper
+        self.retriever = retriever
+        self.top_k = top_k
+        # Questions sent with a session id continue that conversation server-side
+        self.sessions = sessions
+        self.logger = setup_logger(__name__)
 
-    async def answer_question(self, question: str, paper_titles: List[str]) -> str:
-        # Limit to top 3 papers to reduce processing time
-        paper_titles = paper_titles[:3]
-        papers = []
-        for title in paper_titles:
-            paper = self.db_client.get_paper_by_title(title)
-            if paper:
-                papers.append(paper)
+    async def answer_question(self, question: str, paper_titles: List[str],
+                              session_id: Optional[str] = None) -> str:
+        if session_id is not None and self.sessions is not None:
+            return await self._answer_in_session(question, paper_titles, session_id)
 
         # Construct prompt and generate response
-        prompt = self._construct_qa_prompt(question, papers)
+        prompt, papers = await self._prepare_prompt(question, paper_titles)
         response = await self.llm_manager.generate_response(prompt)
         
         # Add citation metadata to the response
         response = self._add_citations(response, papers)
         return response
 
-    def _construct_qa_prompt(self, question: str, papers: List[Dict[str, Any]]) -> str:
-        context = "\n\n".join([
-            f"Paper: {paper['title']}\n"
-            f"Authors: {', '.join(paper['authors'])}\n"
-            # Limit abstract length to 300 characters to optimize context size
-            f"Abstract: {paper['abstract'][:300]}..." if len(paper['abstract']) > 300 else paper['abstract']
-            for paper in papers
-        ])
-        
-        prompt = f"""Based on the following research papers:
+    async def stream_answer(self, question: str, paper_titles: List[str],
+                            session_id: Optional[str] = None) -> AsyncIterator[str]:
+        # Papers (and outside a session the prompt) are resolved before this returns, so a
+        # database error reaches the caller before any response has been started; the
+        # returned iterator only streams the generation
+        if session_id is not None and self.sessions is not None:
+            session = await self._get_session(session_id, paper_titles)
+            return self._stream_in_session(question, session)
+
+        prompt, papers = await self._prepare_prompt(question, paper_titles)
+        return self._stream_tokens(prompt, papers)
+
+    async def _stream_tokens(self, prompt: str, papers: List[Dict[str, Any]]) -> AsyncIterator[str]:
+        tokens = []
+        async for token in self.llm_manager.stream_response(prompt):
+            tokens.append(token)
+            yield token
+
+        # Citations need the finished text, so they are sent as the final chunk
+        response = "".join(tokens)
+        cited = self._add_citations(response, papers)
+        if len(cited) > len(response):
+            yield cited[len(response):]
+
+    async def _answer_in_session(self, question: str, paper_titles: List[str], session_id: str) -> str:
+        session = await self._get_session(session_id, paper_titles)
+        async with session.lock:
+            prompt, context, passages = await self._prepare_session_prompt(session, question)
+            # Session turns skip the response cache: a cached answer carries no Ollama
+            # context, so every follow-up would have to resend the papers
+            response, new_context = await self.llm_manager.generate_with_context(prompt, context=context,
+                                                                                 use_cache=False,
+                                                                                 affinity=session.id)
+            session.record_turn(question, response, new_context, passages, self.sessions.max_context_tokens)
+        return self._add_citations(response, session.papers)
+
+    async def _stream_in_session(self, question: str, session: QASession) -> AsyncIterator[str]:
+        async with session.lock:
+            prompt, context, passages = await self._prepare_session_prompt(session, question)
+            returned = []
+            tokens = []
+            async for token in self.llm_manager.stream_response(prompt, context=context, on_context=returned.append,
+                                                                use_cache=False, affinity=session.id):
+                tokens.append(token)
+                yield token
+            response = "".join(tokens)
+            session.record_turn(question, response, returned[0] if returned else None, passages,
+                                self.sessions.max_context_tokens)
+
+        cited = self._add_citations(response, session.papers)
+        if len(cited) > len(response):
+            yield cited[len(response):]
+
+    async def _get_session(self, session_id: str, paper_titles: List[str]) -> QASession:
+        # Papers are resolved once per session; asking about a different set starts over
+        titles = tuple(paper_titles[:self.max_papers])
+        session = self.sessions.get(session_id)
+        if session is None or session.paper_titles != titles:
+            session = self.sessions.create(session_id, titles, await self._get_papers(list(titles)))
+        return session
+
+    async def _prepare_session_prompt(self, session: QASession, question: str
+                                      ) -> Tuple[str, Optional[List[int]], List[Dict[str, Any]]]:
+        passages = await self._retrieve(question, session.papers)
+        if session.context is not None:
+            # The model's context already holds the papers and earlier turns, so the
+            # prompt is just the question plus any excerpts it has not seen yet
+            QA_TURNS.inc(context="reused")
+            new = [passage for passage in passages or []
+                   if (passage["paper_id"], passage["position"]) not in session.sent_passages]
+            summarized = {paper_id for paper_id, _ in session.sent_passages}
+            excerpts = self._format_passages(session.papers, new, summarized) if new else ""
+            return self._follow_up_prompt(question, excerpts), session.context.tolist(), new
+
+        QA_TURNS.inc(context="new")
+        prompt = self._construct_qa_prompt(question, session.papers, passages, history=list(session.turns))
+        return prompt, None, passages or []
+
+    async def _get_papers(self, paper_titles: List[str]) -> List[Dict[str, Any]]:
+        # All titles are resolved in a single round trip
+        result = await self.db_client.get_papers_by_titles(paper_titles[:self.max_papers])
+        if result["missing"]:
+            self.logger.warning(f"{len(result['missing'])} requested papers not found: {result['missing']}")
+        return result["papers"]
+
+    async def _prepare_prompt(self, question: str, paper_titles: List[str]) -> Tuple[str, List[Dict[str, Any]]]:
+        papers = await self._get_papers(paper_titles)
+        return self._construct_qa_prompt(question, papers, await self._retrieve(question, papers)), papers
+
+    async def _retrieve(self, question: str, papers: List[Dict[str, Any]]) -> Optional[List[Dict[str, Any]]]:
+        if self.retriever is not None and papers:
+            try:
+                return await self.retriever.retrieve(question, papers, k=self.top_k)
+            except Exception as e:
+                self.logger.error(f"Passage retrieval failed, falling back to abstracts: {e}")
+        return None
+
+    def _format_passages(self, papers: List[Dict[str, Any]], passages: List[Dict[str, Any]],
+                         summarized: Collection[str] = ()) -> str:
+        # Passages are grouped per paper, in the order of their best match. Each paper's
+        # enrichment summary and digest come first, unless it is in summarized (already
+        # in the model's context); excerpts alone can miss the paper's overall point.
+        by_id = {paper.get("id") or paper["title"]: paper for paper in papers}
+        grouped: Dict[str, List[Dict[str, Any]]] = {}
+        for passage in passages:
+            grouped.setdefault(passage["paper_id"], []).append(passage)
+
+        sections = []
+        for paper_id, group in grouped.items():
+            paper = by_id.get(paper_id, {})
+            lines = [f"Paper: {group[0]['title']}", f"Authors: {', '.join(paper.get('authors', []))}"]
+            if paper.get("summary") and paper_id not in summarized:
+                lines.append(f"Summary: {paper['summary']}")
+                if paper.get("digest"):
+                    lines.append(f"Method and results: {paper['digest']}")
+            lines.extend(f"Excerpt: {passage['text']}" for passage in sorted(group, key=lambda p: p["position"]))
+            sections.append("\n".join(lines))
+        return "\n\n".join(sections)
+
+    def _construct_qa_prompt(self, question: str, papers: List[Dict[str, Any]],
+                             passages: Optional[List[Dict[str, Any]]] = None,
+                             history: Optional[List[Tuple[str, str]]] = None) -> str:
+        if passages:
+            return self._qa_prompt(question, self._format_passages(papers, passages), history)
+
+        context = "\n\n".join([self._format_paper_context(paper) for paper in papers])
+        return self._qa_prompt(question, context, history)
+
+    @staticmethod
+    def _format_paper_context(paper: Dict[str, Any]) -> str:
+        header = f"Paper: {paper['title']}\nAuthors: {', '.join(paper['authors'])}\n"
+        # Precomputed summaries from the enrichment stage are shorter and denser than abstracts
+        if paper.get('summary'):
+            return header + f"Summary: {paper['summary']}\nMethod and results: {paper.get('digest') or ''}"
+        # Limit abstract length to 300 characters to optimize context size
+        abstract = paper['abstract']
+        return header + f"Abstract: {abstract[:300] + '...' if len(abstract) > 300 else abstract}"
+
+    @staticmethod
+    def _qa_prompt(question: str, context: str, history: Optional[List[Tuple[str, str]]] = None) -> str:
+        # Earlier turns are only spelled out when the model's own context was not kept
+        conversation = "".join(
+            f"Earlier question: {asked}\nEarlier answer: {answer[:500]}\n\n" for asked, answer in history or []
+        )
+        return f"""Based on the following research papers:
 
 {context}
 
-Question: {question}
+{conversation}Question: {question}
+
+Please provide a brief answer, citing specific papers if relevant.
+
+Answer:"""
+
+    @staticmethod
+    def _follow_up_prompt(question: str, excerpts: str) -> str:
+        # Continues the conversation already in the model's context
+        more = f"Additional excerpts from the same papers:\n\n{excerpts}\n\n" if excerpts else ""
+        return f"""{more}Follow-up question: {question}
 
 Please provide a brief answer, citing specific papers if relevant.
 
 Answer:"""
-        
-        return prompt
 
     def _add_citations(self, response: str, papers: List[Dict[str, Any]]) -> str:
         # Add paper references at the end of the response
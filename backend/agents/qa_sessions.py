@@ -0,0 +1,111 @@
+import asyncio
+import threading
+import time
+from array import array
+from collections import OrderedDict, deque
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+from ..models.metrics import registry
+
+QA_TURNS = registry.counter("qa_session_turns_total", "Questions answered in QA sessions", ("context",))
+
+class QASession:
+    # One conversation about a fixed set of papers. context holds the token context
+    # Ollama returned after the last answer (papers, earlier questions and answers),
+    # stored as a 32-bit array rather than a list of ints; when it is missing the next
+    # prompt is rebuilt from the papers and the most recent turns instead.
+    def __init__(self, session_id: str, paper_titles: Tuple[str, ...], papers: List[Dict[str, Any]],
+                 history_turns: int = 4):
+        self.id = session_id
+        self.paper_titles = paper_titles
+        self.papers = papers
+        self.turns: deque = deque(maxlen=history_turns)
+        self.context: Optional[array] = None
+        # Retrieved passages the model has already seen in this context
+        self.sent_passages: Set[Tuple[str, int]] = set()
+        # Turns of one session run one at a time, each continuing from the previous context
+        self.lock = asyncio.Lock()
+        self.last_used = time.monotonic()
+
+    @property
+    def context_tokens(self) -> int:
+        return len(self.context) if self.context is not None else 0
+
+    def record_turn(self, question: str, answer: str, context: Optional[Sequence[int]],
+                    passages: Sequence[Dict[str, Any]] = (), max_context_tokens: Optional[int] = None):
+        self.turns.append((question, answer))
+        if context and (max_context_tokens is None or len(context) <= max_context_tokens):
+            self.context = array("i", context)
+            self.sent_passages.update((passage["paper_id"], passage["position"]) for passage in passages)
+        else:
+            # Too long to keep (or not returned): start over from a rebuilt prompt next turn
+            self.context = None
+            self.sent_passages.clear()
+        self.last_used = time.monotonic()
+
+# In-memory LRU of QA sessions with idle expiry. Memory is bounded by max_sessions
+# times max_context_tokens (4 bytes each) plus the resolved papers of each session.
+class SessionStore:
+    def __init__(self, max_sessions: int = 1000, ttl: float = 1800.0, max_context_tokens: int = 8192,
+                 history_turns: int = 4):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.max_context_tokens = max_context_tokens
+        self.history_turns = history_turns
+        self._sessions: "OrderedDict[str, QASession]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.expired = 0
+        self.evicted = 0
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def _expired(self, session: QASession, now: float) -> bool:
+        return self.ttl is not None and now - session.last_used > self.ttl
+
+    def get(self, session_id: str) -> Optional[QASession]:
+        now = time.monotonic()
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return None
+            if self._expired(session, now):
+                del self._sessions[session_id]
+                self.expired += 1
+                return None
+            session.last_used = now
+            self._sessions.move_to_end(session_id)
+            return session
+
+    def create(self, session_id: str, paper_titles: Tuple[str, ...], papers: List[Dict[str, Any]]) -> QASession:
+        session = QASession(session_id, paper_titles, papers, history_turns=self.history_turns)
+        with self._lock:
+            self._sessions[session_id] = session
+            self._sessions.move_to_end(session_id)
+            self._prune(time.monotonic())
+        return session
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def _prune(self, now: float):
+        # Least recently used sessions go first, so expired ones are at the front
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if self._expired(session, now):
+                self.expired += 1
+            elif len(self._sessions) > self.max_sessions:
+                self.evicted += 1
+            else:
+                break
+            del self._sessions[session_id]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._prune(time.monotonic())
+            return {
+                "sessions": len(self._sessions),
+                "context_tokens": sum(session.context_tokens for session in self._sessions.values()),
+                "expired": self.expired,
+                "evicted": self.evicted,
+            }
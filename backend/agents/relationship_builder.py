@@ -0,0 +1,173 @@
+import asyncio
+import math
+from collections import Counter, defaultdict
+from typing import List, Dict, Any, Optional, Set
+from ..database.neo4j_client import paper_key
+from ..database.search_index import BM25Index, tokenize
+from ..models.logger import setup_logger
+from ..models.metrics import registry
+
+RELATIONS_WRITTEN = registry.counter("relations_written_total", "RELATED_TO edges written")
+RELATION_BUILD_SECONDS = registry.histogram("relation_build_seconds", "Time to compute edges for a batch of papers")
+
+# Contribution of each signal to an edge weight; the weights sum to 1
+SIMILARITY_WEIGHT = 0.6
+AUTHOR_WEIGHT = 0.25
+TOPIC_WEIGHT = 0.15
+MAX_SHARED_AUTHORS = 2  # shared authors beyond this add nothing more
+
+def cosine(a: Counter, b: Counter) -> float:
+    if not a or not b:
+        return 0.0
+    if len(a) > len(b):
+        a, b = b, a
+    dot = sum(count * b[term] for term, count in a.items() if term in b)
+    norm = math.sqrt(sum(v * v for v in a.values())) * math.sqrt(sum(v * v for v in b.values()))
+    return dot / norm if norm else 0.0
+
+def jaccard(a: Set[str], b: Set[str]) -> float:
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+class RelationshipBuilder:
+    # Links newly stored papers to their top_k most related papers at ingestion time,
+    # so related-paper queries are a cheap graph traversal. Candidates come from the
+    # local BM25 index (lexical neighbours) and an author index; each candidate is
+    # scored on term-vector cosine similarity, shared authors and topic overlap.
+    def __init__(self, db_client, search_index: BM25Index, top_k: int = 10, min_weight: float = 0.2,
+                 candidates: int = 50, max_queue_size: int = 100):
+        self.db_client = db_client
+        self.search_index = search_index
+        self.top_k = top_k
+        self.min_weight = min_weight
+        self.candidates = candidates
+        self.max_queue_size = max_queue_size
+        self.logger = setup_logger(__name__)
+
+        self.queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._papers_by_author: Optional[Dict[str, Set[str]]] = None
+        self.dropped = 0
+
+    def start(self):
+        if self._task is not None:
+            return
+        self.queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._task = asyncio.create_task(self._worker())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    @property
+    def queue_depth(self) -> int:
+        return self.queue.qsize() if self.queue is not None else 0
+
+    def submit_nowait(self, papers: List[Dict[str, Any]]) -> bool:
+        # Never blocks the caller; a batch that does not fit is dropped and counted
+        if self.queue is None:
+            self.dropped += len(papers)
+            return False
+        try:
+            self.queue.put_nowait(papers)
+            return True
+        except asyncio.QueueFull:
+            self.dropped += len(papers)
+            self.logger.warning(f"Relationship queue full, dropped {len(papers)} papers")
+            return False
+
+    async def _worker(self):
+        while True:
+            papers = await self.queue.get()
+            try:
+                await self.link(papers)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.error(f"Building relations for {len(papers)} papers failed: {e}")
+            finally:
+                self.queue.task_done()
+
+    async def link(self, papers: List[Dict[str, Any]]) -> int:
+        # Scoring is CPU-bound, so it runs off the event loop; edges are then written in one batch
+        with RELATION_BUILD_SECONDS.time():
+            edges = await asyncio.to_thread(self.compute_edges, papers)
+        if edges:
+            await self.db_client.add_relations(edges)
+            RELATIONS_WRITTEN.inc(len(edges))
+        return len(edges)
+
+    def _author_index(self) -> Dict[str, Set[str]]:
+        # Built from the search index on first use and kept up to date by compute_edges
+        if self._papers_by_author is None:
+            index = defaultdict(set)
+            for doc_id, paper in list(self.search_index.papers.items()):
+                for author in paper.get("authors") or []:
+                    index[author].add(doc_id)
+            self._papers_by_author = index
+        return self._papers_by_author
+
+    def compute_edges(self, papers: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        authors_index = self._author_index()
+        for paper in papers:
+            doc_id = paper_key(paper)
+            for author in paper.get("authors") or []:
+                authors_index[author].add(doc_id)
+
+        edges = {}
+        # Term vectors are recomputed from text, so they are memoised for the batch;
+        # papers in one batch tend to share most of their candidates
+        term_cache: Dict[str, Counter] = {}
+        for paper in papers:
+            doc_id = paper_key(paper)
+            if doc_id is None:
+                continue
+            for edge in self._edges_for(doc_id, paper, authors_index, term_cache):
+                # A pair found from both ends is written once
+                pair = tuple(sorted((edge["source"], edge["target"])))
+                if pair not in edges or edges[pair]["weight"] < edge["weight"]:
+                    edges[pair] = edge
+        return list(edges.values())
+
+    def _term_counts(self, doc_id: str, term_cache: Dict[str, Counter]) -> Counter:
+        if doc_id not in term_cache:
+            term_cache[doc_id] = self.search_index.term_counts(doc_id)
+        return term_cache[doc_id]
+
+    def _edges_for(self, doc_id: str, paper: Dict[str, Any], authors_index: Dict[str, Set[str]],
+                   term_cache: Dict[str, Counter]):
+        candidates = {other["id"] for other in self.search_index.more_like_this(doc_id, limit=self.candidates)}
+        paper_authors = set(paper.get("authors") or [])
+        # Prolific authors can have thousands of papers, so author candidates are capped
+        # like the lexical ones, keeping the papers that share the most authors
+        coauthored = Counter()
+        for author in paper_authors:
+            coauthored.update(authors_index.get(author, ()))
+        coauthored.pop(doc_id, None)
+        candidates.update(other_id for other_id, _ in coauthored.most_common(self.candidates))
+        candidates.discard(doc_id)
+
+        terms = self._term_counts(doc_id, term_cache)
+        topic_terms = set(tokenize(paper.get("topic") or ""))
+        scored = []
+        for other_id in candidates:
+            other = self.search_index.papers.get(other_id)
+            if other is None:
+                continue
+            similarity = cosine(terms, self._term_counts(other_id, term_cache))
+            shared_authors = len(paper_authors & set(other.get("authors") or []))
+            topic_overlap = jaccard(topic_terms, set(tokenize(other.get("topic") or "")))
+            weight = (SIMILARITY_WEIGHT * similarity
+                      + AUTHOR_WEIGHT * min(shared_authors, MAX_SHARED_AUTHORS) / MAX_SHARED_AUTHORS
+                      + TOPIC_WEIGHT * topic_overlap)
+            if weight >= self.min_weight:
+                scored.append({
+                    "source": doc_id,
+                    "target": other_id,
+                    "weight": round(weight, 4),
+                    "similarity": round(similarity, 4),
+                    "shared_authors": shared_authors,
+                })
+        scored.sort(key=lambda edge: edge["weight"], reverse=True)
+        return scored[:self.top_k]
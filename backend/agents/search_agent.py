@@ -1,34 +1,99 @@
-import arxiv
-from typing import List, Dict, Any
-from datetime import datetime
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
+from .arxiv_fetcher import ArxivFetcher
+from .enrichment_agent import EnrichmentAgent
+from .relationship_builder import RelationshipBuilder
+from ..database.search_index import BM25Index
+from ..models.logger import setup_logger
+from ..models.metrics import registry
+
+SEARCH_SECONDS = registry.histogram("search_seconds", "Paper search latency by source", ("source",))
+SEARCH_RESULTS = registry.histogram(
+    "search_results", "Papers returned per search by source", ("source",),
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100)
+)
+
+SEARCH_MODES = ("local_first", "remote", "local")
 
 class SearchAgent:
-    def __init__(self, db_client):
+    def __init__(self, db_client, fetcher: Optional[ArxivFetcher] = None, max_results: int = 5,
+                 search_index: Optional[BM25Index] = None, min_local_results: Optional[int] = None,
+                 enrichment_agent: Optional[EnrichmentAgent] = None,
+                 relationship_builder: Optional[RelationshipBuilder] = None, min_term_share: float = 0.6,
+                 max_tagged: int = 10000):
         self.db_client = db_client
+        self.fetcher = fetcher or ArxivFetcher()
+        self.max_results = max_results
+        self.search_index = search_index
+        # How many local hits are enough to skip arXiv; defaults to the requested result count
+        self.min_local_results = min_local_results
+        # Share of the query's terms a local hit must contain to count as relevant
+        self.min_term_share = min_term_share
+        # (topic, paper id) pairs already linked by this process, so repeating a search
+        # does not run the tagging write again
+        self.max_tagged = max_tagged
+        self._tagged: "OrderedDict[Tuple[str, str], None]" = OrderedDict()
+        self.enrichment_agent = enrichment_agent
+        self.relationship_builder = relationship_builder
+        self.logger = setup_logger(__name__)
+
+    async def search(self, topic: str, start_year: int, end_year: int,
+                     max_results: Optional[int] = None, mode: str = "local_first") -> List[Dict[str, Any]]:
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Unknown search mode '{mode}', expected one of {SEARCH_MODES}")
+        max_results = max_results or self.max_results
+
+        local_papers = []
+        if mode != "remote" and self.search_index is not None:
+            with SEARCH_SECONDS.time(stage="local_search", source="local"):
+                local_papers = await self.search_index.asearch(topic, limit=max_results,
+                                                               start_year=start_year, end_year=end_year,
+                                                               min_term_share=self.min_term_share)
+            SEARCH_RESULTS.observe(len(local_papers), source="local")
+            enough = self.min_local_results or max_results
+            await self._tag_hits(local_papers, topic)
+            if mode == "local" or len(local_papers) >= enough:
+                self.logger.info(f"Answered '{topic}' from local index ({len(local_papers)} papers)")
+                return local_papers
+
+        # Search arXiv for papers submitted within the year range
+        with SEARCH_SECONDS.time(stage="arxiv", source="arxiv"):
+            papers = await self.fetcher.fetch(topic, start_year, end_year, max_results)
+        SEARCH_RESULTS.observe(len(papers), source="arxiv")
+
+        # Store the whole result set in the Neo4j database in one batch
+        if papers:
+            await self.db_client.add_papers(papers)
+            # Summaries and digests are generated in the background, off the request path
+            if self.enrichment_agent is not None:
+                await self.enrichment_agent.submit_new(papers)
+            # Likewise the RELATED_TO edges for the new papers
+            if self.relationship_builder is not None:
+                self.relationship_builder.submit_nowait(papers)
+
+        return self._merge_results(local_papers, papers, max_results)
+
+    async def _tag_hits(self, papers: List[Dict[str, Any]], topic: str):
+        # Relevant hits may be stored under other topics; linking them to this one keeps
+        # topic-keyed reads (pages, timeline, reviews) consistent with the results
+        untagged = [paper["id"] for paper in papers
+                    if paper.get("topic") != topic and (topic, paper["id"]) not in self._tagged]
+        if not untagged:
+            return
+        await self.db_client.tag_papers(untagged, topic)
+        for paper_id in untagged:
+            self._tagged[(topic, paper_id)] = None
+        while len(self._tagged) > self.max_tagged:
+            self._tagged.popitem(last=False)
 
-    async def search(self, topic: str, start_year: int, end_year: int) -> List[Dict[str, Any]]:
-        # Search arXiv for papers
-        search = arxiv.Search(
-            query=topic,
-            max_results=5,
-            sort_by=arxiv.SortCriterion.SubmittedDate
-        )
-
-        papers = []
-        for result in search.results():
-            # Convert to datetime for comparison
-            paper_date = result.published.replace(tzinfo=None)
-            if start_year <= paper_date.year <= end_year:
-                paper_data = {
-                    "title": result.title,
-                    "authors": [author.name for author in result.authors],
-                    "abstract": result.summary,
-                    "published_date": paper_date.isoformat(),
-                    "url": result.pdf_url,
-                    "topic": topic
-                }
-                papers.append(paper_data)
-                # Store in the Neo4j database
-                self.db_client.add_paper(paper_data)
-
-        return papers
+    @staticmethod
+    def _merge_results(local_papers: List[Dict[str, Any]], remote_papers: List[Dict[str, Any]],
+                       max_results: int) -> List[Dict[str, Any]]:
+        # Local hits keep their rank; remote papers fill the remaining slots
+        seen = {paper["id"] for paper in local_papers}
+        merged = list(local_papers)
+        for paper in remote_papers:
+            if paper["id"] not in seen:
+                seen.add(paper["id"])
+                merged.append(paper)
+        return merged[:max_results]
@@ -0,0 +1,209 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from backend.models.logger import setup_logger
+
+ACTIVE_STATUSES = ("queued", "running")
+
+JobHandler = Callable[[Dict[str, Any], Callable[[float], None]], Awaitable[Any]]
+
+# Persistent job queue for long-running work. Jobs live in SQLite so they survive
+# restarts; a bounded pool of asyncio workers executes them. Submitting a job whose
+# dedupe key matches a queued or running job returns that job instead of a new one.
+# SQLite calls made while serving requests run in a thread, off the event loop.
+class JobQueue:
+    def __init__(self, path: str, handlers: Dict[str, JobHandler], workers: int = 1,
+                 max_pending: int = 100):
+        self.path = path
+        self.handlers = handlers
+        self.workers = workers
+        self.max_pending = max_pending
+        self.logger = setup_logger(__name__)
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        # Reentrant so a submit can check for duplicates and insert under one lock
+        self._lock = threading.RLock()
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                dedupe_key TEXT,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL,
+                progress REAL NOT NULL DEFAULT 0,
+                result TEXT,
+                error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_dedupe ON jobs (dedupe_key, status)")
+        self._conn.commit()
+
+        self.queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._running: Dict[str, asyncio.Task] = {}
+        # Progress is written in the background; at most one write per job is in flight
+        # and it always stores the latest value reported
+        self._progress: Dict[str, float] = {}
+        self._progress_writes: Dict[str, asyncio.Task] = {}
+
+    def _execute(self, query: str, params: tuple = ()) -> sqlite3.Cursor:
+        with self._lock:
+            cursor = self._conn.execute(query, params)
+            self._conn.commit()
+            return cursor
+
+    def _update(self, job_id: str, **fields):
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        self._execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+    def start(self):
+        if self._workers:
+            return
+        self.queue = asyncio.Queue()
+        # Jobs interrupted by a restart are picked up again
+        self._execute("UPDATE jobs SET status = 'queued' WHERE status = 'running'")
+        for row in self._execute("SELECT id FROM jobs WHERE status = 'queued' ORDER BY created_at").fetchall():
+            self.queue.put_nowait(row["id"])
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self.logger.info(f"Started {self.workers} job workers ({self.queue.qsize()} jobs pending)")
+
+    async def stop(self):
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    @property
+    def queue_depth(self) -> int:
+        return self.queue.qsize() if self.queue is not None else 0
+
+    async def submit(self, kind: str, payload: Dict[str, Any], dedupe_key: Optional[str] = None) -> Dict[str, Any]:
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind '{kind}'")
+        job, created = await asyncio.to_thread(self._insert, kind, payload, dedupe_key)
+        if created:
+            self.queue.put_nowait(job["id"])
+        return job
+
+    def _insert(self, kind: str, payload: Dict[str, Any], dedupe_key: Optional[str]):
+        # Returns (job, created); the duplicate check and the insert hold the lock together
+        with self._lock:
+            if dedupe_key is not None:
+                row = self._execute(
+                    f"SELECT id FROM jobs WHERE dedupe_key = ? AND status IN {ACTIVE_STATUSES} LIMIT 1",
+                    (dedupe_key,)
+                ).fetchone()
+                if row is not None:
+                    return self._get(row["id"]), False
+
+            if self.queue_depth >= self.max_pending:
+                raise RuntimeError(f"Job queue is full ({self.queue_depth} jobs pending)")
+
+            job_id = uuid.uuid4().hex
+            now = time.time()
+            self._execute(
+                "INSERT INTO jobs (id, kind, dedupe_key, payload, status, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, 'queued', ?, ?)",
+                (job_id, kind, dedupe_key, json.dumps(payload), now, now)
+            )
+            return self._get(job_id), True
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await asyncio.to_thread(self._get, job_id)
+
+    def _get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        row = self._execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+        return job
+
+    async def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = await asyncio.to_thread(self._cancel, job_id)
+        if job is not None and job["status"] == "cancelled":
+            task = self._running.get(job_id)
+            if task is not None:
+                task.cancel()
+        return job
+
+    def _cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._get(job_id)
+            if job is None or job["status"] not in ACTIVE_STATUSES:
+                return job
+            self._update(job_id, status="cancelled")
+            return self._get(job_id)
+
+    async def _worker(self):
+        while True:
+            job_id = await self.queue.get()
+            try:
+                await self._run(job_id)
+            finally:
+                self.queue.task_done()
+
+    def _report_progress(self, job_id: str, progress: float):
+        # Handlers report progress synchronously; the write happens in the background
+        self._progress[job_id] = max(0.0, min(progress, 1.0))
+        if job_id not in self._progress_writes:
+            self._progress_writes[job_id] = asyncio.create_task(self._write_progress(job_id))
+
+    async def _write_progress(self, job_id: str):
+        try:
+            while job_id in self._progress:
+                await asyncio.to_thread(self._update, job_id, progress=self._progress.pop(job_id))
+        except Exception as e:
+            self.logger.warning(f"Could not record progress of job {job_id}: {e}")
+        finally:
+            self._progress_writes.pop(job_id, None)
+
+    async def _finish_progress(self, job_id: str):
+        # Drops unwritten progress and waits for a write in flight, so it cannot land
+        # after the job's final state
+        self._progress.pop(job_id, None)
+        write = self._progress_writes.get(job_id)
+        if write is not None:
+            await asyncio.shield(write)
+
+    async def _run(self, job_id: str):
+        job = await self.get(job_id)
+        if job is None or job["status"] != "queued":
+            return
+        await asyncio.to_thread(self._update, job_id, status="running")
+
+        task = asyncio.create_task(self.handlers[job["kind"]](
+            job["payload"], lambda progress: self._report_progress(job_id, progress)
+        ))
+        self._running[job_id] = task
+        try:
+            result = await task
+            await self._finish_progress(job_id)
+            await asyncio.to_thread(self._update, job_id, status="done", progress=1.0, result=json.dumps(result))
+        except asyncio.CancelledError:
+            if (await asyncio.shield(self.get(job_id)))["status"] != "cancelled":
+                # The worker itself is being stopped; leave the job to be resumed on restart
+                raise
+            self.logger.info(f"Job {job_id} cancelled")
+        except Exception as e:
+            self.logger.error(f"Job {job_id} failed: {e}")
+            await self._finish_progress(job_id)
+            await asyncio.to_thread(self._update, job_id, status="failed", error=str(e))
+        finally:
+            self._running.pop(job_id, None)
+
+    def close(self):
+        self._conn.close()
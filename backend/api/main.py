@@ -1,74 +1,266 @@
-from fastapi import FastAPI, HTTPException
-from typing import List, Dict, Optional
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from fastapi import APIRouter, Depends, FastAPI, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from typing import Any, Callable, List, Optional
 from datetime import datetime
 from pydantic import BaseModel
 import uvicorn
 from config import Config
 
-# Import necessary modules
-from backend.agents.search_agent import SearchAgent
-from backend.agents.qa_agent import QAAgent
-from backend.agents.future_works_agent import FutureWorksAgent
-from backend.database.neo4j_client import Neo4jClient
-from backend.models.llm_manager import LLMManager
+from backend.api.services import Services
+from backend.models.llm_manager import LLMQueueFullError
+from backend.models.metrics import registry, start_request_timing, end_request_timing
 
-# Create a FastAPI app instance
-app = FastAPI()
+HTTP_REQUEST_SECONDS = registry.histogram(
+    "http_request_seconds", "API request latency", ("method", "route", "status")
+)
 
-# Initialize Neo4j client
-db_client = Neo4jClient(Config.NEO4J_URI, Config.NEO4J_USER, Config.NEO4J_PASSWORD)
+router = APIRouter()
 
-# Initialize LLM manager
-llm_manager = LLMManager(Config.MODEL_NAME)
+def get_services(request: Request) -> Services:
+    return request.app.state.services
 
-# Initialize Agents
-search_agent = SearchAgent(db_client)
-qa_agent = QAAgent(llm_manager, db_client)
-future_works_agent = FutureWorksAgent(llm_manager, db_client)
+# Records request latency and, when enabled, a Server-Timing header of per-stage durations
+async def record_request_metrics(request: Request, call_next):
+    token = start_request_timing()
+    started = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        timings = end_request_timing(token)
+    elapsed = time.perf_counter() - started
+
+    route = request.scope.get("route")
+    HTTP_REQUEST_SECONDS.observe(elapsed, method=request.method,
+                                 route=route.path if route else "unmatched", status=response.status_code)
+    if Config.TIMING_HEADERS:
+        timings["total"] = elapsed
+        response.headers["Server-Timing"] = ", ".join(
+            f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in timings.items()
+        )
+    return response
 
 # Define the request models
 class PaperRequest(BaseModel):
     topic: str
     start_year: Optional[int] = None
     end_year: Optional[int] = None
+    max_results: Optional[int] = None
+    mode: str = Config.SEARCH_MODE
 
 class Question(BaseModel):
     text: str
     papers: List[str]  # List of paper IDs or titles
+    session_id: Optional[str] = None  # client-chosen id; follow-ups with the same id continue the chat
 
 # API endpoint to search for papers
-@app.post("/search_papers")
-async def search_papers(request: PaperRequest):
+@router.post("/search_papers")
+async def search_papers(request: PaperRequest, services: Services = Depends(get_services)):
     try:
         # Use the search agent to find papers on a topic
-        papers = await search_agent.search(
+        papers = await services.search_agent.search(
             request.topic,
             request.start_year or datetime.now().year - 5,
-            request.end_year or datetime.now().year
+            request.end_year or datetime.now().year,
+            max_results=request.max_results,
+            mode=request.mode
         )
         return {"papers": papers}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Paginated paper list for a topic, read from the graph rather than re-searching
+@router.get("/papers")
+async def list_papers(topic: str, start_year: Optional[int] = None, end_year: Optional[int] = None,
+                      page: int = Query(1, ge=1), page_size: int = Query(20, ge=1, le=200),
+                      services: Services = Depends(get_services)):
+    try:
+        start_year = start_year or datetime.now().year - 5
+        end_year = end_year or datetime.now().year
+        papers, total = await asyncio.gather(
+            services.db_client.get_papers_by_topic(topic, start_year, end_year,
+                                                   limit=page_size, skip=(page - 1) * page_size),
+            services.db_client.count_papers_by_topic(topic, start_year, end_year)
+        )
+        return {"papers": papers, "total": total, "page": page, "page_size": page_size}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Pre-aggregated paper counts per year or month for the timeline chart
+@router.get("/papers/timeline")
+async def papers_timeline(topic: str, start_year: Optional[int] = None, end_year: Optional[int] = None,
+                          granularity: str = "year", services: Services = Depends(get_services)):
+    try:
+        buckets = await services.db_client.get_topic_timeline(
+            topic,
+            start_year or datetime.now().year - 5,
+            end_year or datetime.now().year,
+            granularity=granularity
+        )
+        return {"buckets": buckets, "granularity": granularity}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Papers within `hops` precomputed RELATED_TO edges of a paper, best scoring first
+@router.get("/papers/related")
+async def related_papers(paper_id: str, hops: int = Query(1, ge=1, le=3), limit: int = Query(20, ge=1, le=100),
+                         services: Services = Depends(get_services)):
+    try:
+        papers = await services.db_client.get_related_papers(paper_id, hops=hops, limit=limit)
+        return {"paper_id": paper_id, "papers": papers}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 # API endpoint to ask a question about papers
-@app.post("/ask_question")
-async def ask_question(question: Question):
+@router.post("/ask_question")
+async def ask_question(question: Question, services: Services = Depends(get_services)):
     try:
         # Use the QA agent to answer the question
-        answer = await qa_agent.answer_question(question.text, question.papers)
-        return {"answer": answer}
+        answer = await services.qa_agent.answer_question(question.text, question.papers, question.session_id)
+        return {"answer": answer, "session_id": question.session_id}
+    except LLMQueueFullError as e:
+        # The model's queue is full: tell the client to retry later
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 # API endpoint to generate a research review
-@app.post("/generate_review")
-async def generate_review(request: PaperRequest):
+@router.post("/generate_review")
+async def generate_review(request: PaperRequest, services: Services = Depends(get_services)):
     try:
         # Use the future works agent to generate a review
-        review = await future_works_agent.generate_review(request.topic)
+        review = await services.future_works_agent.generate_review(request.topic)
         return {"review": review}
+    except LLMQueueFullError as e:
+        # The model's queue is full: tell the client to retry later
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Job API for review generation: submit, poll, fetch the result, cancel.
+# Identical requests for the same topic and paper set share one job.
+@router.post("/jobs/review")
+async def submit_review_job(request: PaperRequest, services: Services = Depends(get_services)):
+    try:
+        dedupe_key = await services.future_works_agent.paper_set_key(request.topic)
+        job = await services.job_queue.submit("review", {"topic": request.topic}, dedupe_key=dedupe_key)
+        return {"job_id": job["id"], "status": job["status"]}
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/jobs/{job_id}")
+async def get_job_status(job_id: str, services: Services = Depends(get_services)):
+    job = await services.job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {"job_id": job["id"], "status": job["status"], "progress": job["progress"], "error": job["error"]}
+
+@router.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: str, services: Services = Depends(get_services)):
+    job = await services.job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["status"] != "done":
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}")
+    return job["result"]
+
+@router.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str, services: Services = Depends(get_services)):
+    job = await services.job_queue.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {"job_id": job["id"], "status": job["status"]}
+
+# Streaming variants: tokens are sent as a chunked text/plain body as soon as
+# Ollama produces them, so clients can render before generation finishes.
+# Papers and prompts are resolved before the response starts, so those errors
+# are a 500. Once the 200 has been sent a failure can only be reported in the
+# body: the stream then ends with STREAM_ERROR_MARKER followed by the error.
+STREAM_ERROR_MARKER = "\n\n[stream error] "
+
+async def guard_stream(chunks):
+    try:
+        async for chunk in chunks:
+            yield chunk
+    except Exception as e:
+        yield STREAM_ERROR_MARKER + (str(e) or type(e).__name__)
+
+@router.post("/ask_question/stream")
+async def ask_question_stream(question: Question, services: Services = Depends(get_services)):
+    try:
+        chunks = await services.qa_agent.stream_answer(question.text, question.papers, question.session_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return StreamingResponse(guard_stream(chunks), media_type="text/plain; charset=utf-8")
+
+# Ends a QA chat session and frees its model context
+@router.delete("/qa_sessions/{session_id}")
+async def end_qa_session(session_id: str, services: Services = Depends(get_services)):
+    if not services.qa_sessions.delete(session_id):
+        raise HTTPException(status_code=404, detail="Session not found")
+    return {"session_id": session_id, "status": "closed"}
+
+@router.post("/generate_review/stream")
+async def generate_review_stream(request: PaperRequest, services: Services = Depends(get_services)):
+    try:
+        chunks = await services.future_works_agent.stream_review(request.topic)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    return StreamingResponse(guard_stream(chunks), media_type="text/plain; charset=utf-8")
+
+# API endpoint exposing LLM response cache counters
+@router.get("/cache_stats")
+async def cache_stats(services: Services = Depends(get_services)):
+    stats = services.response_cache.stats() if services.response_cache else {"enabled": False}
+    if services.paper_cache is not None:
+        stats["paper_cache"] = services.paper_cache.stats()
+    stats["qa_sessions"] = services.qa_sessions.stats()
+    return stats
+
+# Prometheus scrape endpoint
+@router.get("/metrics")
+async def metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+# Liveness only says the process is serving; readiness waits for warm-up
+@router.get("/health/live")
+async def liveness():
+    return {"status": "alive"}
+
+@router.get("/health/ready")
+async def readiness(services: Services = Depends(get_services)):
+    status = "ready" if services.ready else "warming_up"
+    return JSONResponse({"status": status, "checks": services.checks},
+                        status_code=200 if services.ready else 503)
+
+def create_app(db_client_factory: Optional[Callable[[Any], Any]] = None) -> FastAPI:
+    # Dependencies are built and torn down by the lifespan, not at import time
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        services = Services(db_client_factory=db_client_factory)
+        app.state.services = services
+        await services.start()
+        try:
+            yield
+        finally:
+            await services.stop()
+
+    app = FastAPI(lifespan=lifespan)
+    app.middleware("http")(record_request_metrics)
+    app.include_router(router)
+    return app
+
+app = create_app()
 
 # Run the API using Uvicorn
 if __name__ == "__main__":
@@ -0,0 +1,246 @@
+import asyncio
+import os
+import time
+import httpx
+from typing import Any, Callable, Dict, Optional
+from config import Config
+
+from backend.agents.arxiv_fetcher import ArxivFetcher, ArxivRateLimiter
+from backend.agents.enrichment_agent import EnrichmentAgent
+from backend.agents.relationship_builder import RelationshipBuilder
+from backend.agents.search_agent import SearchAgent
+from backend.agents.qa_agent import QAAgent
+from backend.agents.qa_sessions import SessionStore
+from backend.agents.future_works_agent import FutureWorksAgent, ReviewGenerationError
+from backend.api.job_queue import JobQueue
+from backend.database.async_neo4j_client import AsyncNeo4jClient
+from backend.database.paper_cache import CachedNeo4jClient, PaperCache
+from backend.database.search_index import BM25Index
+from backend.models.llm_manager import LLMManager
+from backend.models.llm_router import LLMRouter
+from backend.models.response_cache import ResponseCache
+from backend.models.embeddings import OllamaEncoder
+from backend.models.retrieval import PassageRetriever, VectorIndex
+from backend.models.logger import setup_logger
+from backend.models.metrics import registry
+
+WARMUP_SECONDS = registry.histogram("warmup_seconds", "Time to warm up each dependency at startup", ("component",))
+
+# Everything the API depends on, built from Config when the application starts
+# rather than at import time. start() brings up background workers and kicks off
+# warm-up; the service reports ready once every warm-up step has succeeded.
+class Services:
+    def __init__(self, db_client_factory: Optional[Callable[[BM25Index], Any]] = None):
+        self.logger = setup_logger(__name__)
+
+        # Local full-text index over ingested papers; the saved copy is loaded during
+        # warm-up, since after a bulk import it can take a while to unpickle
+        self.search_index = BM25Index(os.path.join(Config.CACHE_DIR, "search_index.pkl"), load=False)
+
+        # Neo4j client; the factory lets callers substitute another implementation
+        if db_client_factory is not None:
+            self.db_client = db_client_factory(self.search_index)
+        else:
+            self.db_client = AsyncNeo4jClient(
+                Config.NEO4J_URI, Config.NEO4J_USER, Config.NEO4J_PASSWORD,
+                batch_size=Config.NEO4J_BATCH_SIZE,
+                search_index=self.search_index,
+                max_pool_size=Config.NEO4J_MAX_POOL_SIZE,
+                acquisition_timeout=Config.NEO4J_ACQUISITION_TIMEOUT,
+                max_connection_lifetime=Config.NEO4J_MAX_CONNECTION_LIFETIME
+            )
+        # Hot papers and topic queries are served from memory in front of the database
+        self.paper_cache = PaperCache(int(Config.PAPER_CACHE_MAX_MB * 1024 * 1024), ttl=Config.PAPER_CACHE_TTL) \
+            if Config.PAPER_CACHE_ENABLED else None
+        if self.paper_cache is not None:
+            self.db_client = CachedNeo4jClient(self.db_client, self.paper_cache)
+
+        # LLM response cache and manager
+        self.response_cache = ResponseCache(
+            os.path.join(Config.CACHE_DIR, "llm_responses.sqlite3"),
+            max_memory_entries=Config.LLM_CACHE_MEMORY_ENTRIES,
+            max_disk_entries=Config.LLM_CACHE_DISK_ENTRIES,
+            ttl=Config.LLM_CACHE_TTL
+        ) if Config.LLM_CACHE_ENABLED else None
+        self.llm_manager = LLMManager(
+            Config.MODEL_NAME,
+            host=Config.OLLAMA_HOST,
+            max_concurrency=Config.LLM_MAX_CONCURRENCY,
+            max_queue_size=Config.LLM_MAX_QUEUE_SIZE,
+            timeout=Config.LLM_TIMEOUT,
+            cache=self.response_cache,
+            keep_alive=Config.OLLAMA_KEEP_ALIVE,
+            router=LLMRouter(
+                Config.OLLAMA_HOSTS or [Config.OLLAMA_HOST],
+                max_failures=Config.LLM_MAX_FAILURES,
+                eject_seconds=Config.LLM_EJECT_SECONDS,
+                health_check_interval=Config.LLM_HEALTH_CHECK_INTERVAL
+            ),
+            task_models={"summary": Config.SUMMARY_MODEL_NAME}
+        )
+
+        # Passage retrieval for QA
+        self.vector_index = VectorIndex(os.path.join(Config.CACHE_DIR, "passages"),
+                                        memory_map=Config.VECTOR_INDEX_MMAP)
+        self.encoder = OllamaEncoder(Config.EMBEDDING_MODEL, host=Config.OLLAMA_HOST,
+                                     batch_size=Config.EMBEDDING_BATCH_SIZE,
+                                     keep_alive=Config.OLLAMA_KEEP_ALIVE) if Config.RETRIEVAL_ENABLED else None
+        self.retriever = PassageRetriever(self.encoder, self.vector_index) if self.encoder else None
+
+        # Agents
+        self.enrichment_agent = EnrichmentAgent(
+            self.llm_manager,
+            self.db_client,
+            workers=Config.ENRICHMENT_WORKERS,
+            max_queue_size=Config.ENRICHMENT_QUEUE_SIZE
+        ) if Config.ENRICHMENT_ENABLED else None
+        self.relationship_builder = RelationshipBuilder(
+            self.db_client,
+            self.search_index,
+            top_k=Config.RELATIONS_TOP_K,
+            min_weight=Config.RELATIONS_MIN_WEIGHT,
+            candidates=Config.RELATIONS_CANDIDATES
+        ) if Config.RELATIONS_ENABLED else None
+        self.arxiv_rate_limiter = ArxivRateLimiter(Config.ARXIV_MIN_INTERVAL)
+        # One pooled HTTP client for all arXiv requests, so connections are reused across
+        # searches; requests are serialised by the rate limiter, so a small pool is enough
+        self.arxiv_client = httpx.AsyncClient(
+            timeout=30.0, limits=httpx.Limits(max_connections=4, max_keepalive_connections=2)
+        )
+        self.search_agent = SearchAgent(
+            self.db_client,
+            fetcher=ArxivFetcher(Config.ARXIV_API_URL, page_size=Config.ARXIV_PAGE_SIZE,
+                                 rate_limiter=self.arxiv_rate_limiter, client=self.arxiv_client),
+            max_results=Config.SEARCH_MAX_RESULTS,
+            search_index=self.search_index,
+            enrichment_agent=self.enrichment_agent,
+            relationship_builder=self.relationship_builder,
+            min_term_share=Config.SEARCH_MIN_TERM_SHARE
+        )
+        self.qa_sessions = SessionStore(max_sessions=Config.QA_MAX_SESSIONS, ttl=Config.QA_SESSION_TTL,
+                                        max_context_tokens=Config.QA_SESSION_MAX_TOKENS)
+        self.qa_agent = QAAgent(self.llm_manager, self.db_client, max_papers=Config.QA_MAX_PAPERS,
+                                retriever=self.retriever, top_k=Config.QA_TOP_K, sessions=self.qa_sessions)
+        self.future_works_agent = FutureWorksAgent(
+            self.llm_manager,
+            self.db_client,
+            mode=Config.REVIEW_MODE,
+            max_papers=Config.REVIEW_MAX_PAPERS,
+            fan_in=Config.REVIEW_FAN_IN,
+            max_depth=Config.REVIEW_MAX_DEPTH
+        )
+
+        # Long-running review generation runs as background jobs
+        self.job_queue = JobQueue(
+            os.path.join(Config.CACHE_DIR, "jobs.sqlite3"),
+            handlers={"review": self.run_review_job},
+            workers=Config.JOB_WORKERS,
+            max_pending=Config.JOB_MAX_PENDING
+        )
+
+        # Warm-up state reported by the readiness probe
+        self.checks: Dict[str, bool] = {"neo4j": False, "llm": False, "caches": False}
+        if self.encoder is not None:
+            self.checks["embeddings"] = False
+        self._warmup_task: Optional[asyncio.Task] = None
+
+        self._register_gauges()
+
+    def _register_gauges(self):
+        # Metrics owned by other objects are read when /metrics is scraped
+        registry.gauge("queue_depth", "Items waiting in internal queues", ("queue",), callback=lambda: {
+            ("llm",): self.llm_manager.queue_depth,
+            ("jobs",): self.job_queue.queue_depth,
+            ("enrichment",): self.enrichment_agent.queue_depth if self.enrichment_agent else 0,
+            ("relations",): self.relationship_builder.queue_depth if self.relationship_builder else 0,
+        })
+        registry.gauge("llm_in_flight", "LLM generations currently running",
+                       callback=lambda: {(): self.llm_manager.in_flight})
+        registry.gauge("llm_cache_hit_ratio", "LLM response cache hit ratio since start",
+                       callback=lambda: {(): self.response_cache.stats()["hit_rate"]} if self.response_cache else {})
+        registry.gauge("paper_cache_bytes", "Estimated memory held by the paper cache",
+                       callback=lambda: {(): self.paper_cache.bytes} if self.paper_cache else {})
+        registry.gauge("paper_cache_hit_ratio", "Paper cache hit ratio since start",
+                       callback=lambda: {(): self.paper_cache.stats()["hit_rate"]} if self.paper_cache else {})
+        registry.gauge("qa_sessions", "Open QA chat sessions",
+                       callback=lambda: {(): len(self.qa_sessions)})
+        registry.gauge("service_ready", "1 once startup warm-up has completed",
+                       callback=lambda: {(): 1.0 if self.ready else 0.0})
+
+    async def run_review_job(self, payload: Dict, progress) -> Dict:
+        review = await self.future_works_agent.generate_review(payload["topic"], progress=progress)
+        if not review.strip():
+            # Fail the job rather than finish it "done" with nothing to show
+            raise ReviewGenerationError("The model returned an empty review")
+        return {"review": review}
+
+    @property
+    def ready(self) -> bool:
+        return all(self.checks.values())
+
+    async def start(self):
+        self.llm_manager.router.start()
+        self.job_queue.start()
+        if self.enrichment_agent:
+            self.enrichment_agent.start()
+        if self.relationship_builder:
+            self.relationship_builder.start()
+        # Warm-up runs in the background so the process answers liveness probes meanwhile
+        self._warmup_task = asyncio.create_task(self.warm_up())
+
+    async def warm_up(self):
+        steps = {
+            "neo4j": self._warm_neo4j,
+            "llm": self.llm_manager.warm_up,
+            "caches": self._warm_caches,
+        }
+        if self.encoder is not None:
+            steps["embeddings"] = self.encoder.warm_up
+
+        # Failed steps are retried until they succeed, e.g. while Ollama is still starting
+        while not self.ready:
+            pending = [name for name in steps if not self.checks[name]]
+            results = await asyncio.gather(*(self._run_warmup_step(name, steps[name]) for name in pending))
+            for name, ok in zip(pending, results):
+                self.checks[name] = ok
+            if not self.ready:
+                await asyncio.sleep(Config.WARMUP_RETRY_INTERVAL)
+        self.logger.info("Warm-up complete, service is ready")
+
+    async def _run_warmup_step(self, name: str, step: Callable) -> bool:
+        started = time.perf_counter()
+        try:
+            await step()
+        except Exception as e:
+            self.logger.warning(f"Warm-up of {name} failed, will retry: {e}")
+            return False
+        WARMUP_SECONDS.observe(time.perf_counter() - started, component=name)
+        return True
+
+    async def _warm_neo4j(self):
+        await self.db_client.warm_up(Config.NEO4J_WARM_CONNECTIONS)
+        await self.db_client.ensure_schema()
+
+    async def _warm_caches(self):
+        await asyncio.to_thread(self.search_index.preload)
+        if self.response_cache is not None:
+            await asyncio.to_thread(self.response_cache.preload)
+        await asyncio.to_thread(self.vector_index.preload)
+
+    async def stop(self):
+        if self._warmup_task is not None:
+            self._warmup_task.cancel()
+            await asyncio.gather(self._warmup_task, return_exceptions=True)
+        await self.job_queue.stop()
+        self.job_queue.close()
+        if self.enrichment_agent:
+            await self.enrichment_agent.stop()
+        if self.relationship_builder:
+            await self.relationship_builder.stop()
+        await self.llm_manager.router.stop()
+        await self.arxiv_client.aclose()
+        self.search_index.save()
+        self.vector_index.save()
+        if self.response_cache is not None:
+            self.response_cache.close()
+        await self.db_client.close()
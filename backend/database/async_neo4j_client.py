@@ -0,0 +1,214 @@
+import asyncio
+from neo4j import AsyncGraphDatabase
+from typing import List, Dict, Any, Optional, Set
+from .neo4j_client import (
+    NEO4J_QUERY_SECONDS, NEO4J_PAPERS_WRITTEN, SCHEMA_STATEMENTS, MERGE_PAPERS_QUERY, TAG_PAPERS_QUERY,
+    COUNT_PAPERS_BY_TOPIC_QUERY, TOPIC_TIMELINE_QUERY, PAPER_BY_TITLE_QUERY, PAPERS_BY_TITLES_QUERY,
+    ADD_RELATIONS_QUERY, ENRICHED_PAPER_IDS_QUERY, UPDATE_PAPER_METADATA_QUERY, papers_by_topic_query,
+    related_papers_query, related_beam, related_rows, timeline_prefix_length, paper_rows, split_found, summarize_profile
+)
+from ..models.logger import setup_logger
+from ..models.metrics import timed
+
+# Non-blocking counterpart of Neo4jClient for use inside the event loop. Reads go
+# through execute_read and writes through execute_write, so with a neo4j:// URI
+# the driver routes them to readers and the leader respectively; managed
+# transactions are also retried on transient errors.
+class AsyncNeo4jClient:
+    def __init__(self, uri: str, user: str, password: str, batch_size: int = 500, search_index=None,
+                 max_pool_size: int = 100, acquisition_timeout: float = 60.0,
+                 max_connection_lifetime: float = 3600.0):
+        self.driver = AsyncGraphDatabase.driver(
+            uri,
+            auth=(user, password),
+            max_connection_pool_size=max_pool_size,
+            connection_acquisition_timeout=acquisition_timeout,
+            max_connection_lifetime=max_connection_lifetime
+        )
+        self.batch_size = batch_size
+        # Optional local full-text index kept in step with every write
+        self.search_index = search_index
+        self.logger = setup_logger(__name__)
+
+    async def close(self):
+        await self.driver.close()
+
+    async def warm_up(self, connections: int = 1):
+        # Verifies the server is reachable and opens `connections` pooled connections up front
+        await self.driver.verify_connectivity()
+
+        async def ping():
+            async with self.driver.session() as session:
+                result = await session.run("RETURN 1")
+                await result.consume()
+
+        await asyncio.gather(*(ping() for _ in range(connections)))
+
+    async def ensure_schema(self):
+        # Same statements and failure handling as Neo4jClient.ensure_schema
+        async with self.driver.session() as session:
+            for statement in SCHEMA_STATEMENTS:
+                try:
+                    result = await session.run(statement)
+                    await result.consume()
+                except Exception as e:
+                    self.logger.warning(f"Could not apply schema statement '{statement}': {e}")
+
+    async def add_paper(self, paper_data: Dict[str, Any]):
+        await self.add_papers([paper_data])
+
+    @timed(NEO4J_QUERY_SECONDS, stage="neo4j", method="add_papers")
+    async def add_papers(self, papers: List[Dict[str, Any]], batch_size: Optional[int] = None) -> int:
+        rows = paper_rows(papers)
+        batch_size = batch_size or self.batch_size
+        async with self.driver.session() as session:
+            for start in range(0, len(rows), batch_size):
+                await session.execute_write(self._merge_papers, rows[start:start + batch_size])
+
+        NEO4J_PAPERS_WRITTEN.inc(len(rows))
+
+        if self.search_index is not None:
+            # Indexing (and the periodic autosave pickle it may trigger) runs off the event loop
+            await asyncio.to_thread(self.search_index.add_papers, papers)
+        return len(rows)
+
+    @staticmethod
+    async def _merge_papers(tx, rows: List[Dict[str, Any]]):
+        result = await tx.run(MERGE_PAPERS_QUERY, rows=rows)
+        await result.consume()
+
+    @timed(NEO4J_QUERY_SECONDS, stage="neo4j", method="tag_papers")
+    async def tag_papers(self, paper_ids: List[str], topic: str) -> int:
+        if not paper_ids:
+            return 0
+        async with self.driver.session() as session:
+            return await session.execute_write(self._tag_papers, paper_ids, topic)
+
+    @staticmethod
+    async def _tag_papers(tx, paper_ids: List[str], topic: str) -> int:
+        result = await tx.run(TAG_PAPERS_QUERY, paper_ids=paper_ids, topic=topic)
+        record = await result.single()
+        return record["tagged"]
+
+    @timed(NEO4J_QUERY_SECONDS, stage="neo4j", method="get_papers_by_topic")
+    async def get_papers_by_topic(self, topic: str, start_year: int, end_year: int,
+                                  limit: Optional[int] = None, skip: int = 0) -> List[Dict]:
+        async with self.driver.session() as session:
+            return await session.execute_read(self._get_papers_by_topic, topic, start_year, end_year, limit, skip)
+
+    @staticmethod
+    async def _get_papers_by_topic(tx, topic: str, start_year: int, end_year: int,
+                                   limit: Optional[int] = None, skip: int = 0):
+        result = await tx.run(papers_by_topic_query(limit), topic=topic, start_year=start_year,
+                              end_year=end_year, limit=limit, skip=skip)
+        return [dict(record["p"]) async for record in result]
+
+    async def profile_papers_by_topic(self, topic: str, start_year: int, end_year: int,
+                                      limit: Optional[int] = None) -> Dict[str, Any]:
+        async with self.driver.session() as session:
+            result = await session.run("PROFILE " + papers_by_topic_query(limit),
+                                       topic=topic, start_year=start_year, end_year=end_year,
+                                       limit=limit, skip=0)
+            summary = await result.consume()
+        return summarize_profile(summary.profile)
+
+    @timed(NEO4J_QUERY_SECONDS, stage="neo4j", method="count_papers_by_topic")
+    async def count_papers_by_topic(self, topic: str, start_year: int, end_year: int) -> int:
+        async with self.driver.session() as session:
+            return await session.execute_read(self._count_papers_by_topic, topic, start_year, end_year)
+
+    @staticmethod
+    async def _count_papers_by_topic(tx, topic: str, start_year: int, end_year: int) -> int:
+        result = await tx.run(COUNT_PAPERS_BY_TOPIC_QUERY, topic=topic, start_year=start_year, end_year=end_year)
+        record = await result.single()
+        return record["total"]
+
+    @timed(NEO4J_QUERY_SECONDS, stage="neo4j", method="get_topic_timeline")
+    async def get_topic_timeline(self, topic: str, start_year: int, end_year: int,
+                                 granularity: str = "year") -> List[Dict[str, Any]]:
+        length = timeline_prefix_length(granularity)
+        async with self.driver.session() as session:
+            return await session.execute_read(self._get_topic_timeline, topic, start_year, end_year, length)
+
+    @staticmethod
+    async def _get_topic_timeline(tx, topic: str, start_year: int, end_year: int, length: int):
+        result = await tx.run(TOPIC_TIMELINE_QUERY, topic=topic, start_year=start_year, end_year=end_year,
+                              length=length)
+        return [{"period": record["period"], "count": record["count"]} async for record in result]
+
+    @timed(NEO4J_QUERY_SECONDS, stage="neo4j", method="get_paper_by_title")
+    async def get_paper_by_title(self, title: str) -> Optional[Dict[str, Any]]:
+        async with self.driver.session() as session:
+            return await session.execute_read(self._get_paper_by_title, title)
+
+    @staticmethod
+    async def _get_paper_by_title(tx, title: str) -> Optional[Dict[str, Any]]:
+        result = await tx.run(PAPER_BY_TITLE_QUERY, title=title)
+        record = await result.single()
+        return record.data() if record else None
+
+    @timed(NEO4J_QUERY_SECONDS, stage="neo4j", method="get_papers_by_titles")
+    async def get_papers_by_titles(self, titles: List[str]) -> Dict[str, Any]:
+        if not titles:
+            return {"papers": [], "missing": []}
+        async with self.driver.session() as session:
+            found = await session.execute_read(self._get_papers_by_titles, titles)
+        return split_found(titles, found)
+
+    @staticmethod
+    async def _get_papers_by_titles(tx, titles: List[str]) -> Dict[int, Dict[str, Any]]:
+        result = await tx.run(PAPERS_BY_TITLES_QUERY, titles=titles)
+        return {record["index"]: {key: record[key] for key in record.keys() if key != "index"}
+                async for record in result}
+
+    @timed(NEO4J_QUERY_SECONDS, stage="neo4j", method="add_relations")
+    async def add_relations(self, edges: List[Dict[str, Any]], batch_size: Optional[int] = None) -> int:
+        batch_size = batch_size or self.batch_size
+        async with self.driver.session() as session:
+            for start in range(0, len(edges), batch_size):
+                await session.execute_write(self._add_relations, edges[start:start + batch_size])
+        return len(edges)
+
+    @staticmethod
+    async def _add_relations(tx, rows: List[Dict[str, Any]]):
+        result = await tx.run(ADD_RELATIONS_QUERY, rows=rows)
+        await result.consume()
+
+    @timed(NEO4J_QUERY_SECONDS, stage="neo4j", method="get_related_papers")
+    async def get_related_papers(self, paper_id: str, hops: int = 1, limit: int = 20) -> List[Dict[str, Any]]:
+        query = related_papers_query(hops)
+        async with self.driver.session() as session:
+            return await session.execute_read(self._get_related_papers, query, paper_id, limit)
+
+    @staticmethod
+    async def _get_related_papers(tx, query: str, paper_id: str, limit: int):
+        result = await tx.run(query, paper_id=paper_id, limit=limit, beam=related_beam(limit))
+        return related_rows([record async for record in result])
+
+    @timed(NEO4J_QUERY_SECONDS, stage="neo4j", method="get_enriched_ids")
+    async def get_enriched_ids(self, paper_ids: List[str]) -> Set[str]:
+        if not paper_ids:
+            return set()
+        async with self.driver.session() as session:
+            return await session.execute_read(self._get_enriched_ids, paper_ids)
+
+    @staticmethod
+    async def _get_enriched_ids(tx, paper_ids: List[str]) -> Set[str]:
+        result = await tx.run(ENRICHED_PAPER_IDS_QUERY, paper_ids=paper_ids)
+        return {record["id"] async for record in result}
+
+    @timed(NEO4J_QUERY_SECONDS, stage="neo4j", method="update_paper_metadata")
+    async def update_paper_metadata(self, paper_id: str, metadata: Dict[str, Any]):
+        async with self.driver.session() as session:
+            await session.execute_write(self._update_paper_metadata, paper_id, metadata)
+
+    @staticmethod
+    async def _update_paper_metadata(tx, paper_id: str, metadata: Dict[str, Any]):
+        result = await tx.run(UPDATE_PAPER_METADATA_QUERY, paper_id=paper_id, metadata=metadata)
+        await result.consume()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
@@ -0,0 +1,292 @@
+import argparse
+import gzip
+import json
+import os
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+from config import Config
+from .neo4j_client import Neo4jClient
+from .search_index import BM25Index
+from ..agents.relationship_builder import RelationshipBuilder
+from ..models.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+DEFAULT_BATCH_SIZE = 5000
+PROGRESS_INTERVAL = 10.0  # seconds between progress log lines
+RELATIONS_BATCH_SIZE = 500  # papers whose edges are computed and written together
+
+def _open_snapshot(path: str):
+    # Binary mode so offsets are exact byte positions that can be seeked to on resume
+    return gzip.open(path, "rb") if path.endswith(".gz") else open(path, "rb")
+
+def read_snapshot(path: str, offset: int = 0) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    # Streams (offset after the line, record) pairs from an arXiv metadata snapshot
+    # in JSON Lines format; only one line is held in memory at a time
+    with _open_snapshot(path) as f:
+        f.seek(offset)
+        for line in f:
+            offset += len(line)
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield offset, json.loads(line)
+            except json.JSONDecodeError as e:
+                logger.warning(f"Skipping malformed line ending at byte {offset}: {e}")
+
+def _published(record: Dict[str, Any]) -> Optional[datetime]:
+    # First version's submission time, which is what the arXiv API reports as published
+    versions = record.get("versions") or []
+    if versions and versions[0].get("created"):
+        try:
+            return parsedate_to_datetime(versions[0]["created"]).replace(tzinfo=None)
+        except (TypeError, ValueError):
+            pass
+    if record.get("update_date"):
+        try:
+            return datetime.fromisoformat(record["update_date"])
+        except ValueError:
+            pass
+    return None
+
+def _authors(record: Dict[str, Any]) -> List[str]:
+    # authors_parsed holds [last, first, suffix]; the API gives "First Last Suffix"
+    parsed = record.get("authors_parsed")
+    if parsed:
+        return [" ".join(part for part in (first, last, *suffix) if part)
+                for last, first, *suffix in parsed]
+    authors = (record.get("authors") or "").replace(" and ", ", ")
+    return [name.strip() for name in authors.split(",") if name.strip()]
+
+def matches_categories(record: Dict[str, Any], categories: Sequence[str]) -> bool:
+    # A filter matches exactly ("cs.LG") or a whole archive ("cs" matches "cs.LG")
+    if not categories:
+        return True
+    return any(category == wanted or category.startswith(wanted + ".")
+               for category in (record.get("categories") or "").split() for wanted in categories)
+
+def parse_topic_map(spec: Optional[str]) -> Dict[str, str]:
+    # "cs.LG=machine learning,cs.CL=natural language processing" -> {category: topic}
+    topic_map = {}
+    for pair in (spec or "").split(","):
+        if not pair.strip():
+            continue
+        category, separator, topic = pair.partition("=")
+        if not separator or not category.strip() or not topic.strip():
+            raise ValueError(f"Expected CATEGORY=TOPIC, got '{pair.strip()}'")
+        topic_map[category.strip()] = topic.strip()
+    return topic_map
+
+def record_topic(categories: Sequence[str], topic: Optional[str] = None,
+                 topic_map: Optional[Dict[str, str]] = None) -> Optional[str]:
+    # The first of the paper's categories (or their archives) found in topic_map wins,
+    # then the explicit topic, then the primary category code itself
+    for category in categories:
+        for key in (category, category.split(".")[0]):
+            if topic_map and key in topic_map:
+                return topic_map[key]
+    return topic or (categories[0] if categories else None)
+
+def normalize_record(record: Dict[str, Any], topic: Optional[str] = None,
+                     topic_map: Optional[Dict[str, str]] = None) -> Optional[Dict[str, Any]]:
+    # Same shape as ArxivFetcher produces, so imported and searched papers share ids.
+    # The stored topic is chosen by record_topic.
+    arxiv_id = record.get("id")
+    published = _published(record)
+    if not arxiv_id or published is None:
+        return None
+    categories = (record.get("categories") or "").split()
+    return {
+        "id": arxiv_id,
+        "title": " ".join((record.get("title") or "").split()),
+        "authors": _authors(record),
+        "abstract": " ".join((record.get("abstract") or "").split()),
+        "published_date": published.isoformat(),
+        "url": f"http://arxiv.org/pdf/{arxiv_id}",
+        "topic": record_topic(categories, topic, topic_map)
+    }
+
+def load_checkpoint(path: Optional[str], snapshot: str) -> Dict[str, Any]:
+    if path and os.path.exists(path):
+        with open(path) as f:
+            checkpoint = json.load(f)
+        if checkpoint.get("snapshot") == os.path.abspath(snapshot):
+            return checkpoint
+        logger.warning(f"Checkpoint {path} belongs to another snapshot, starting from the beginning")
+    return {"snapshot": os.path.abspath(snapshot), "offset": 0, "read": 0, "imported": 0}
+
+def save_checkpoint(path: Optional[str], checkpoint: Dict[str, Any]):
+    if not path:
+        return
+    # Written to a temporary file first so an interruption never leaves a half-written checkpoint
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, path)
+
+def import_snapshot(client, path: str, categories: Sequence[str] = (), start_date: Optional[str] = None,
+                    end_date: Optional[str] = None, topic: Optional[str] = None,
+                    batch_size: int = DEFAULT_BATCH_SIZE, checkpoint_path: Optional[str] = None,
+                    limit: Optional[int] = None, topic_map: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    # Streams the snapshot into the graph through client.add_papers, one batch at a time.
+    # The next batch is parsed while the previous one is being written; the checkpoint
+    # only advances past a batch once its write has succeeded, so a resumed run never
+    # skips papers (at worst the last batch is merged again, which is idempotent).
+    # Dates are compared as ISO strings, so "2019" or "2019-06-01" both work as bounds.
+    checkpoint = load_checkpoint(checkpoint_path, path)
+    if checkpoint["offset"]:
+        logger.info(f"Resuming {path} at byte {checkpoint['offset']} "
+                    f"({checkpoint['imported']} papers already imported)")
+
+    started = last_report = time.monotonic()
+    read = imported = 0
+    batch: List[Dict[str, Any]] = []
+    pending: Optional[Tuple[Future, int, int, int]] = None
+
+    def settle():
+        # Waits for the in-flight write and moves the checkpoint past it
+        nonlocal pending
+        if pending is None:
+            return
+        future, offset, batch_read, batch_imported = pending
+        pending = None
+        future.result()
+        checkpoint["offset"] = offset
+        checkpoint["read"] += batch_read
+        checkpoint["imported"] += batch_imported
+        save_checkpoint(checkpoint_path, checkpoint)
+
+    def report(final: bool = False):
+        elapsed = max(time.monotonic() - started, 1e-9)
+        logger.info(f"{'Imported' if final else 'Importing'}: {read} rows read ({read / elapsed:.0f} rows/s), "
+                    f"{imported} papers written ({imported / elapsed:.0f} papers/s)")
+
+    with ThreadPoolExecutor(max_workers=1) as writer:
+        batch_read = 0
+        try:
+            for offset, record in read_snapshot(path, checkpoint["offset"]):
+                read += 1
+                batch_read += 1
+                if matches_categories(record, categories):
+                    paper = normalize_record(record, topic, topic_map)
+                    if paper is not None and (not start_date or paper["published_date"] >= start_date) \
+                            and (not end_date or paper["published_date"][:len(end_date)] <= end_date):
+                        batch.append(paper)
+
+                if len(batch) >= batch_size:
+                    settle()
+                    pending = (writer.submit(client.add_papers, batch, batch_size), offset, batch_read, len(batch))
+                    imported += len(batch)
+                    batch, batch_read = [], 0
+                if time.monotonic() - last_report >= PROGRESS_INTERVAL:
+                    report()
+                    last_report = time.monotonic()
+                if limit is not None and imported + len(batch) >= limit:
+                    break
+
+            settle()
+            if batch or batch_read:
+                client.add_papers(batch, batch_size)
+                imported += len(batch)
+                checkpoint["offset"] = offset
+                checkpoint["read"] += batch_read
+                checkpoint["imported"] += len(batch)
+                save_checkpoint(checkpoint_path, checkpoint)
+        finally:
+            # On interruption the write already in flight is still recorded if it succeeds
+            if pending is not None:
+                try:
+                    settle()
+                except Exception as e:
+                    logger.error(f"Last batch before interruption failed: {e}")
+
+    report(final=True)
+    elapsed = time.monotonic() - started
+    return {"read": read, "imported": imported, "seconds": elapsed,
+            "rows_per_second": read / elapsed if elapsed else 0.0, "offset": checkpoint["offset"]}
+
+def link_papers(client, builder: RelationshipBuilder, batch_size: int = RELATIONS_BATCH_SIZE) -> int:
+    # Offline counterpart of the API's ingestion-time linking, which never sees bulk-imported
+    # papers: computes RELATED_TO edges for every paper in the builder's search index and
+    # writes them through client.add_relations. Edges are merged, so rerunning is harmless.
+    started = last_report = time.monotonic()
+    papers = list(builder.search_index.papers.values())
+    linked = written = 0
+    for start in range(0, len(papers), batch_size):
+        edges = builder.compute_edges(papers[start:start + batch_size])
+        if edges:
+            client.add_relations(edges)
+        linked += len(papers[start:start + batch_size])
+        written += len(edges)
+        if time.monotonic() - last_report >= PROGRESS_INTERVAL:
+            logger.info(f"Linking: {linked} of {len(papers)} papers, {written} edges written")
+            last_report = time.monotonic()
+    logger.info(f"Linked {linked} papers with {written} edges in {time.monotonic() - started:.0f}s")
+    return written
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream an arXiv metadata snapshot (JSON Lines) into Neo4j")
+    parser.add_argument("snapshot", help="Path to arxiv-metadata-oai-snapshot.json, optionally gzipped")
+    parser.add_argument("--categories", default="",
+                        help="Comma-separated categories or archives to keep, e.g. cs.LG,cs.CL,stat")
+    parser.add_argument("--from-date", help="Earliest published date to keep (YYYY, YYYY-MM or YYYY-MM-DD)")
+    parser.add_argument("--to-date", help="Latest published date to keep (YYYY, YYYY-MM or YYYY-MM-DD)")
+    parser.add_argument("--topic", help="Topic for papers not matched by --topic-map; defaults to the paper's "
+                                        "primary category code, which topic-keyed API reads will not match")
+    parser.add_argument("--topic-map", help="Comma-separated CATEGORY=TOPIC pairs, e.g. "
+                                            "'cs.LG=machine learning,cs.CL=natural language processing'; "
+                                            "an archive such as 'stat' covers all its categories")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Papers per transaction")
+    parser.add_argument("--checkpoint", help="Checkpoint file; defaults to <snapshot>.checkpoint")
+    parser.add_argument("--restart", action="store_true", help="Ignore an existing checkpoint")
+    parser.add_argument("--limit", type=int, help="Stop after importing this many papers")
+    parser.add_argument("--search-index", action="store_true",
+                        help="Also add the papers to the local search index used by the API. The index "
+                             "is in memory (a few KB per paper, here and in the API, which loads it during "
+                             "warm-up), so only use it for imports of up to a few hundred thousand papers")
+    parser.add_argument("--relations", action="store_true",
+                        help="After the import, link every paper in the search index to its related papers "
+                             "(RELATED_TO edges). The API only links papers it ingests itself, so without "
+                             "this bulk-imported papers have no related papers. Requires --search-index")
+    args = parser.parse_args()
+    if args.relations and not args.search_index:
+        parser.error("--relations needs --search-index, which supplies the candidate papers")
+
+    checkpoint_path = args.checkpoint or args.snapshot + ".checkpoint"
+    if args.restart and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
+    # Unlike the graph write, the search index is not streamed: every imported paper stays in
+    # memory until it is pickled once at the end (autosave would re-pickle a growing index)
+    search_index = BM25Index(os.path.join(Config.CACHE_DIR, "search_index.pkl"),
+                             autosave_interval=float("inf")) if args.search_index else None
+    categories = [category.strip() for category in args.categories.split(",") if category.strip()]
+    try:
+        topic_map = parse_topic_map(args.topic_map)
+    except ValueError as e:
+        parser.error(str(e))
+
+    with Neo4jClient(Config.NEO4J_URI, Config.NEO4J_USER, Config.NEO4J_PASSWORD,
+                     batch_size=args.batch_size, search_index=search_index) as client:
+        client.ensure_schema()
+        try:
+            import_snapshot(client, args.snapshot, categories=categories, start_date=args.from_date,
+                            end_date=args.to_date, topic=args.topic, batch_size=args.batch_size,
+                            checkpoint_path=checkpoint_path, limit=args.limit, topic_map=topic_map)
+        except KeyboardInterrupt:
+            logger.info(f"Interrupted; rerun the same command to resume from {checkpoint_path}")
+            return
+        finally:
+            if search_index is not None:
+                search_index.save()
+        if args.relations:
+            link_papers(client, RelationshipBuilder(client, search_index, top_k=Config.RELATIONS_TOP_K,
+                                                    min_weight=Config.RELATIONS_MIN_WEIGHT,
+                                                    candidates=Config.RELATIONS_CANDIDATES))
+
+if __name__ == "__main__":
+    main()
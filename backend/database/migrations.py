@@ -0,0 +1,124 @@
+import argparse
+from datetime import datetime
+from typing import Dict
+from config import Config
+from .neo4j_client import Neo4jClient, paper_key
+from ..models.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+def backfill_paper_ids(client: Neo4jClient, batch_size: int = 1000) -> int:
+    # Papers created before add_papers existed have no id; derive it the same way add_papers does
+    with client.driver.session() as session:
+        rows = session.run("""
+            MATCH (p:Paper) WHERE p.id IS NULL
+            RETURN elementId(p) AS element_id, p.url AS url, p.title AS title
+        """).data()
+
+        updates = [
+            {"element_id": row["element_id"], "id": paper_key({"url": row["url"], "title": row["title"]})}
+            for row in rows
+        ]
+        updates = [update for update in updates if update["id"] is not None]
+        for start in range(0, len(updates), batch_size):
+            session.run("""
+                UNWIND $rows AS row
+                MATCH (p:Paper) WHERE elementId(p) = row.element_id
+                SET p.id = row.id
+            """, rows=updates[start:start + batch_size]).consume()
+
+    logger.info(f"Backfilled ids on {len(updates)} papers")
+    return len(updates)
+
+def dedupe_papers(client: Neo4jClient) -> Dict[str, int]:
+    # Keeps one Paper node per id and deletes the rest; the kept node is linked to
+    # every topic the duplicates were stored under, so no topic loses the paper
+    backfilled = backfill_paper_ids(client)
+    with client.driver.session() as session:
+        record = session.run("""
+            MATCH (p:Paper) WHERE p.id IS NOT NULL
+            WITH p.id AS id, collect(p) AS nodes
+            WHERE size(nodes) > 1
+            WITH head(nodes) AS keep, tail(nodes) AS duplicates
+            UNWIND duplicates AS duplicate
+            OPTIONAL MATCH (duplicate)-[:HAS_TOPIC]->(linked:Topic)
+            WITH keep, duplicate, collect(linked.name) + [duplicate.topic, keep.topic] AS names
+            FOREACH (name IN [name IN names WHERE name IS NOT NULL] |
+                MERGE (topic:Topic {name: name})
+                MERGE (keep)-[:HAS_TOPIC]->(topic))
+            DETACH DELETE duplicate
+            RETURN count(duplicate) AS removed
+        """).single()
+
+    removed = record["removed"] if record else 0
+    logger.info(f"Removed {removed} duplicate papers")
+    return {"backfilled": backfilled, "removed": removed}
+
+def backfill_paper_years(client: Neo4jClient, batch_size: int = 10000) -> int:
+    # Stores the integer year used by the topic queries' year range on papers written before it existed
+    with client.driver.session() as session:
+        record = session.run("""
+            MATCH (p:Paper)
+            WHERE p.year IS NULL AND p.published_date IS NOT NULL
+            CALL {
+                WITH p
+                SET p.year = toInteger(substring(p.published_date, 0, 4))
+            } IN TRANSACTIONS OF $batch_size ROWS
+            RETURN count(p) AS updated
+        """, batch_size=batch_size).single()
+
+    updated = record["updated"] if record else 0
+    logger.info(f"Backfilled year on {updated} papers")
+    return updated
+
+def backfill_paper_topics(client: Neo4jClient, batch_size: int = 10000) -> int:
+    # Papers written before topics were HAS_TOPIC edges only carry the topic property
+    with client.driver.session() as session:
+        record = session.run("""
+            MATCH (p:Paper)
+            WHERE p.topic IS NOT NULL AND NOT (p)-[:HAS_TOPIC]->(:Topic {name: p.topic})
+            CALL {
+                WITH p
+                MERGE (t:Topic {name: p.topic})
+                MERGE (p)-[:HAS_TOPIC]->(t)
+            } IN TRANSACTIONS OF $batch_size ROWS
+            RETURN count(p) AS linked
+        """, batch_size=batch_size).single()
+
+    linked = record["linked"] if record else 0
+    logger.info(f"Linked {linked} papers to their topic")
+    return linked
+
+def migrate_schema(client: Neo4jClient) -> Dict[str, int]:
+    # Duplicates must be gone before the unique constraint can be created
+    counts = dedupe_papers(client)
+    counts["years"] = backfill_paper_years(client)
+    counts["topics"] = backfill_paper_topics(client)
+    client.ensure_schema()
+    return counts
+
+def check_query_plan(client: Neo4jClient, topic: str) -> bool:
+    current_year = datetime.now().year
+    profile = client.profile_papers_by_topic(topic, current_year - 5, current_year)
+    logger.info(f"get_papers_by_topic plan: {' <- '.join(profile['operators'])} ({profile['db_hits']} db hits)")
+    if not profile["uses_index"]:
+        logger.warning("get_papers_by_topic is not using an index; run the 'schema' migration")
+    return profile["uses_index"]
+
+def main():
+    parser = argparse.ArgumentParser(description="One-off Neo4j data migrations")
+    parser.add_argument("migration", choices=["dedupe", "schema", "check-plan"])
+    parser.add_argument("--topic", default="machine learning", help="Topic used by check-plan")
+    args = parser.parse_args()
+
+    with Neo4jClient(Config.NEO4J_URI, Config.NEO4J_USER, Config.NEO4J_PASSWORD) as client:
+        if args.migration == "dedupe":
+            dedupe_papers(client)
+        elif args.migration == "schema":
+            migrate_schema(client)
+        elif args.migration == "check-plan":
+            if not check_query_plan(client, args.topic):
+                raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,91 +1,412 @@
+import re
 from neo4j import GraphDatabase
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Set
+from ..models.logger import setup_logger
+from ..models.metrics import registry, timed
+
+NEO4J_QUERY_SECONDS = registry.histogram(
+    "neo4j_query_seconds", "Time spent in Neo4j client methods, including session and transaction", ("method",)
+)
+NEO4J_PAPERS_WRITTEN = registry.counter("neo4j_papers_written_total", "Papers upserted into Neo4j")
+
+PAPER_FIELDS = ("title", "authors", "abstract", "published_date", "url")
+
+SCHEMA_STATEMENTS = (
+    "CREATE CONSTRAINT paper_id_unique IF NOT EXISTS FOR (p:Paper) REQUIRE p.id IS UNIQUE",
+    "CREATE CONSTRAINT topic_name_unique IF NOT EXISTS FOR (t:Topic) REQUIRE t.name IS UNIQUE",
+    "CREATE RANGE INDEX paper_year IF NOT EXISTS FOR (p:Paper) ON (p.year)",
+    "CREATE RANGE INDEX paper_title IF NOT EXISTS FOR (p:Paper) ON (p.title)",
+)
+
+_INDEX_OPERATORS = ("NodeIndexSeek", "NodeUniqueIndexSeek", "NodeIndexSeekByRange", "NodeIndexScan")
+
+_ARXIV_ID_PATTERN = re.compile(r"arxiv\.org/(?:abs|pdf)/(.+?)(?:v\d+)?(?:\.pdf)?$")
+
+TIMELINE_GRANULARITIES = {"year": 4, "month": 7}
+
+# Cypher shared by Neo4jClient and AsyncNeo4jClient
+# A paper can be found under several topics; each one is a HAS_TOPIC edge, so a
+# later search never moves the paper out of an earlier topic. p.topic keeps the
+# topic the paper was first stored under.
+MERGE_PAPERS_QUERY = """
+UNWIND $rows AS row
+MERGE (p:Paper {id: row.id})
+ON CREATE SET p.topic = row.topic
+SET p += row.props
+WITH p, row
+WHERE row.topic IS NOT NULL
+MERGE (t:Topic {name: row.topic})
+MERGE (p)-[:HAS_TOPIC]->(t)
+"""
+
+# Returns how many papers were newly linked, so callers can tell whether anything changed
+TAG_PAPERS_QUERY = """
+MERGE (t:Topic {name: $topic})
+WITH t
+UNWIND $paper_ids AS paper_id
+MATCH (p:Paper {id: paper_id})
+WHERE NOT (p)-[:HAS_TOPIC]->(t)
+MERGE (p)-[:HAS_TOPIC]->(t)
+RETURN count(p) AS tagged
+"""
+
+# The topic is found through the topic_name_unique index and its papers by
+# following HAS_TOPIC edges; the year range is then a filter on those papers
+PAPERS_BY_TOPIC_QUERY = """
+MATCH (:Topic {name: $topic})<-[:HAS_TOPIC]-(p:Paper)
+WHERE p.year >= $start_year
+AND p.year <= $end_year
+RETURN p
+ORDER BY p.published_date DESC
+SKIP $skip
+"""
+
+COUNT_PAPERS_BY_TOPIC_QUERY = """
+MATCH (:Topic {name: $topic})<-[:HAS_TOPIC]-(p:Paper)
+WHERE p.year >= $start_year
+AND p.year <= $end_year
+RETURN count(p) AS total
+"""
+
+TOPIC_TIMELINE_QUERY = """
+MATCH (:Topic {name: $topic})<-[:HAS_TOPIC]-(p:Paper)
+WHERE p.year >= $start_year
+AND p.year <= $end_year
+WITH substring(p.published_date, 0, $length) AS period, count(p) AS count
+RETURN period, count
+ORDER BY period
+"""
+
+PAPER_BY_TITLE_QUERY = """
+MATCH (p:Paper)
+WHERE p.title = $title
+RETURN p.title AS title, p.authors AS authors, p.abstract AS abstract, p.published_date AS published_date
+"""
+
+PAPERS_BY_TITLES_QUERY = """
+UNWIND range(0, size($titles) - 1) AS index
+WITH index, $titles[index] AS key
+OPTIONAL MATCH (p:Paper {title: key})
+WITH index, key, head(collect(p)) AS by_title
+OPTIONAL MATCH (q:Paper {id: key})
+WITH index, coalesce(by_title, q) AS p
+WHERE p IS NOT NULL
+RETURN index, p.id AS id, p.title AS title, p.authors AS authors,
+       p.abstract AS abstract, p.published_date AS published_date, p.url AS url,
+       p.summary AS summary, p.keywords AS keywords, p.digest AS digest
+"""
+
+# Edges are undirected in meaning; MERGE on an undirected pattern keeps one per pair
+ADD_RELATIONS_QUERY = """
+UNWIND $rows AS row
+MATCH (a:Paper {id: row.source})
+MATCH (b:Paper {id: row.target})
+MERGE (a)-[r:RELATED_TO]-(b)
+SET r.weight = row.weight, r.similarity = row.similarity, r.shared_authors = row.shared_authors
+"""
+
+# Related papers are expanded one hop at a time rather than by enumerating every
+# variable-length path: each hop follows RELATED_TO edges out of the previous hop's
+# papers and keeps only the $beam best papers not found yet, so the work per hop is
+# bounded. A path's score is the product of its edge weights, and score and hops
+# always describe the same path. related_papers_query repeats the hop block.
+RELATED_PAPERS_START = """
+MATCH (p:Paper {id: $paper_id})
+WITH p, [{paper: p, score: 1.0}] AS frontier, [] AS found
+"""
+
+RELATED_PAPERS_HOP = """
+CALL {
+    WITH p, frontier, found
+    UNWIND frontier AS f
+    WITH p, found, f.paper AS source, f.score AS base
+    MATCH (source)-[r:RELATED_TO]-(n:Paper)
+    WHERE n <> p AND NOT n IN [x IN found | x.paper]
+    WITH n, max(base * r.weight) AS score
+    ORDER BY score DESC
+    LIMIT $beam
+    RETURN collect({paper: n, score: score}) AS next
+}
+WITH p, next AS frontier, found + [x IN next | {paper: x.paper, score: x.score, hops: %d}] AS found
+"""
+
+RELATED_PAPERS_END = """
+UNWIND found AS f
+RETURN f.paper AS related, f.score AS score, f.hops AS hops
+ORDER BY score DESC
+LIMIT $limit
+"""
+
+MAX_RELATED_HOPS = 3
+RELATED_BEAM_WIDTH = 50  # papers kept per hop, at least the requested limit
+
+ENRICHED_PAPER_IDS_QUERY = """
+UNWIND $paper_ids AS paper_id
+MATCH (p:Paper {id: paper_id})
+WHERE p.enriched_at IS NOT NULL
+RETURN p.id AS id
+"""
+
+UPDATE_PAPER_METADATA_QUERY = """
+MATCH (p:Paper {id: $paper_id})
+SET p += $metadata
+RETURN p
+"""
+
+def paper_year(paper_data: Dict[str, Any]) -> Optional[int]:
+    published_date = paper_data.get("published_date")
+    if published_date and published_date[:4].isdigit():
+        return int(published_date[:4])
+    return None
+
+def paper_key(paper_data: Dict[str, Any]) -> Optional[str]:
+    # Stable identity for a paper: the versionless arXiv id when we have one,
+    # otherwise the URL, otherwise the title
+    if paper_data.get("id"):
+        return paper_data["id"]
+    url = paper_data.get("url")
+    if url:
+        match = _ARXIV_ID_PATTERN.search(url)
+        return match.group(1) if match else url
+    return paper_data.get("title")
+
+def papers_by_topic_query(limit: Optional[int]) -> str:
+    return PAPERS_BY_TOPIC_QUERY + ("LIMIT $limit\n" if limit is not None else "")
+
+def related_papers_query(hops: int) -> str:
+    if not 1 <= hops <= MAX_RELATED_HOPS:
+        raise ValueError(f"hops must be between 1 and {MAX_RELATED_HOPS}")
+    return RELATED_PAPERS_START + "".join(RELATED_PAPERS_HOP % hop for hop in range(1, int(hops) + 1)) \
+        + RELATED_PAPERS_END
+
+def related_beam(limit: int) -> int:
+    return max(limit, RELATED_BEAM_WIDTH)
+
+def related_rows(records) -> List[Dict[str, Any]]:
+    return [{**dict(record["related"]), "score": record["score"], "hops": record["hops"]} for record in records]
+
+def timeline_prefix_length(granularity: str) -> int:
+    # Buckets are prefixes of the ISO published_date: "2023" or "2023-04"
+    if granularity not in TIMELINE_GRANULARITIES:
+        raise ValueError(f"Unknown granularity '{granularity}', expected 'year' or 'month'")
+    return TIMELINE_GRANULARITIES[granularity]
+
+def paper_rows(papers: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    # Parameter rows for MERGE_PAPERS_QUERY; papers without any usable key are skipped
+    rows = []
+    for paper in papers:
+        key = paper_key(paper)
+        if key is None:
+            continue
+        props = {field: paper.get(field) for field in PAPER_FIELDS}
+        props["year"] = paper_year(paper)
+        rows.append({"id": key, "props": props, "topic": paper.get("topic")})
+    return rows
+
+def split_found(titles: List[str], found: Dict[int, Dict[str, Any]]) -> Dict[str, Any]:
+    # Found papers in input order, plus the titles that matched nothing
+    papers, missing = [], []
+    for index, title in enumerate(titles):
+        if index in found:
+            papers.append(found[index])
+        else:
+            missing.append(title)
+    return {"papers": papers, "missing": missing}
+
+def summarize_profile(profile: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    operators = []
+    db_hits = 0
+    stack = [profile] if profile else []
+    while stack:
+        plan = stack.pop()
+        operators.append(plan["operatorType"].split("@")[0])
+        db_hits += plan.get("dbHits", 0)
+        stack.extend(plan.get("children", []))
+
+    return {
+        "operators": operators,
+        "uses_index": any(op in _INDEX_OPERATORS for op in operators),
+        "db_hits": db_hits,
+    }
 
 class Neo4jClient:
-    def __init__(self, uri: str, user: str, password: str):
-        self.driver = GraphDatabase.driver(uri, auth=(user, password))
+    # Blocking client for scripts and migrations; the API uses AsyncNeo4jClient
+    def __init__(self, uri: str, user: str, password: str, batch_size: int = 500, search_index=None,
+                 max_pool_size: int = 100, acquisition_timeout: float = 60.0,
+                 max_connection_lifetime: float = 3600.0):
+        self.driver = GraphDatabase.driver(
+            uri,
+            auth=(user, password),
+            max_connection_pool_size=max_pool_size,
+            connection_acquisition_timeout=acquisition_timeout,
+            max_connection_lifetime=max_connection_lifetime
+        )
+        self.batch_size = batch_size
+        # Optional local full-text index kept in step with every write
+        self.search_index = search_index
+        self.logger = setup_logger(__name__)
 
     def close(self):
         self.driver.close()
 
+    def ensure_schema(self):
+        # Idempotent; a failing statement (e.g. the unique constraint while
+        # duplicates still exist) is logged and does not stop the others
+        with self.driver.session() as session:
+            for statement in SCHEMA_STATEMENTS:
+                try:
+                    session.run(statement).consume()
+                except Exception as e:
+                    self.logger.warning(f"Could not apply schema statement '{statement}': {e}")
+
     def add_paper(self, paper_data: Dict[str, Any]):
+        self.add_papers([paper_data])
+
+    @timed(NEO4J_QUERY_SECONDS, stage="neo4j", method="add_papers")
+    def add_papers(self, papers: List[Dict[str, Any]], batch_size: Optional[int] = None) -> int:
+        # Upserts papers on their stable key, one UNWIND transaction per batch
+        rows = paper_rows(papers)
+        batch_size = batch_size or self.batch_size
         with self.driver.session() as session:
-            session.execute_write(self._create_paper, paper_data)
+            for start in range(0, len(rows), batch_size):
+                session.execute_write(self._merge_papers, rows[start:start + batch_size])
+
+        NEO4J_PAPERS_WRITTEN.inc(len(rows))
+
+        if self.search_index is not None:
+            self.search_index.add_papers(papers)
+        return len(rows)
 
     @staticmethod
-    def _create_paper(tx, paper_data):
-        query = """
-        CREATE (p:Paper {
-            title: $title,
-            authors: $authors,
-            abstract: $abstract,
-            published_date: $published_date,
-            url: $url,
-            topic: $topic
-        })
-        """
-        tx.run(query, paper_data)
-
-    def get_papers_by_topic(self, topic: str, start_year: int, end_year: int) -> List[Dict]:
+    def _merge_papers(tx, rows: List[Dict[str, Any]]):
+        tx.run(MERGE_PAPERS_QUERY, rows=rows)
+
+    @timed(NEO4J_QUERY_SECONDS, stage="neo4j", method="tag_papers")
+    def tag_papers(self, paper_ids: List[str], topic: str) -> int:
+        # Adds already stored papers to a topic, e.g. local search hits found under another one
+        if not paper_ids:
+            return 0
         with self.driver.session() as session:
-            return session.execute_read(self._get_papers_by_topic, topic, start_year, end_year)
+            return session.execute_write(self._tag_papers, paper_ids, topic)
 
     @staticmethod
-    def _get_papers_by_topic(tx, topic: str, start_year: int, end_year: int):
-        query = """
-        MATCH (p:Paper)
-        WHERE p.topic = $topic 
-        AND datetime(p.published_date).year >= $start_year 
-        AND datetime(p.published_date).year <= $end_year
-        RETURN p
-        ORDER BY p.published_date DESC
-        """
-        result = tx.run(query, topic=topic, start_year=start_year, end_year=end_year)
+    def _tag_papers(tx, paper_ids: List[str], topic: str) -> int:
+        return tx.run(TAG_PAPERS_QUERY, paper_ids=paper_ids, topic=topic).single()["tagged"]
+
+    @timed(NEO4J_QUERY_SECONDS, stage="neo4j", method="get_papers_by_topic")
+    def get_papers_by_topic(self, topic: str, start_year: int, end_year: int,
+                            limit: Optional[int] = None, skip: int = 0) -> List[Dict]:
+        with self.driver.session() as session:
+            return session.execute_read(self._get_papers_by_topic, topic, start_year, end_year, limit, skip)
+
+    @staticmethod
+    def _get_papers_by_topic(tx, topic: str, start_year: int, end_year: int,
+                             limit: Optional[int] = None, skip: int = 0):
+        result = tx.run(papers_by_topic_query(limit), topic=topic, start_year=start_year, end_year=end_year,
+                        limit=limit, skip=skip)
         return [dict(record["p"]) for record in result]
 
+    def profile_papers_by_topic(self, topic: str, start_year: int, end_year: int,
+                                limit: Optional[int] = None) -> Dict[str, Any]:
+        # Runs the topic query under PROFILE and reports whether the planner used an index
+        with self.driver.session() as session:
+            result = session.run("PROFILE " + papers_by_topic_query(limit),
+                                 topic=topic, start_year=start_year, end_year=end_year, limit=limit, skip=0)
+            summary = result.consume()
+        return summarize_profile(summary.profile)
+
+    @timed(NEO4J_QUERY_SECONDS, stage="neo4j", method="count_papers_by_topic")
+    def count_papers_by_topic(self, topic: str, start_year: int, end_year: int) -> int:
+        with self.driver.session() as session:
+            return session.execute_read(self._count_papers_by_topic, topic, start_year, end_year)
+
+    @staticmethod
+    def _count_papers_by_topic(tx, topic: str, start_year: int, end_year: int) -> int:
+        return tx.run(COUNT_PAPERS_BY_TOPIC_QUERY, topic=topic, start_year=start_year, end_year=end_year).single()["total"]
+
+    @timed(NEO4J_QUERY_SECONDS, stage="neo4j", method="get_topic_timeline")
+    def get_topic_timeline(self, topic: str, start_year: int, end_year: int,
+                           granularity: str = "year") -> List[Dict[str, Any]]:
+        # Paper counts per year or month, aggregated in the database
+        length = timeline_prefix_length(granularity)
+        with self.driver.session() as session:
+            return session.execute_read(self._get_topic_timeline, topic, start_year, end_year, length)
+
+    @staticmethod
+    def _get_topic_timeline(tx, topic: str, start_year: int, end_year: int, length: int):
+        result = tx.run(TOPIC_TIMELINE_QUERY, topic=topic, start_year=start_year, end_year=end_year, length=length)
+        return [{"period": record["period"], "count": record["count"]} for record in result]
+
+    @timed(NEO4J_QUERY_SECONDS, stage="neo4j", method="get_paper_by_title")
     def get_paper_by_title(self, title: str) -> Dict[str, Any]:
         with self.driver.session() as session:
-            result = session.run("""
-                MATCH (p:Paper)
-                WHERE p.title = $title
-                RETURN p.title AS title, p.authors AS authors, p.abstract AS abstract, p.published_date AS published_date
-            """, title=title)
-            record = result.single()
-            if record:
-                return {
-                    "title": record["title"],
-                    "authors": record["authors"],
-                    "abstract": record["abstract"],
-                    "published_date": record["published_date"]
-                }
-            return None
-
-    def get_related_papers(self, paper_id: str) -> List[Dict[str, Any]]:
+            return session.execute_read(self._get_paper_by_title, title)
+
+    @staticmethod
+    def _get_paper_by_title(tx, title: str) -> Optional[Dict[str, Any]]:
+        record = tx.run(PAPER_BY_TITLE_QUERY, title=title).single()
+        return record.data() if record else None
+
+    @timed(NEO4J_QUERY_SECONDS, stage="neo4j", method="get_papers_by_titles")
+    def get_papers_by_titles(self, titles: List[str]) -> Dict[str, Any]:
+        # Resolves titles (or ids) in one UNWIND query. Found papers come back in
+        # input order; anything that matched neither a title nor an id is reported in "missing".
+        if not titles:
+            return {"papers": [], "missing": []}
+        with self.driver.session() as session:
+            found = session.execute_read(self._get_papers_by_titles, titles)
+        return split_found(titles, found)
+
+    @staticmethod
+    def _get_papers_by_titles(tx, titles: List[str]) -> Dict[int, Dict[str, Any]]:
+        result = tx.run(PAPERS_BY_TITLES_QUERY, titles=titles)
+        return {record["index"]: {key: record[key] for key in record.keys() if key != "index"}
+                for record in result}
+
+    @timed(NEO4J_QUERY_SECONDS, stage="neo4j", method="add_relations")
+    def add_relations(self, edges: List[Dict[str, Any]], batch_size: Optional[int] = None) -> int:
+        # edges: {"source", "target", "weight", "similarity", "shared_authors"} between stored paper ids
+        batch_size = batch_size or self.batch_size
+        with self.driver.session() as session:
+            for start in range(0, len(edges), batch_size):
+                session.execute_write(self._add_relations, edges[start:start + batch_size])
+        return len(edges)
+
+    @staticmethod
+    def _add_relations(tx, rows: List[Dict[str, Any]]):
+        tx.run(ADD_RELATIONS_QUERY, rows=rows)
+
+    @timed(NEO4J_QUERY_SECONDS, stage="neo4j", method="get_related_papers")
+    def get_related_papers(self, paper_id: str, hops: int = 1, limit: int = 20) -> List[Dict[str, Any]]:
+        # Papers within `hops` RELATED_TO edges, best scoring first, with "score" and "hops" added
+        query = related_papers_query(hops)
+        with self.driver.session() as session:
+            return session.execute_read(self._get_related_papers, query, paper_id, limit)
+
+    @staticmethod
+    def _get_related_papers(tx, query: str, paper_id: str, limit: int):
+        return related_rows(tx.run(query, paper_id=paper_id, limit=limit, beam=related_beam(limit)))
+
+    @timed(NEO4J_QUERY_SECONDS, stage="neo4j", method="get_enriched_ids")
+    def get_enriched_ids(self, paper_ids: List[str]) -> Set[str]:
+        # Which of the papers already carry enrichment metadata, in one round trip
+        if not paper_ids:
+            return set()
         with self.driver.session() as session:
-            return session.execute_read(self._get_related_papers, paper_id)
+            return session.execute_read(self._get_enriched_ids, paper_ids)
 
     @staticmethod
-    def _get_related_papers(tx, paper_id: str):
-        query = """
-        MATCH (p:Paper {id: $paper_id})-[:RELATED_TO]->(related:Paper)
-        RETURN related
-        ORDER BY related.published_date DESC
-        """
-        result = tx.run(query, paper_id=paper_id)
-        return [dict(record["related"]) for record in result]
+    def _get_enriched_ids(tx, paper_ids: List[str]) -> Set[str]:
+        return {record["id"] for record in tx.run(ENRICHED_PAPER_IDS_QUERY, paper_ids=paper_ids)}
 
+    @timed(NEO4J_QUERY_SECONDS, stage="neo4j", method="update_paper_metadata")
     def update_paper_metadata(self, paper_id: str, metadata: Dict[str, Any]):
         with self.driver.session() as session:
             session.execute_write(self._update_paper_metadata, paper_id, metadata)
 
     @staticmethod
     def _update_paper_metadata(tx, paper_id: str, metadata: Dict[str, Any]):
-        query = """
-        MATCH (p:Paper {id: $paper_id})
-        SET p += $metadata
-        RETURN p
-        """
-        tx.run(query, paper_id=paper_id, metadata=metadata)
+        tx.run(UPDATE_PAPER_METADATA_QUERY, paper_id=paper_id, metadata=metadata)
 
     # Optional: Close method if using 'with' context for Neo4j session
     def __enter__(self):
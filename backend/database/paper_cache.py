@@ -0,0 +1,260 @@
+import sys
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Set, Tuple
+from .neo4j_client import paper_key
+from ..models.metrics import registry
+
+PAPER_CACHE_LOOKUPS = registry.counter("paper_cache_lookups_total", "Paper cache lookups", ("kind", "result"))
+
+_MISSING = object()
+_ENTRY_OVERHEAD = 160  # rough bytes per cache entry for the LRU node, key tuple and index sets
+
+def _sizeof(value: Any) -> int:
+    if isinstance(value, (tuple, list)):
+        return sys.getsizeof(value) + sum(sys.getsizeof(item) for item in value)
+    return sys.getsizeof(value)
+
+class CachedPaper:
+    # Compact, immutable form of a paper record. Known properties live in slots
+    # instead of a per-record dict, list properties become tuples and strings
+    # repeated across papers (authors, topics) are interned. to_dict() hands each
+    # caller its own copy, so agents can still modify what they get back.
+    FIELDS = ("id", "title", "authors", "abstract", "published_date", "url", "topic", "year",
+              "summary", "keywords", "digest")
+    __slots__ = FIELDS + ("extra", "nbytes")
+
+    def __init__(self, record: Dict[str, Any]):
+        nbytes = sys.getsizeof(self)
+        for field in self.FIELDS:
+            value = record.get(field, _MISSING)
+            if isinstance(value, list):
+                value = tuple(sys.intern(item) if field == "authors" and isinstance(item, str) else item
+                              for item in value)
+            elif field == "topic" and isinstance(value, str):
+                value = sys.intern(value)
+            if value is not _MISSING:
+                nbytes += _sizeof(value)
+            object.__setattr__(self, field, value)
+        extra = {key: value for key, value in record.items() if key not in self.FIELDS}
+        object.__setattr__(self, "extra", extra or None)
+        if extra:
+            nbytes += sys.getsizeof(extra) + sum(_sizeof(value) for value in extra.values())
+        object.__setattr__(self, "nbytes", nbytes)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("CachedPaper is immutable")
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {}
+        for field in self.FIELDS:
+            value = getattr(self, field)
+            if value is not _MISSING:
+                data[field] = list(value) if isinstance(value, tuple) else value
+        if self.extra:
+            data.update({key: list(value) if isinstance(value, tuple) else value
+                         for key, value in self.extra.items()})
+        return data
+
+class PaperCache:
+    # Memory-bounded LRU of paper read results. An entry is a tuple of CachedPaper
+    # records under a lookup key (a title or id lookup, or a topic and year range
+    # query). Side indexes from paper id and topic to keys let writes invalidate
+    # exactly the entries they could change. Size is estimated per record.
+    # Entries older than ttl seconds are dropped on read, which bounds how stale a
+    # result can get when the database is written by something other than this process.
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, ttl: Optional[float] = 600.0):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, Tuple[Tuple[CachedPaper, ...], int, float]]" = OrderedDict()
+        self._keys_by_paper: Dict[str, Set[Hashable]] = defaultdict(set)
+        self._keys_by_topic: Dict[str, Set[Hashable]] = defaultdict(set)
+        self._lock = threading.Lock()
+        self.bytes = 0
+        # Bumped on every invalidation; results read before a write are not stored after it
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[Tuple[CachedPaper, ...]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl is not None and time.monotonic() - entry[2] > self.ttl:
+                self._remove(key)
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key: Hashable, records: Sequence[Dict[str, Any]], topic: Optional[str] = None,
+            generation: Optional[int] = None) -> Tuple[CachedPaper, ...]:
+        # topic registers a query entry for invalidation when papers on that topic are added
+        papers = tuple(CachedPaper(record) for record in records)
+        size = _ENTRY_OVERHEAD + sum(paper.nbytes for paper in papers)
+        with self._lock:
+            if (generation is not None and generation != self.generation) or size > self.max_bytes:
+                return papers
+            self._remove(key)
+            self._entries[key] = (papers, size, time.monotonic())
+            self.bytes += size
+            for paper in papers:
+                if paper.id is not _MISSING and paper.id is not None:
+                    self._keys_by_paper[paper.id].add(key)
+            if topic is not None:
+                self._keys_by_topic[topic].add(key)
+            while self.bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+        return papers
+
+    def _remove(self, key: Hashable):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        papers, size, _ = entry
+        self.bytes -= size
+        for paper in papers:
+            keys = self._keys_by_paper.get(paper.id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_paper[paper.id]
+        if isinstance(key, tuple) and key and key[0] == "topic":
+            keys = self._keys_by_topic.get(key[1])
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_topic[key[1]]
+
+    def invalidate_paper(self, paper_id: str, title: Optional[str] = None, topic: Optional[str] = None):
+        # Drops every entry containing the paper, its title lookup and, for new or
+        # changed papers, every topic query it might now belong to
+        with self._lock:
+            self.generation += 1
+            keys = set(self._keys_by_paper.get(paper_id, ()))
+            keys.update((("title", paper_id), ("title", title)) if title else (("title", paper_id),))
+            if topic is not None:
+                keys.update(self._keys_by_topic.get(topic, ()))
+            for key in keys:
+                if key in self._entries:
+                    self._remove(key)
+                    self.invalidations += 1
+
+    def invalidate_topic(self, topic: str):
+        with self._lock:
+            self.generation += 1
+            for key in list(self._keys_by_topic.get(topic, ())):
+                self._remove(key)
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+            self._keys_by_paper.clear()
+            self._keys_by_topic.clear()
+            self.bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": len(self._entries),
+            "papers": len(self._keys_by_paper),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
+
+# Read-through cache in front of a database client. Topic queries and title/id
+# lookups are answered from PaperCache when possible; writes go to the client and
+# invalidate what they touch. Everything else is passed through unchanged.
+class CachedNeo4jClient:
+    def __init__(self, client, cache: PaperCache):
+        self.client = client
+        self.cache = cache
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+    async def get_papers_by_topic(self, topic: str, start_year: int, end_year: int,
+                                  limit: Optional[int] = None, skip: int = 0) -> List[Dict]:
+        key = ("topic", topic, start_year, end_year, limit, skip)
+        papers = self.cache.get(key)
+        PAPER_CACHE_LOOKUPS.inc(kind="topic", result="hit" if papers is not None else "miss")
+        if papers is None:
+            generation = self.cache.generation
+            records = await self.client.get_papers_by_topic(topic, start_year, end_year, limit=limit, skip=skip)
+            papers = self.cache.set(key, records, topic=topic, generation=generation)
+        return [paper.to_dict() for paper in papers]
+
+    async def get_papers_by_titles(self, titles: List[str]) -> Dict[str, Any]:
+        # Titles (or ids) already cached are served from memory; the rest go to the
+        # database in one round trip, and only lookups that matched are cached
+        found: Dict[int, Tuple[CachedPaper, ...]] = {}
+        for index, title in enumerate(titles):
+            papers = self.cache.get(("title", title))
+            if papers is not None:
+                found[index] = papers
+        PAPER_CACHE_LOOKUPS.inc(len(found), kind="title", result="hit")
+        PAPER_CACHE_LOOKUPS.inc(len(titles) - len(found), kind="title", result="miss")
+
+        missing = [title for index, title in enumerate(titles) if index not in found]
+        if missing:
+            generation = self.cache.generation
+            result = await self.client.get_papers_by_titles(missing)
+            fetched = iter(result["papers"])
+            unresolved = set(result["missing"])
+            for index, title in enumerate(titles):
+                if index in found or title in unresolved:
+                    continue
+                found[index] = self.cache.set(("title", title), [next(fetched)], generation=generation)
+
+        papers, not_found = [], []
+        for index, title in enumerate(titles):
+            if index in found:
+                papers.append(found[index][0].to_dict())
+            else:
+                not_found.append(title)
+        return {"papers": papers, "missing": not_found}
+
+    async def add_paper(self, paper_data: Dict[str, Any]):
+        await self.add_papers([paper_data])
+
+    async def add_papers(self, papers: List[Dict[str, Any]], batch_size: Optional[int] = None) -> int:
+        written = await self.client.add_papers(papers, batch_size)
+        for paper in papers:
+            key = paper_key(paper)
+            if key is not None:
+                self.cache.invalidate_paper(key, title=paper.get("title"), topic=paper.get("topic"))
+        return written
+
+    async def tag_papers(self, paper_ids: List[str], topic: str) -> int:
+        tagged = await self.client.tag_papers(paper_ids, topic)
+        if tagged:
+            self.cache.invalidate_topic(topic)
+        return tagged
+
+    async def update_paper_metadata(self, paper_id: str, metadata: Dict[str, Any]):
+        await self.client.update_paper_metadata(paper_id, metadata)
+        self.cache.invalidate_paper(paper_id)
+
+    async def close(self):
+        self.cache.clear()
+        await self.client.close()
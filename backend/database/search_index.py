@@ -0,0 +1,205 @@
+import asyncio
+import math
+import os
+import pickle
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import List, Dict, Any, Iterable, Optional
+from .neo4j_client import paper_key, paper_year
+from ..models.logger import setup_logger
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have in into is it its of on or our that the their this
+to was we were which with using based via
+""".split())
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in _TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+# In-process BM25 index over paper titles and abstracts. Papers are kept in the
+# index so local hits can be returned without a database round trip.
+class BM25Index:
+    # Below this many papers a search takes a few milliseconds at most, less than
+    # handing it to a worker thread; larger indexes are searched off the event loop
+    INLINE_SEARCH_DOCS = 1000
+
+    def __init__(self, path: Optional[str] = None, k1: float = 1.5, b: float = 0.75,
+                 title_weight: int = 2, autosave_interval: float = 30.0, load: bool = True):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.title_weight = title_weight
+        self.autosave_interval = autosave_interval
+        self.logger = setup_logger(__name__)
+
+        self._lock = threading.RLock()
+        self.papers: Dict[str, Dict[str, Any]] = {}
+        self.doc_lengths: Dict[str, int] = {}
+        self.postings: Dict[str, Dict[str, int]] = defaultdict(dict)
+        self.total_length = 0
+        self._dirty = False
+        self._last_save = time.monotonic()
+
+        # load=False defers reading the file to preload(), e.g. to keep it off the startup
+        # path; until then save() leaves the file alone so it is never overwritten by a subset
+        self._unloaded = bool(path and os.path.exists(path))
+        if load and self._unloaded:
+            self.load()
+
+    def __len__(self) -> int:
+        return len(self.papers)
+
+    def _terms(self, paper: Dict[str, Any]) -> Counter:
+        # Title terms are counted title_weight times so title matches rank higher
+        terms = Counter(tokenize(paper.get("abstract") or ""))
+        for token in tokenize(paper.get("title") or ""):
+            terms[token] += self.title_weight
+        return terms
+
+    def add_papers(self, papers: Iterable[Dict[str, Any]]) -> int:
+        added = 0
+        with self._lock:
+            for paper in papers:
+                doc_id = paper_key(paper)
+                if doc_id is None:
+                    continue
+                self._remove(doc_id)
+
+                terms = self._terms(paper)
+                for term, frequency in terms.items():
+                    self.postings[term][doc_id] = frequency
+                length = sum(terms.values())
+                self.doc_lengths[doc_id] = length
+                self.total_length += length
+                self.papers[doc_id] = {**paper, "id": doc_id}
+                added += 1
+
+            if added:
+                self._dirty = True
+                self._maybe_autosave()
+        return added
+
+    def _remove(self, doc_id: str):
+        paper = self.papers.pop(doc_id, None)
+        if paper is None:
+            return
+        for term in self._terms(paper):
+            postings = self.postings.get(term)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self.postings[term]
+        self.total_length -= self.doc_lengths.pop(doc_id, 0)
+
+    def search(self, query: str, limit: int = 10, start_year: Optional[int] = None,
+               end_year: Optional[int] = None, min_term_share: float = 0.0) -> List[Dict[str, Any]]:
+        # min_term_share drops papers containing less than that fraction of the distinct
+        # query terms, so a paper sharing one common word with the query is not a hit
+        with self._lock:
+            doc_count = len(self.papers)
+            if doc_count == 0:
+                return []
+            avg_length = self.total_length / doc_count
+
+            terms = set(tokenize(query))
+            required = math.ceil(min_term_share * len(terms) - 1e-9)
+            scores: Dict[str, float] = defaultdict(float)
+            matched: Counter = Counter()
+            for term in terms:
+                postings = self.postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, frequency in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / avg_length)
+                    scores[doc_id] += idf * frequency * (self.k1 + 1) / (frequency + norm)
+                    matched[doc_id] += 1
+
+            results = []
+            for doc_id, score in sorted(scores.items(), key=lambda item: item[1], reverse=True):
+                if matched[doc_id] < required:
+                    continue
+                paper = self.papers[doc_id]
+                year = paper_year(paper)
+                if start_year is not None and (year is None or year < start_year):
+                    continue
+                if end_year is not None and (year is None or year > end_year):
+                    continue
+                results.append({**paper, "score": score})
+                if len(results) >= limit:
+                    break
+            return results
+
+    async def asearch(self, query: str, limit: int = 10, start_year: Optional[int] = None,
+                      end_year: Optional[int] = None, min_term_share: float = 0.0) -> List[Dict[str, Any]]:
+        if len(self.papers) <= self.INLINE_SEARCH_DOCS:
+            return self.search(query, limit=limit, start_year=start_year, end_year=end_year,
+                               min_term_share=min_term_share)
+        return await asyncio.to_thread(self.search, query, limit=limit, start_year=start_year, end_year=end_year,
+                                       min_term_share=min_term_share)
+
+    def term_counts(self, doc_id: str) -> Counter:
+        with self._lock:
+            paper = self.papers.get(doc_id)
+            return self._terms(paper) if paper is not None else Counter()
+
+    def more_like_this(self, doc_id: str, limit: int = 50, query_terms: int = 20) -> List[Dict[str, Any]]:
+        # Papers sharing the document's most frequent terms, best BM25 match first, excluding itself
+        terms = self.term_counts(doc_id)
+        if not terms:
+            return []
+        query = " ".join(term for term, _ in terms.most_common(query_terms))
+        return [paper for paper in self.search(query, limit=limit + 1) if paper["id"] != doc_id][:limit]
+
+    def _maybe_autosave(self):
+        if self.path and time.monotonic() - self._last_save >= self.autosave_interval:
+            self.save()
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            if self._unloaded or (not self._dirty and os.path.exists(self.path)):
+                return
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # Write to a temporary file first so a crash never leaves a half-written index
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                pickle.dump({
+                    "papers": self.papers,
+                    "doc_lengths": self.doc_lengths,
+                    "postings": dict(self.postings),
+                    "total_length": self.total_length,
+                }, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+            self._last_save = time.monotonic()
+        self.logger.info(f"Saved search index with {len(self.papers)} papers to {self.path}")
+
+    def preload(self) -> int:
+        # Loads the saved index if that has not happened yet, keeping papers added meanwhile
+        if self._unloaded:
+            self.load(keep_added=True)
+        return len(self.papers)
+
+    def load(self, keep_added: bool = False):
+        # Unpickled without holding the lock, so searches keep running until the swap
+        with open(self.path, "rb") as f:
+            state = pickle.load(f)
+        with self._lock:
+            added = list(self.papers.values()) if keep_added else []
+            self.papers = state["papers"]
+            self.doc_lengths = state["doc_lengths"]
+            self.postings = defaultdict(dict, state["postings"])
+            self.total_length = state["total_length"]
+            self._dirty = False
+            self._unloaded = False
+            if added:
+                self.add_papers(added)
+        self.logger.info(f"Loaded search index with {len(self.papers)} papers from {self.path}")
@@ -0,0 +1,28 @@
+import numpy as np
+import ollama
+from typing import List, Optional, Union
+from .logger import setup_logger
+
+class OllamaEncoder:
+    # Embeds text with a local Ollama embedding model. Any object with the same
+    # async embed(texts) -> np.ndarray method can be used in its place.
+    def __init__(self, model_name: str = "nomic-embed-text", host: Optional[str] = None, batch_size: int = 32,
+                 keep_alive: Optional[Union[float, str]] = None):
+        self.model_name = model_name
+        self.client = ollama.AsyncClient(host=host)
+        self.batch_size = batch_size
+        self.keep_alive = keep_alive
+        self.logger = setup_logger(__name__)
+
+    async def embed(self, texts: List[str]) -> np.ndarray:
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            batch = texts[start:start + self.batch_size]
+            response = await self.client.embed(model=self.model_name, input=batch, keep_alive=self.keep_alive)
+            vectors.extend(response['embeddings'])
+        self.logger.info(f"Embedded {len(texts)} texts with {self.model_name}")
+        return np.asarray(vectors, dtype=np.float32)
+
+    async def warm_up(self):
+        # Loads the embedding model so the first question does not pay for it
+        await self.client.embed(model=self.model_name, input=["warm up"], keep_alive=self.keep_alive)
@@ -1,31 +1,277 @@
-import ollama
-from typing import List
+import asyncio
+import time
+from typing import Any, AsyncIterator, Callable, Dict, Hashable, List, Optional, Sequence, Tuple, Union
 from .logger import setup_logger
+from .llm_router import LLMRouter
+from .response_cache import ResponseCache
+from .metrics import registry, record_stage
+
+LLM_PROMPT_CHARS = registry.histogram(
+    "llm_prompt_chars", "Prompt length in characters", ("mode",),
+    buckets=(250, 500, 1000, 2000, 4000, 8000, 16000, 32000, 64000)
+)
+LLM_QUEUE_WAIT_SECONDS = registry.histogram("llm_queue_wait_seconds", "Time spent waiting for an LLM slot")
+LLM_TIME_TO_FIRST_TOKEN_SECONDS = registry.histogram(
+    "llm_time_to_first_token_seconds", "Time from sending a prompt to the first generated token", ("mode",)
+)
+LLM_GENERATION_SECONDS = registry.histogram(
+    "llm_generation_seconds", "Total generation time per prompt", ("mode", "outcome")
+)
+LLM_TOKENS_PER_SECOND = registry.histogram(
+    "llm_tokens_per_second", "Generation speed reported by Ollama", ("mode",),
+    buckets=(1, 2, 5, 10, 20, 30, 50, 75, 100, 150, 250)
+)
+LLM_REJECTED = registry.counter("llm_rejected_total", "Prompts rejected because the LLM queue was full")
+LLM_CACHE_LOOKUPS = registry.counter("llm_cache_lookups_total", "LLM response cache lookups", ("result",))
+
+class LLMQueueFullError(RuntimeError):
+    pass
+
+class LLMGenerationError(RuntimeError):
+    pass
 
 class LLMManager:
-    def __init__(self, model_name: str = "mistral:latest"):
+    def __init__(self, model_name: str = "mistral:latest", host: Optional[str] = None,
+                 max_concurrency: int = 2, max_queue_size: int = 32, timeout: Optional[float] = 120.0,
+                 cache: Optional[ResponseCache] = None, keep_alive: Optional[Union[float, str]] = None,
+                 router: Optional[LLMRouter] = None, task_models: Optional[Dict[str, str]] = None):
         self.model_name = model_name
+        # Optional per-task overrides, e.g. {"summary": "phi3:mini"}; other tasks use model_name
+        self.task_models = {task: model for task, model in (task_models or {}).items() if model}
+        self.cache = cache
+        # Sent with every request so Ollama keeps the model loaded between them ("-1m" pins it)
+        self.keep_alive = keep_alive
+        # Generations are spread over the router's backends; by default that is just `host`
+        self.router = router or LLMRouter([host])
+        self.timeout = timeout
+        # max_concurrency applies per backend, so adding hosts adds capacity
+        self.max_concurrency = max_concurrency * len(self.router.backends)
+        self.max_queue_size = max_queue_size
+        # Bounds the number of generations running against Ollama at once;
+        # everything else waits here instead of piling up on the model servers
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._waiting = 0
+        self._in_flight = 0
         self.logger = setup_logger(__name__)
-        self.logger.info(f"Initialized LLMManager with model: {model_name}")
+        self.logger.info(f"Initialized LLMManager with model: {model_name} "
+                         f"(backends={len(self.router.backends)}, concurrency={self.max_concurrency}, "
+                         f"queue={max_queue_size}, timeout={timeout})")
+
+    @property
+    def queue_depth(self) -> int:
+        return self._waiting
 
-    async def generate_response(self, prompt: str) -> str:
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    async def _acquire_slot(self):
+        if self._waiting >= self.max_queue_size:
+            LLM_REJECTED.inc()
+            raise LLMQueueFullError(f"LLM queue is full ({self._waiting} requests waiting)")
+        self._waiting += 1
+        started = time.perf_counter()
         try:
-            response = ollama.generate(model=self.model_name, prompt=prompt)
-            if 'response' in response:
-                self.logger.info(f"Successfully generated response for prompt: {prompt[:50]}...")
-                return response['response']
-            else:
-                self.logger.error(f"Response key not found in the output: {response}")
-                return ""
+            await self._semaphore.acquire()
+        finally:
+            self._waiting -= 1
+        LLM_QUEUE_WAIT_SECONDS.observe(time.perf_counter() - started)
+        self._in_flight += 1
+
+    def _release_slot(self):
+        self._in_flight -= 1
+        self._semaphore.release()
+
+    @property
+    def models(self) -> List[str]:
+        return list(dict.fromkeys([self.model_name, *self.task_models.values()]))
+
+    def _model_for(self, task: Optional[str]) -> str:
+        return self.task_models.get(task, self.model_name) if task else self.model_name
+
+    async def warm_up(self) -> float:
+        # Loads every model on every backend with an empty prompt and returns the load time.
+        # Succeeds once at least one backend has loaded them; if none could, the error is
+        # raised to the caller, which decides whether the service is ready.
+        started = time.perf_counter()
+        warm = await self.router.warm_up(self.models, keep_alive=self.keep_alive, timeout=self.timeout)
+        elapsed = time.perf_counter() - started
+        self.logger.info(f"Loaded {', '.join(self.models)} on {len(warm)} of {len(self.router.backends)} "
+                         f"backend(s) in {elapsed:.1f}s (keep_alive={self.keep_alive})")
+        return elapsed
+
+    def _cache_key(self, model: str, prompt: str, options: Optional[Dict[str, Any]]) -> Optional[str]:
+        if self.cache is None:
+            return None
+        return ResponseCache.make_key(model, prompt, options)
+
+    async def _cached_response(self, cache_key: Optional[str], prompt: str) -> Optional[str]:
+        if cache_key is None:
+            return None
+        cached = await self.cache.aget(cache_key)
+        LLM_CACHE_LOOKUPS.inc(result="hit" if cached is not None else "miss")
+        if cached is not None:
+            self.logger.info(f"Cache hit for prompt: {prompt[:50]}...")
+        return cached
+
+    @staticmethod
+    def _record_generation(mode: str, outcome: str, started: float, stats: Optional[Dict[str, Any]] = None,
+                           first_token_at: Optional[float] = None):
+        elapsed = time.perf_counter() - started
+        LLM_GENERATION_SECONDS.observe(elapsed, mode=mode, outcome=outcome)
+        record_stage("llm", elapsed)
+        if first_token_at is not None:
+            LLM_TIME_TO_FIRST_TOKEN_SECONDS.observe(first_token_at - started, mode=mode)
+        elif stats and stats.get('prompt_eval_duration') is not None:
+            # Without streaming, model load plus prompt evaluation is when the first token was ready
+            LLM_TIME_TO_FIRST_TOKEN_SECONDS.observe(
+                ((stats.get('load_duration') or 0) + stats['prompt_eval_duration']) / 1e9, mode=mode
+            )
+        if stats and stats.get('eval_count') and stats.get('eval_duration'):
+            LLM_TOKENS_PER_SECOND.observe(stats['eval_count'] / (stats['eval_duration'] / 1e9), mode=mode)
+
+    async def generate_response(self, prompt: str, timeout: Optional[float] = None,
+                                options: Optional[Dict[str, Any]] = None, use_cache: bool = True,
+                                task: Optional[str] = None) -> str:
+        response, _ = await self.generate_with_context(prompt, timeout=timeout, options=options,
+                                                       use_cache=use_cache, task=task)
+        return response
+
+    async def generate_with_context(self, prompt: str, context: Optional[Sequence[int]] = None,
+                                    timeout: Optional[float] = None, options: Optional[Dict[str, Any]] = None,
+                                    use_cache: bool = True, task: Optional[str] = None,
+                                    affinity: Optional[Hashable] = None) -> Tuple[str, Optional[List[int]]]:
+        # Like generate_response, but continues from the token context Ollama returned for
+        # an earlier generation and returns the new context with the text, so a follow-up
+        # only pays for its own tokens. Generations that continue a context are not cached.
+        # affinity keeps related calls on the same backend, where that context is still warm.
+        # A full queue raises LLMQueueFullError and a timeout or model error LLMGenerationError,
+        # so callers never mistake a failure for an empty answer.
+        model = self._model_for(task)
+        cache_key = self._cache_key(model, prompt, options) if use_cache and not context else None
+        cached = await self._cached_response(cache_key, prompt)
+        if cached is not None:
+            return cached, None
+        LLM_PROMPT_CHARS.observe(len(prompt), mode="generate")
+
+        try:
+            await self._acquire_slot()
+        except LLMQueueFullError as e:
+            self.logger.error(f"Rejected prompt '{prompt[:50]}...': {e}")
+            raise
+
+        started = time.perf_counter()
+        try:
+            response = await asyncio.wait_for(
+                self.router.generate(model=model, prompt=prompt, options=options, keep_alive=self.keep_alive,
+                                     context=list(context) if context else None, affinity=affinity),
+                timeout=timeout if timeout is not None else self.timeout
+            )
+        except asyncio.TimeoutError as e:
+            self.logger.error(f"Timed out generating response for prompt '{prompt[:50]}...'")
+            self._record_generation("generate", "timeout", started)
+            raise LLMGenerationError("Timed out waiting for the model") from e
         except Exception as e:
             self.logger.error(f"Error generating response for prompt '{prompt[:50]}...': {e}")
-            return ""
-
-    async def batch_generate(self, prompts: List[str]) -> List[str]:
-        responses = []
-        for prompt in prompts:
-            response = await self.generate_response(prompt)
-            responses.append(response)
-            self.logger.info(f"Generated response for batch prompt: {prompt[:50]}...")
-        self.logger.info("Completed batch generation.")
-        return responses
+            self._record_generation("generate", "error", started)
+            raise LLMGenerationError(f"Model error: {e}") from e
+        finally:
+            self._release_slot()
+
+        if 'response' not in response:
+            self.logger.error(f"Response key not found in the output: {response}")
+            self._record_generation("generate", "error", started)
+            raise LLMGenerationError("Model returned no response")
+        self.logger.info(f"Successfully generated response for prompt: {prompt[:50]}...")
+        self._record_generation("generate", "ok", started, response)
+        if cache_key is not None and response['response']:
+            await self.cache.aset(cache_key, response['response'])
+        return response['response'], response.get('context')
+
+    async def stream_response(self, prompt: str, timeout: Optional[float] = None,
+                              options: Optional[Dict[str, Any]] = None, use_cache: bool = True,
+                              task: Optional[str] = None, context: Optional[Sequence[int]] = None,
+                              on_context: Optional[Callable[[List[int]], None]] = None,
+                              affinity: Optional[Hashable] = None) -> AsyncIterator[str]:
+        # Yields response tokens as Ollama produces them. The timeout applies to
+        # the wait for each chunk, so long generations are fine as long as they keep moving.
+        # context, on_context and affinity work as in generate_with_context; the new
+        # context arrives with the final chunk and is passed to on_context.
+        # Failures are raised (LLMQueueFullError or LLMGenerationError) rather than ending
+        # the stream: a stream that simply ended would look like a complete answer.
+        model = self._model_for(task)
+        cache_key = self._cache_key(model, prompt, options) if use_cache and not context else None
+        cached = await self._cached_response(cache_key, prompt)
+        if cached is not None:
+            yield cached
+            return
+        LLM_PROMPT_CHARS.observe(len(prompt), mode="stream")
+
+        try:
+            await self._acquire_slot()
+        except LLMQueueFullError as e:
+            self.logger.error(f"Rejected prompt '{prompt[:50]}...': {e}")
+            raise
+        timeout = timeout if timeout is not None else self.timeout
+        started = time.perf_counter()
+        first_token_at = None
+        try:
+            stream = await asyncio.wait_for(
+                self.router.generate(model=model, prompt=prompt, options=options, stream=True,
+                                     keep_alive=self.keep_alive, context=list(context) if context else None,
+                                     affinity=affinity),
+                timeout=timeout
+            )
+            chunks = stream.__aiter__()
+            tokens = []
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(chunks.__anext__(), timeout=timeout)
+                except StopAsyncIteration:
+                    break
+                token = chunk.get('response', '')
+                if token:
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter()
+                    tokens.append(token)
+                    yield token
+                if chunk.get('done'):
+                    # The final chunk carries Ollama's eval counters
+                    self._record_generation("stream", "ok", started, chunk, first_token_at)
+                    if on_context is not None and chunk.get('context'):
+                        on_context(chunk['context'])
+                    break
+            self.logger.info(f"Successfully streamed response for prompt: {prompt[:50]}...")
+            if cache_key is not None and tokens:
+                await self.cache.aset(cache_key, "".join(tokens))
+        except asyncio.TimeoutError as e:
+            self.logger.error(f"Timed out streaming response for prompt '{prompt[:50]}...'")
+            self._record_generation("stream", "timeout", started, first_token_at=first_token_at)
+            raise LLMGenerationError("Timed out waiting for the model") from e
+        except Exception as e:
+            self.logger.error(f"Error streaming response for prompt '{prompt[:50]}...': {e}")
+            self._record_generation("stream", "error", started, first_token_at=first_token_at)
+            raise LLMGenerationError(f"Model error: {e}") from e
+        finally:
+            self._release_slot()
+
+    async def batch_generate(self, prompts: List[str], task: Optional[str] = None,
+                             window: Optional[int] = None) -> List[str]:
+        # At most `window` prompts are admitted at a time, by default a quarter of the
+        # admission queue (and at least the concurrency limit, to keep every slot busy),
+        # so a large batch waits here instead of filling the shared queue and having its
+        # prompts, and everyone else's, rejected. gather preserves input order.
+        # Every prompt runs to completion; if any failed, the first failure is raised.
+        admitted = asyncio.Semaphore(window or max(self.max_concurrency, self.max_queue_size // 4))
+
+        async def generate(prompt: str) -> str:
+            async with admitted:
+                return await self.generate_response(prompt, task=task)
+
+        responses = await asyncio.gather(*(generate(prompt) for prompt in prompts), return_exceptions=True)
+        failures = [response for response in responses if isinstance(response, BaseException)]
+        if failures:
+            self.logger.error(f"{len(failures)} of {len(prompts)} batch prompts failed")
+            raise failures[0]
+        self.logger.info(f"Completed batch generation of {len(prompts)} prompts.")
+        return list(responses)
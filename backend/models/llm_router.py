@@ -0,0 +1,213 @@
+import asyncio
+import itertools
+import time
+from collections import OrderedDict
+import httpx
+import ollama
+from typing import Any, AsyncIterator, Dict, Hashable, List, Optional, Sequence, Union
+from .logger import setup_logger
+from .metrics import registry
+
+LLM_BACKEND_REQUESTS = registry.counter(
+    "llm_backend_requests_total", "Generate calls sent to each Ollama backend", ("backend", "outcome")
+)
+LLM_BACKEND_RETRIES = registry.counter("llm_backend_retries_total", "Generate calls retried on another backend")
+
+class NoHealthyBackendError(RuntimeError):
+    pass
+
+def _retryable(error: Exception) -> bool:
+    # Connection problems and server-side errors are worth another host;
+    # a bad request would fail the same way everywhere
+    if isinstance(error, ollama.ResponseError):
+        return error.status_code >= 500 or error.status_code in (404, -1)
+    return isinstance(error, (ConnectionError, httpx.HTTPError))
+
+class OllamaBackend:
+    def __init__(self, host: Optional[str]):
+        self.host = host
+        self.name = host or "default"
+        self.client = ollama.AsyncClient(host=host)
+        self.outstanding = 0
+        self.failures = 0
+        self.ejected_until = 0.0
+
+    @property
+    def available(self) -> bool:
+        return time.monotonic() >= self.ejected_until
+
+# Spreads generate calls over several Ollama hosts. Each call goes to the available
+# backend with the fewest outstanding requests; failures that another host could
+# serve are retried there. A backend failing max_failures times in a row is ejected
+# for eject_seconds, and a periodic health check restores or ejects hosts early.
+# Calls sharing an affinity key (e.g. a chat session) stick to the backend that
+# served the previous one while it is available, since its KV cache is warm.
+# generate() has the same shape as ollama.AsyncClient.generate, streaming included.
+class LLMRouter:
+    def __init__(self, hosts: Sequence[Optional[str]], max_failures: int = 3, eject_seconds: float = 30.0,
+                 health_check_interval: float = 10.0, max_affinities: int = 4096):
+        self.backends = [OllamaBackend(host) for host in (hosts or [None])]
+        self.max_failures = max_failures
+        self.eject_seconds = eject_seconds
+        self.health_check_interval = health_check_interval
+        self.logger = setup_logger(__name__)
+        self._round_robin = itertools.count()
+        self._health_task: Optional[asyncio.Task] = None
+        self.max_affinities = max_affinities
+        self._affinity: "OrderedDict[Hashable, OllamaBackend]" = OrderedDict()
+
+        registry.gauge("llm_backend_outstanding", "Requests in flight per Ollama backend", ("backend",),
+                       callback=lambda: {(b.name,): b.outstanding for b in self.backends})
+        registry.gauge("llm_backend_available", "1 if the Ollama backend is not ejected", ("backend",),
+                       callback=lambda: {(b.name,): 1.0 if b.available else 0.0 for b in self.backends})
+
+    def start(self):
+        if self._health_task is None and len(self.backends) > 1:
+            self._health_task = asyncio.create_task(self._health_loop())
+
+    async def stop(self):
+        if self._health_task is not None:
+            self._health_task.cancel()
+            await asyncio.gather(self._health_task, return_exceptions=True)
+            self._health_task = None
+
+    def pick(self, exclude: Sequence[OllamaBackend] = (), affinity: Optional[Hashable] = None) -> OllamaBackend:
+        if affinity is not None:
+            backend = self._affinity.get(affinity)
+            if backend is not None and backend.available and backend not in exclude:
+                return backend
+        candidates = [b for b in self.backends if b.available and b not in exclude]
+        if not candidates:
+            # With every host ejected, still try the one that has been out longest
+            candidates = [b for b in self.backends if b not in exclude]
+            if not candidates:
+                raise NoHealthyBackendError("No Ollama backend left to try")
+            return min(candidates, key=lambda b: b.ejected_until)
+        # Least outstanding requests; the rotating offset breaks ties evenly
+        offset = next(self._round_robin)
+        position = {id(b): i for i, b in enumerate(self.backends)}
+        return min(candidates, key=lambda b: (b.outstanding, (position[id(b)] - offset) % len(self.backends)))
+
+    def _remember(self, affinity: Hashable, backend: OllamaBackend):
+        self._affinity[affinity] = backend
+        self._affinity.move_to_end(affinity)
+        while len(self._affinity) > self.max_affinities:
+            self._affinity.popitem(last=False)
+
+    def _succeeded(self, backend: OllamaBackend):
+        backend.failures = 0
+        backend.ejected_until = 0.0
+        LLM_BACKEND_REQUESTS.inc(backend=backend.name, outcome="ok")
+
+    def _failed(self, backend: OllamaBackend, error: Exception):
+        backend.failures += 1
+        LLM_BACKEND_REQUESTS.inc(backend=backend.name, outcome="error")
+        if backend.failures >= self.max_failures and backend.available:
+            backend.ejected_until = time.monotonic() + self.eject_seconds
+            self.logger.warning(f"Ejected Ollama backend {backend.name} for {self.eject_seconds}s "
+                                f"after {backend.failures} failures: {error}")
+
+    async def generate(self, model: str = "", prompt: Optional[str] = None, stream: bool = False,
+                       affinity: Optional[Hashable] = None,
+                       **kwargs) -> Union[Dict[str, Any], AsyncIterator[Dict[str, Any]]]:
+        tried: List[OllamaBackend] = []
+        while True:
+            backend = self.pick(exclude=tried, affinity=affinity)
+            tried.append(backend)
+            backend.outstanding += 1
+            try:
+                if stream:
+                    # A stream can only move to another host before its first chunk
+                    chunks = (await backend.client.generate(model=model, prompt=prompt, stream=True,
+                                                            **kwargs)).__aiter__()
+                    first = await self._next_chunk(chunks)
+                else:
+                    response = await backend.client.generate(model=model, prompt=prompt, **kwargs)
+            except asyncio.CancelledError:
+                backend.outstanding -= 1
+                raise
+            except Exception as e:
+                backend.outstanding -= 1
+                self._failed(backend, e)
+                if not _retryable(e) or len(tried) == len(self.backends):
+                    raise
+                LLM_BACKEND_RETRIES.inc()
+                self.logger.warning(f"Ollama backend {backend.name} failed, retrying on another host: {e}")
+                continue
+
+            self._succeeded(backend)
+            if affinity is not None:
+                self._remember(affinity, backend)
+            if stream:
+                return self._relay(backend, first, chunks)
+            backend.outstanding -= 1
+            return response
+
+    @staticmethod
+    async def _next_chunk(chunks: AsyncIterator[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        try:
+            return await chunks.__anext__()
+        except StopAsyncIteration:
+            return None
+
+    @staticmethod
+    async def _relay(backend: OllamaBackend, first: Optional[Dict[str, Any]],
+                     chunks: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[Dict[str, Any]]:
+        # The backend stays counted as busy until the final chunk is relayed or the
+        # stream is abandoned; callers often stop iterating at the done chunk
+        released = False
+        try:
+            chunk = first
+            while chunk is not None:
+                if chunk.get("done"):
+                    released = True
+                    backend.outstanding -= 1
+                yield chunk
+                chunk = await LLMRouter._next_chunk(chunks)
+        finally:
+            if not released:
+                backend.outstanding -= 1
+
+    async def warm_up(self, models: Sequence[str], keep_alive: Optional[Union[float, str]] = None,
+                      timeout: Optional[float] = None) -> List[OllamaBackend]:
+        # Loads every model on every backend and returns the backends that managed it.
+        # One dead host must not hold the service back: backends that fail or time out
+        # are ejected (the health check restores them later) and warm-up only fails
+        # when no backend could load the models.
+        async def load(backend: OllamaBackend):
+            await asyncio.wait_for(asyncio.gather(*(
+                backend.client.generate(model=model, prompt="", keep_alive=keep_alive) for model in models
+            )), timeout=timeout)
+
+        results = await asyncio.gather(*(load(backend) for backend in self.backends), return_exceptions=True)
+        warm = []
+        for backend, result in zip(self.backends, results):
+            if isinstance(result, BaseException):
+                backend.failures = self.max_failures
+                backend.ejected_until = time.monotonic() + self.eject_seconds
+                self.logger.warning(f"Ollama backend {backend.name} failed to warm up, ejected for "
+                                    f"{self.eject_seconds}s: {result!r}")
+            else:
+                warm.append(backend)
+        if not warm:
+            error = results[0]
+            raise error if isinstance(error, Exception) else NoHealthyBackendError("No Ollama backend warmed up")
+        return warm
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(self.health_check_interval)
+            await asyncio.gather(*(self._check(backend) for backend in self.backends))
+
+    async def _check(self, backend: OllamaBackend):
+        try:
+            await asyncio.wait_for(backend.client.ps(), timeout=self.health_check_interval)
+        except Exception as e:
+            if backend.available:
+                backend.ejected_until = time.monotonic() + self.eject_seconds
+                self.logger.warning(f"Ollama backend {backend.name} failed its health check: {e}")
+            return
+        if not backend.available or backend.failures:
+            self.logger.info(f"Ollama backend {backend.name} is healthy again")
+        backend.failures = 0
+        backend.ejected_until = 0.0
@@ -0,0 +1,224 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+# Two-tier (in-memory LRU + SQLite) cache for LLM responses. Entries are content
+# addressed by model name, prompt and generation options. The async aget/aset
+# keep SQLite I/O off the event loop; get/set are for synchronous callers.
+class ResponseCache:
+    ACCESS_FLUSH_SIZE = 256  # pending accessed_at updates written in one go
+    def __init__(self, path: Optional[str] = None, max_memory_entries: int = 256,
+                 max_disk_entries: int = 10000, ttl: Optional[float] = 7 * 24 * 3600):
+        self.path = path
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self.ttl = ttl
+
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Guards the SQLite connection separately, so memory hits never wait for disk I/O
+        self._disk_lock = threading.Lock()
+        self._accessed: Dict[str, float] = {}
+        self._disk_entries = 0
+        self.hits = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._conn = None
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses (accessed_at)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_created ON responses (created_at)")
+            self._conn.commit()
+            self._disk_entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    @staticmethod
+    def make_key(model: str, prompt: str, options: Optional[Dict[str, Any]] = None) -> str:
+        payload = json.dumps({"model": model, "prompt": prompt, "options": options or {}},
+                             sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _expired(self, created_at: float, now: float) -> bool:
+        return self.ttl is not None and now - created_at > self.ttl
+
+    def _memory_get(self, key: str, now: float) -> Optional[str]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            value, created_at = entry
+            if self._expired(created_at, now):
+                del self._memory[key]
+                return None
+            self._memory.move_to_end(key)
+            self.hits += 1
+            self.memory_hits += 1
+            return value
+
+    def _disk_get(self, key: str, now: float) -> Optional[tuple]:
+        with self._disk_lock:
+            if self._conn is None:
+                return None
+            row = self._conn.execute("SELECT value, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if self._expired(row[1], now):
+                self._disk_entries -= self._conn.execute("DELETE FROM responses WHERE key = ?", (key,)).rowcount
+                self._conn.commit()
+                return None
+            # accessed_at is written with the next insert instead of committing on every hit
+            self._accessed[key] = now
+            if len(self._accessed) >= self.ACCESS_FLUSH_SIZE:
+                self._flush_accessed()
+                self._conn.commit()
+            return row
+
+    def _disk_result(self, key: str, row: Optional[tuple]) -> Optional[str]:
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            value, created_at = row
+            self._remember(key, value, created_at)
+            self.hits += 1
+            self.disk_hits += 1
+            return value
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        value = self._memory_get(key, now)
+        if value is not None:
+            return value
+        return self._disk_result(key, self._disk_get(key, now) if self._conn is not None else None)
+
+    async def aget(self, key: str) -> Optional[str]:
+        # Same as get, but the SQLite tier is read in a worker thread instead of on the event loop
+        now = time.time()
+        value = self._memory_get(key, now)
+        if value is not None:
+            return value
+        row = await asyncio.to_thread(self._disk_get, key, now) if self._conn is not None else None
+        return self._disk_result(key, row)
+
+    def _disk_set(self, key: str, value: str, now: float):
+        with self._disk_lock:
+            if self._conn is None:
+                return
+            exists = self._conn.execute("SELECT 1 FROM responses WHERE key = ?", (key,)).fetchone() is not None
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, now, now)
+            )
+            if not exists:
+                self._disk_entries += 1
+            self._accessed.pop(key, None)
+            self._flush_accessed()
+            self._evict_disk()
+            self._conn.commit()
+
+    def set(self, key: str, value: str):
+        now = time.time()
+        with self._lock:
+            self._remember(key, value, now)
+        if self._conn is not None:
+            self._disk_set(key, value, now)
+
+    async def aset(self, key: str, value: str):
+        # Same as set, with the SQLite write in a worker thread
+        now = time.time()
+        with self._lock:
+            self._remember(key, value, now)
+        if self._conn is not None:
+            await asyncio.to_thread(self._disk_set, key, value, now)
+
+    def _remember(self, key: str, value: str, created_at: float):
+        self._memory[key] = (value, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _flush_accessed(self):
+        if self._accessed:
+            self._conn.executemany("UPDATE responses SET accessed_at = ? WHERE key = ?",
+                                   [(accessed_at, key) for key, accessed_at in self._accessed.items()])
+            self._accessed.clear()
+
+    def _evict_disk(self):
+        # The row count is kept in _disk_entries rather than counted on every write
+        if self.ttl is not None:
+            self._disk_entries -= self._conn.execute(
+                "DELETE FROM responses WHERE created_at < ?", (time.time() - self.ttl,)
+            ).rowcount
+        if self._disk_entries > self.max_disk_entries:
+            # Drop the least recently used rows first
+            self._disk_entries -= self._conn.execute("""
+                DELETE FROM responses WHERE key IN (
+                    SELECT key FROM responses ORDER BY accessed_at ASC LIMIT ?
+                )
+            """, (self._disk_entries - self.max_disk_entries,)).rowcount
+
+    def preload(self, limit: Optional[int] = None) -> int:
+        # Fills the memory tier with the most recently used disk entries, e.g. at startup
+        if self._conn is None:
+            return 0
+        limit = min(limit or self.max_memory_entries, self.max_memory_entries)
+        with self._disk_lock:
+            self._flush_accessed()
+            rows = self._conn.execute(
+                "SELECT key, value, created_at FROM responses ORDER BY accessed_at DESC LIMIT ?", (limit,)
+            ).fetchall()
+        with self._lock:
+            now = time.time()
+            # Oldest first, so the most recent entries end up at the MRU end
+            for key, value, created_at in reversed(rows):
+                if not self._expired(created_at, now):
+                    self._remember(key, value, created_at)
+            return len(self._memory)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        with self._disk_lock:
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM responses")
+                self._conn.commit()
+                self._accessed.clear()
+                self._disk_entries = 0
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "memory_entries": len(self._memory),
+            "disk_entries": self._disk_entries,
+        }
+
+    def close(self):
+        with self._disk_lock:
+            if self._conn is not None:
+                self._flush_accessed()
+                self._conn.commit()
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,229 @@
+import asyncio
+import json
+import os
+import threading
+import time
+import numpy as np
+from typing import List, Dict, Any, Optional
+from .logger import setup_logger
+
+def chunk_text(text: str, chunk_size: int = 120, overlap: int = 20) -> List[str]:
+    # Splits text into overlapping windows of roughly chunk_size words
+    words = text.split()
+    if len(words) <= chunk_size:
+        return [" ".join(words)] if words else []
+    step = max(chunk_size - overlap, 1)
+    return [" ".join(words[start:start + chunk_size])
+            for start in range(0, len(words) - overlap, step)]
+
+# Dense vector index over passage embeddings. Vectors are L2-normalised on insert
+# so cosine similarity is a single matrix-vector product.
+# The matrix loaded from disk (memory-mapped with memory_map) is never copied;
+# vectors added later go into an in-memory buffer that grows in GROW_ROWS chunks.
+# Rows are numbered across both, and each paper's rows are kept in a map so a
+# search restricted to a few papers only scores those rows.
+class VectorIndex:
+    GROW_ROWS = 4096
+
+    def __init__(self, path: Optional[str] = None, memory_map: bool = False, autosave_interval: float = 60.0):
+        self.path = path
+        self.memory_map = memory_map
+        self.autosave_interval = autosave_interval
+        self.logger = setup_logger(__name__)
+        self._lock = threading.RLock()
+        # Serialises saves, which write outside _lock so searches keep running
+        self._save_lock = threading.Lock()
+        self._base: Optional[np.ndarray] = None
+        self._added: Optional[np.ndarray] = None
+        self._added_rows = 0
+        self.passages: List[Dict[str, Any]] = []
+        self._rows: Dict[str, List[int]] = {}
+        self._dirty = False
+        self._last_save = time.monotonic()
+
+        if path and os.path.exists(self._vectors_path):
+            self.load()
+
+    @property
+    def _vectors_path(self) -> str:
+        return self.path + ".npy"
+
+    @property
+    def _passages_path(self) -> str:
+        return self.path + ".json"
+
+    @property
+    def paper_ids(self):
+        return self._rows.keys()
+
+    def __len__(self) -> int:
+        return len(self.passages)
+
+    def add(self, passages: List[Dict[str, Any]], vectors: np.ndarray):
+        if not passages:
+            return
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.maximum(norms, 1e-12)
+        with self._lock:
+            # Papers are indexed whole, so passages of a paper already present are duplicates
+            keep = [i for i, passage in enumerate(passages) if passage["paper_id"] not in self._rows]
+            if len(keep) < len(passages):
+                if not keep:
+                    return
+                passages = [passages[i] for i in keep]
+                vectors = vectors[keep]
+
+            needed = self._added_rows + len(vectors)
+            if self._added is None or needed > len(self._added):
+                grown = np.empty((max(needed, self._added_rows + self.GROW_ROWS), vectors.shape[1]), dtype=np.float32)
+                if self._added_rows:
+                    grown[:self._added_rows] = self._added[:self._added_rows]
+                self._added = grown
+            self._added[self._added_rows:needed] = vectors
+            self._added_rows = needed
+
+            for row, passage in enumerate(passages, start=len(self.passages)):
+                self._rows.setdefault(passage["paper_id"], []).append(row)
+            self.passages.extend(passages)
+            self._dirty = True
+        self._maybe_autosave()
+
+    def _matrices(self) -> List[np.ndarray]:
+        # The loaded matrix and the filled part of the added buffer, in row order
+        matrices = [self._base] if self._base is not None else []
+        if self._added_rows:
+            matrices.append(self._added[:self._added_rows])
+        return matrices
+
+    def search(self, query_vector: np.ndarray, k: int = 5,
+               paper_ids: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            if not self.passages:
+                return []
+            query = np.asarray(query_vector, dtype=np.float32).ravel()
+            query = query / max(float(np.linalg.norm(query)), 1e-12)
+
+            if paper_ids is None:
+                rows = None
+                scores = np.concatenate([matrix @ query for matrix in self._matrices()])
+            else:
+                rows = np.fromiter((row for paper_id in dict.fromkeys(paper_ids)
+                                    for row in self._rows.get(paper_id, ())), dtype=np.intp)
+                if not len(rows):
+                    return []
+                base_rows = len(self._base) if self._base is not None else 0
+                loaded, added = rows[rows < base_rows], rows[rows >= base_rows] - base_rows
+                scores = np.concatenate([self._base[loaded] @ query if len(loaded) else np.empty(0, np.float32),
+                                         self._added[added] @ query if len(added) else np.empty(0, np.float32)])
+                rows = np.concatenate([loaded, added + base_rows])
+
+            k = min(k, len(scores))
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [{**self.passages[i if rows is None else rows[i]], "score": float(scores[i])} for i in top]
+
+    def preload(self):
+        # Touches every page of a memory-mapped matrix so the first search does not fault it in
+        with self._lock:
+            if self._base is not None and self.memory_map:
+                float(np.asarray(self._base).sum())
+
+    def _maybe_autosave(self):
+        if self.path and time.monotonic() - self._last_save >= self.autosave_interval:
+            self.save()
+
+    def save(self):
+        if not self.path:
+            return
+        with self._save_lock:
+            # Rows and passages are append-only, so a snapshot of the current counts stays
+            # valid while it is written; only taking it needs the lock
+            with self._lock:
+                if not self._dirty or not self.passages:
+                    return
+                matrices = self._matrices()
+                passages = list(self.passages)
+                self._dirty = False
+                self._last_save = time.monotonic()
+            try:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                vectors = np.concatenate(matrices) if len(matrices) > 1 else np.ascontiguousarray(matrices[0])
+                with open(self._vectors_path + ".tmp", "wb") as f:
+                    np.save(f, vectors)
+                with open(self._passages_path + ".tmp", "w", encoding="utf-8") as f:
+                    json.dump(passages, f)
+                os.replace(self._vectors_path + ".tmp", self._vectors_path)
+                os.replace(self._passages_path + ".tmp", self._passages_path)
+            except Exception:
+                self._dirty = True
+                raise
+        self.logger.info(f"Saved vector index with {len(passages)} passages to {self.path}")
+
+    def load(self):
+        with self._lock:
+            # With memory_map the matrix stays on disk and pages in on demand
+            self._base = np.load(self._vectors_path, mmap_mode="r" if self.memory_map else None)
+            self._added, self._added_rows = None, 0
+            with open(self._passages_path, encoding="utf-8") as f:
+                self.passages = json.load(f)
+            self._rows = {}
+            for row, passage in enumerate(self.passages):
+                self._rows.setdefault(passage["paper_id"], []).append(row)
+            self._dirty = False
+        self.logger.info(f"Loaded vector index with {len(self.passages)} passages from {self.path}")
+
+class PassageRetriever:
+    def __init__(self, encoder, index: VectorIndex, chunk_size: int = 120, overlap: int = 20):
+        self.encoder = encoder
+        self.index = index
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+        # Papers being embedded right now; concurrent callers wait for them instead of embedding again
+        self._in_flight: Dict[str, asyncio.Future] = {}
+
+    async def index_papers(self, papers: List[Dict[str, Any]]) -> int:
+        # Only papers that are not in the index yet are chunked and embedded
+        passages = []
+        claimed: Dict[str, asyncio.Future] = {}
+        waiting = []
+        for paper in papers:
+            paper_id = paper.get("id") or paper["title"]
+            if paper_id in self.index.paper_ids or paper_id in claimed:
+                continue
+            if paper_id in self._in_flight:
+                waiting.append(self._in_flight[paper_id])
+                continue
+            claimed[paper_id] = self._in_flight[paper_id] = asyncio.get_running_loop().create_future()
+            text = paper.get("full_text") or paper.get("abstract") or ""
+            for position, chunk in enumerate(chunk_text(text, self.chunk_size, self.overlap)):
+                passages.append({"paper_id": paper_id, "title": paper["title"], "position": position, "text": chunk})
+
+        try:
+            if passages:
+                vectors = await self.encoder.embed([passage["text"] for passage in passages])
+                # In a thread, since the add may trigger a periodic save of the index
+                await asyncio.to_thread(self.index.add, passages, vectors)
+        except BaseException as e:
+            for future in claimed.values():
+                if not future.done():
+                    future.set_exception(e if isinstance(e, Exception) else asyncio.CancelledError())
+            raise
+        else:
+            for future in claimed.values():
+                future.set_result(None)
+        finally:
+            for paper_id in claimed:
+                self._in_flight.pop(paper_id, None)
+
+        if waiting:
+            await asyncio.gather(*waiting)
+        return len(passages)
+
+    async def retrieve(self, question: str, papers: List[Dict[str, Any]], k: int = 6) -> List[Dict[str, Any]]:
+        await self.index_papers(papers)
+        query_vector = (await self.encoder.embed([question]))[0]
+        paper_ids = [paper.get("id") or paper["title"] for paper in papers]
+        return self.index.search(query_vector, k=k, paper_ids=paper_ids)
@@ -0,0 +1,357 @@
+import asyncio
+import hashlib
+import json
+import re
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Dict, Any, Optional, Set
+from urllib.parse import urlparse, parse_qs
+from xml.sax.saxutils import escape
+
+from backend.database.neo4j_client import paper_key, paper_year, related_papers_query, related_beam, timeline_prefix_length
+
+WORDS = ("graph", "neural", "network", "transformer", "attention", "retrieval", "language", "model",
+         "learning", "vision", "reinforcement", "policy", "diffusion", "generative", "benchmark",
+         "optimization", "robust", "efficient", "sparse", "embedding")
+
+def _words(seed: str, count: int) -> List[str]:
+    digest = hashlib.sha256(seed.encode("utf-8")).digest()
+    return [WORDS[digest[i % len(digest)] % len(WORDS)] for i in range(count)]
+
+class _BackgroundServer:
+    handler_class = BaseHTTPRequestHandler
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        handler = type("Handler", (self.handler_class,), {"fake": self})
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+class _OllamaHandler(BaseHTTPRequestHandler):
+    fake = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_json(self) -> Dict[str, Any]:
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _send_json(self, payload: Dict[str, Any]):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.startswith("/api/tags") or self.path.startswith("/api/ps"):
+            self._send_json({"models": [{"name": self.fake.model_name, "model": self.fake.model_name}]})
+        else:
+            self.send_error(404)
+
+    def do_POST(self):
+        path = urlparse(self.path).path
+        request = self._read_json()
+        if path == "/api/generate":
+            self._generate(request)
+        elif path == "/api/embed":
+            texts = request.get("input") or []
+            texts = [texts] if isinstance(texts, str) else texts
+            self._send_json({"model": request.get("model"), "embeddings": [self.fake.embed(t) for t in texts]})
+        else:
+            self.send_error(404)
+
+    def _generate(self, request: Dict[str, Any]):
+        fake = self.fake
+        fake.record_request()
+        prompt = request.get("prompt") or ""
+        tokens = fake.tokens_for(prompt)
+        context = list(request.get("context") or []) + [len(prompt), len(tokens)]
+        time.sleep(fake.first_token_latency)
+
+        stats = {
+            "load_duration": 0,
+            "prompt_eval_count": len(prompt) // 4,
+            "prompt_eval_duration": int(fake.first_token_latency * 1e9),
+            "eval_count": len(tokens),
+            "eval_duration": int(len(tokens) / fake.tokens_per_second * 1e9),
+        }
+        if not request.get("stream", True):
+            time.sleep(len(tokens) / fake.tokens_per_second)
+            self._send_json({"model": request.get("model"), "created_at": datetime.now().isoformat() + "Z",
+                             "response": "".join(tokens), "done": True, "done_reason": "stop",
+                             "context": context, **stats})
+            return
+
+        # Streamed responses are newline-delimited JSON, ending with the stats chunk
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        for token in tokens:
+            time.sleep(1 / fake.tokens_per_second)
+            chunk = {"model": request.get("model"), "created_at": datetime.now().isoformat() + "Z",
+                     "response": token, "done": False}
+            self.wfile.write((json.dumps(chunk) + "\n").encode("utf-8"))
+            self.wfile.flush()
+        final = {"model": request.get("model"), "created_at": datetime.now().isoformat() + "Z",
+                 "response": "", "done": True, "done_reason": "stop", "context": context, **stats}
+        self.wfile.write((json.dumps(final) + "\n").encode("utf-8"))
+        self.wfile.flush()
+        self.close_connection = True
+
+class FakeOllamaServer(_BackgroundServer):
+    # Deterministic stand-in for the Ollama HTTP API: /api/generate (streaming and not),
+    # /api/embed and /api/tags, with configurable first-token latency and token rate
+    handler_class = _OllamaHandler
+
+    def __init__(self, first_token_latency: float = 0.05, tokens_per_second: float = 200.0,
+                 response_tokens: int = 40, embedding_dim: int = 64, model_name: str = "mistral:latest",
+                 host: str = "127.0.0.1", port: int = 0):
+        self.first_token_latency = first_token_latency
+        self.tokens_per_second = tokens_per_second
+        self.response_tokens = response_tokens
+        self.embedding_dim = embedding_dim
+        self.model_name = model_name
+        self.requests = 0
+        self._lock = threading.Lock()
+        super().__init__(host, port)
+
+    def record_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def tokens_for(self, prompt: str) -> List[str]:
+        if "JSON" in prompt:
+            # Enrichment prompts ask for a JSON object
+            return [json.dumps({"summary": " ".join(_words(prompt, 12)),
+                                "keywords": _words(prompt + "k", 4),
+                                "digest": " ".join(_words(prompt + "d", 10))})]
+        return [word + " " for word in _words(prompt, self.response_tokens)]
+
+    def embed(self, text: str) -> List[float]:
+        vector = [0.0] * self.embedding_dim
+        for word in re.findall(r"[a-z0-9]+", text.lower()):
+            vector[int(hashlib.md5(word.encode("utf-8")).hexdigest(), 16) % self.embedding_dim] += 1.0
+        return vector
+
+class _ArxivHandler(BaseHTTPRequestHandler):
+    fake = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        params = parse_qs(urlparse(self.path).query)
+        query = params.get("search_query", [""])[0]
+        start = int(params.get("start", ["0"])[0])
+        max_results = int(params.get("max_results", ["10"])[0])
+        body = self.fake.feed(query, start, max_results).encode("utf-8")
+        time.sleep(self.fake.latency)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/atom+xml")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+class FakeArxivServer(_BackgroundServer):
+    # Serves canned Atom feeds shaped like the arXiv API. Results are generated
+    # deterministically from the query, honouring the submittedDate range.
+    handler_class = _ArxivHandler
+
+    _DATE_RANGE = re.compile(r"submittedDate:\[(\d{4})\d*\s+TO\s+(\d{4})\d*\]")
+
+    def __init__(self, results_per_query: int = 200, latency: float = 0.02,
+                 host: str = "127.0.0.1", port: int = 0):
+        self.results_per_query = results_per_query
+        self.latency = latency
+        super().__init__(host, port)
+
+    def feed(self, query: str, start: int, max_results: int) -> str:
+        match = self._DATE_RANGE.search(query)
+        start_year, end_year = (int(match.group(1)), int(match.group(2))) if match else (2015, 2024)
+        topic = self._DATE_RANGE.sub("", query).replace("AND", "").strip(" ()")
+        seed = int(hashlib.md5(topic.encode("utf-8")).hexdigest()[:6], 16)
+
+        entries = []
+        for index in range(start, min(start + max_results, self.results_per_query)):
+            year = end_year - index % (end_year - start_year + 1)
+            arxiv_id = f"{year % 100:02d}{(seed + index) % 12 + 1:02d}.{(seed + index) % 100000:05d}"
+            title = f"{topic.title()} {' '.join(_words(f'{topic}{index}', 5)).title()}"
+            abstract = f"We study {topic}. " + " ".join(_words(f"{topic}{index}abstract", 120)) + "."
+            entries.append(f"""<entry>
+<id>http://arxiv.org/abs/{arxiv_id}v1</id>
+<published>{year}-06-{index % 28 + 1:02d}T00:00:00Z</published>
+<title>{escape(title)}</title>
+<summary>{escape(abstract)}</summary>
+<author><name>Author {index % 17}</name></author>
+<author><name>Author {(index * 7) % 23}</name></author>
+<link title="pdf" href="http://arxiv.org/pdf/{arxiv_id}v1" rel="related" type="application/pdf"/>
+</entry>""")
+
+        return f"""<?xml version="1.0" encoding="UTF-8"?>
+<feed xmlns="http://www.w3.org/2005/Atom" xmlns:opensearch="http://a9.com/-/spec/opensearch/1.1/">
+<opensearch:totalResults>{self.results_per_query}</opensearch:totalResults>
+{"".join(entries)}
+</feed>"""
+
+class InMemoryNeo4jClient:
+    # Dict-backed stand-in for AsyncNeo4jClient with the same public methods,
+    # plus an optional fixed per-call latency to model the network round trip
+    def __init__(self, search_index=None, latency: float = 0.0):
+        self.search_index = search_index
+        self.latency = latency
+        self.papers: Dict[str, Dict[str, Any]] = {}
+        self.related: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    async def _round_trip(self):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    async def close(self):
+        pass
+
+    async def ensure_schema(self):
+        pass
+
+    async def warm_up(self, connections: int = 1):
+        await self._round_trip()
+
+    async def add_paper(self, paper_data: Dict[str, Any]):
+        await self.add_papers([paper_data])
+
+    async def add_papers(self, papers: List[Dict[str, Any]], batch_size: Optional[int] = None) -> int:
+        await self._round_trip()
+        written = 0
+        with self._lock:
+            for paper in papers:
+                key = paper_key(paper)
+                if key is None:
+                    continue
+                stored = self.papers.setdefault(key, {"id": key, "topic": paper.get("topic"), "topics": set()})
+                stored.update({k: v for k, v in paper.items() if k not in ("score", "topic")})
+                stored["year"] = paper_year(paper)
+                if paper.get("topic"):
+                    stored["topics"].add(paper["topic"])
+                written += 1
+        if self.search_index is not None:
+            await asyncio.to_thread(self.search_index.add_papers, papers)
+        return written
+
+    async def tag_papers(self, paper_ids: List[str], topic: str) -> int:
+        await self._round_trip()
+        tagged = 0
+        with self._lock:
+            for paper_id in paper_ids:
+                if paper_id in self.papers and topic not in self.papers[paper_id]["topics"]:
+                    self.papers[paper_id]["topics"].add(topic)
+                    tagged += 1
+        return tagged
+
+    async def get_enriched_ids(self, paper_ids: List[str]) -> Set[str]:
+        await self._round_trip()
+        with self._lock:
+            return {paper_id for paper_id in paper_ids
+                    if paper_id in self.papers and self.papers[paper_id].get("enriched_at")}
+
+    @staticmethod
+    def _public(paper: Dict[str, Any]) -> Dict[str, Any]:
+        # Node properties as Neo4j would return them; topic membership is not one of them
+        return {k: v for k, v in paper.items() if k != "topics"}
+
+    async def get_papers_by_topic(self, topic: str, start_year: int, end_year: int,
+                            limit: Optional[int] = None, skip: int = 0) -> List[Dict]:
+        await self._round_trip()
+        with self._lock:
+            papers = [self._public(p) for p in self.papers.values()
+                      if topic in p["topics"] and p.get("year") is not None and start_year <= p["year"] <= end_year]
+        papers.sort(key=lambda p: p.get("published_date") or "", reverse=True)
+        return papers[skip:skip + limit if limit is not None else None]
+
+    async def count_papers_by_topic(self, topic: str, start_year: int, end_year: int) -> int:
+        return len(await self.get_papers_by_topic(topic, start_year, end_year))
+
+    async def get_topic_timeline(self, topic: str, start_year: int, end_year: int,
+                                 granularity: str = "year") -> List[Dict[str, Any]]:
+        length = timeline_prefix_length(granularity)
+        counts: Dict[str, int] = {}
+        for paper in await self.get_papers_by_topic(topic, start_year, end_year):
+            period = (paper.get("published_date") or "")[:length]
+            counts[period] = counts.get(period, 0) + 1
+        return [{"period": period, "count": count} for period, count in sorted(counts.items())]
+
+    async def get_paper_by_title(self, title: str) -> Optional[Dict[str, Any]]:
+        result = await self.get_papers_by_titles([title])
+        return result["papers"][0] if result["papers"] else None
+
+    async def get_papers_by_titles(self, titles: List[str]) -> Dict[str, Any]:
+        await self._round_trip()
+        with self._lock:
+            by_title = {p.get("title"): p for p in self.papers.values()}
+            papers, missing = [], []
+            for title in titles:
+                paper = by_title.get(title) or self.papers.get(title)
+                if paper is not None:
+                    papers.append(self._public(paper))
+                else:
+                    missing.append(title)
+        return {"papers": papers, "missing": missing}
+
+    async def add_relations(self, edges: List[Dict[str, Any]], batch_size: Optional[int] = None) -> int:
+        await self._round_trip()
+        with self._lock:
+            for edge in edges:
+                self.related.setdefault(edge["source"], {})[edge["target"]] = edge["weight"]
+                self.related.setdefault(edge["target"], {})[edge["source"]] = edge["weight"]
+        return len(edges)
+
+    async def get_related_papers(self, paper_id: str, hops: int = 1, limit: int = 20) -> List[Dict[str, Any]]:
+        related_papers_query(hops)  # same validation as the real client
+        await self._round_trip()
+        with self._lock:
+            # Same hop-by-hop expansion as the Cypher query: each hop keeps the
+            # related_beam(limit) best papers not found at an earlier hop
+            best: Dict[str, tuple] = {}
+            frontier = {paper_id: 1.0}
+            for depth in range(1, hops + 1):
+                candidates: Dict[str, float] = {}
+                for node, score in frontier.items():
+                    for other, weight in self.related.get(node, {}).items():
+                        if other == paper_id or other in best:
+                            continue
+                        candidates[other] = max(candidates.get(other, 0.0), score * weight)
+                kept = sorted(candidates.items(), key=lambda item: item[1], reverse=True)[:related_beam(limit)]
+                frontier = dict(kept)
+                best.update((other, (score, depth)) for other, score in kept)
+            ranked = sorted(best.items(), key=lambda item: item[1][0], reverse=True)[:limit]
+            return [{**self._public(self.papers[other]), "score": score, "hops": depth}
+                    for other, (score, depth) in ranked if other in self.papers]
+
+    async def update_paper_metadata(self, paper_id: str, metadata: Dict[str, Any]):
+        await self._round_trip()
+        with self._lock:
+            if paper_id in self.papers:
+                self.papers[paper_id].update(metadata)
@@ -0,0 +1,224 @@
+import argparse
+import asyncio
+import contextlib
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import List, Dict, Any
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fakes import FakeOllamaServer, FakeArxivServer, InMemoryNeo4jClient
+
+TOPICS = ("graph neural networks", "retrieval augmented generation", "diffusion models",
+          "reinforcement learning", "vision transformers", "sparse attention",
+          "language model evaluation", "robust optimization")
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+
+def percentile(values: List[float], q: float) -> float:
+    # Nearest-rank percentile
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        weights[name.strip()] = float(weight or 1)
+    return weights
+
+def configure_environment(args, ollama: List[FakeOllamaServer], arxiv: FakeArxivServer, cache_dir: str):
+    # Config reads the environment at import time, so this must run before the app is imported
+    os.environ.update({
+        "OLLAMA_HOST": ollama[0].url,
+        "OLLAMA_HOSTS": ",".join(server.url for server in ollama),
+        "ARXIV_API_URL": f"{arxiv.url}/api/query",
+        "ARXIV_MIN_INTERVAL": "0",
+        "CACHE_DIR": cache_dir,
+        "LLM_CACHE_ENABLED": "true" if args.llm_cache else "false",
+        "LLM_MAX_CONCURRENCY": str(args.llm_concurrency),
+        "LLM_MAX_QUEUE_SIZE": str(args.llm_queue_size),
+        "ENRICHMENT_ENABLED": "true" if args.enrichment else "false",
+        "SEARCH_MODE": args.search_mode,
+    })
+
+def build_request(endpoint: str, rng: random.Random, titles: Dict[str, List[str]]) -> Dict[str, Any]:
+    topic = rng.choice(TOPICS)
+    if endpoint == "search_papers":
+        return {"topic": topic, "start_year": 2019, "end_year": 2024}
+    if endpoint == "ask_question":
+        return {"text": f"What are the main open problems in {topic}?", "papers": titles.get(topic, [])}
+    if endpoint == "generate_review":
+        return {"topic": topic}
+    raise ValueError(f"Unknown endpoint '{endpoint}'")
+
+async def run_load(client, args, titles: Dict[str, List[str]]) -> Dict[str, Any]:
+    from backend.models.llm_manager import LLM_REJECTED
+
+    weights = parse_mix(args.mix)
+    endpoints, endpoint_weights = list(weights), list(weights.values())
+    rng = random.Random(args.seed)
+    plan = [rng.choices(endpoints, endpoint_weights)[0] for _ in range(args.requests)]
+    payloads = [build_request(endpoint, rng, titles) for endpoint in plan]
+
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    errors: Dict[str, int] = defaultdict(int)
+    cursor = iter(range(len(plan)))
+
+    rejected_before = LLM_REJECTED.value()
+
+    async def worker():
+        for index in cursor:
+            endpoint = plan[index]
+            started = time.perf_counter()
+            try:
+                response = await client.post(f"/{endpoint}", json=payloads[index])
+                if response.status_code != 200:
+                    errors[endpoint] += 1
+            except Exception:
+                errors[endpoint] += 1
+            latencies[endpoint].append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+
+    # Rejected prompts fail their request with a 503 and count as errors; the total also
+    # reports them separately, since background enrichment prompts can be rejected too
+    results = {"total": {"requests": len(plan), "seconds": elapsed, "throughput": len(plan) / elapsed,
+                         "llm_rejected": LLM_REJECTED.value() - rejected_before}}
+    for endpoint, values in latencies.items():
+        results[endpoint] = {
+            "requests": len(values),
+            "errors": errors[endpoint],
+            "throughput": len(values) / elapsed,
+            "p50": percentile(values, 50),
+            "p95": percentile(values, 95),
+            "p99": percentile(values, 99),
+        }
+    return results
+
+async def benchmark(args) -> Dict[str, Any]:
+    import httpx
+    from backend.api.main import create_app
+
+    # The app is built around the in-memory stand-in instead of a real Neo4j server
+    app = create_app(
+        db_client_factory=lambda search_index: InMemoryNeo4jClient(search_index=search_index,
+                                                                   latency=args.db_latency)
+    )
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+            # Load is only sent once the service reports ready, as an orchestrator would
+            while (await client.get("/health/ready")).status_code != 200:
+                await asyncio.sleep(0.05)
+
+            # Warm-up: populate the corpus so QA and review requests have papers to work with
+            titles = {}
+            for topic in TOPICS:
+                response = await client.post("/search_papers", json={
+                    "topic": topic, "start_year": 2019, "end_year": 2024, "max_results": 10, "mode": "remote"
+                })
+                titles[topic] = [paper["title"] for paper in response.json()["papers"]]
+            return await run_load(client, args, titles)
+
+def compare_to_baseline(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float,
+                        slack: float = 0.01) -> List[str]:
+    # Latencies must exceed the baseline by both the relative tolerance and the absolute
+    # slack (seconds) to count, so millisecond-scale endpoints do not fail on noise
+    regressions = []
+    for endpoint, expected in baseline.items():
+        actual = results.get(endpoint)
+        if actual is None:
+            continue
+        if actual["throughput"] < expected["throughput"] * (1 - tolerance):
+            regressions.append(f"{endpoint}: throughput {actual['throughput']:.2f}/s "
+                               f"< baseline {expected['throughput']:.2f}/s")
+        for key in ("p50", "p95", "p99"):
+            if key in expected and actual[key] > max(expected[key] * (1 + tolerance), expected[key] + slack):
+                regressions.append(f"{endpoint}: {key} {actual[key] * 1000:.1f}ms "
+                                   f"> baseline {expected[key] * 1000:.1f}ms")
+    return regressions
+
+def print_report(results: Dict[str, Any]):
+    total = results["total"]
+    print(f"{total['requests']} requests in {total['seconds']:.2f}s ({total['throughput']:.2f} req/s), "
+          f"{total['llm_rejected']:.0f} prompts rejected by the LLM queue")
+    if len(total.get("ollama_requests", [])) > 1:
+        print(f"Generations per Ollama backend: {', '.join(str(n) for n in total['ollama_requests'])}")
+    print(f"{'endpoint':<18}{'requests':>9}{'errors':>8}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for endpoint, stats in results.items():
+        if endpoint == "total":
+            continue
+        print(f"{endpoint:<18}{stats['requests']:>9}{stats['errors']:>8}{stats['throughput']:>9.2f}"
+              f"{stats['p50'] * 1000:>10.1f}{stats['p95'] * 1000:>10.1f}{stats['p99'] * 1000:>10.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline load test of the API against local fakes")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--mix", default="search_papers=4,ask_question=4,generate_review=1",
+                        help="Comma separated endpoint=weight pairs")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--first-token-latency", type=float, default=0.05, help="Fake Ollama latency in seconds")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0, help="Fake Ollama generation speed")
+    parser.add_argument("--arxiv-latency", type=float, default=0.02)
+    parser.add_argument("--db-latency", type=float, default=0.002)
+    parser.add_argument("--llm-concurrency", type=int, default=4, help="LLM concurrency per Ollama backend")
+    parser.add_argument("--ollama-backends", type=int, default=1,
+                        help="Number of fake Ollama servers generations are routed over")
+    parser.add_argument("--llm-queue-size", type=int, default=1024,
+                        help="LLM admission queue size; rejected prompts are also reported separately")
+    parser.add_argument("--llm-cache", action="store_true", help="Enable the LLM response cache")
+    parser.add_argument("--enrichment", action="store_true", help="Run background enrichment during the test")
+    parser.add_argument("--search-mode", default="local_first")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Allowed relative regression against the baseline")
+    parser.add_argument("--slack", type=float, default=0.01,
+                        help="Absolute latency increase in seconds ignored when comparing to the baseline")
+    parser.add_argument("--output", help="Write the raw results as JSON")
+    args = parser.parse_args()
+
+    with contextlib.ExitStack() as stack:
+        ollama = [stack.enter_context(FakeOllamaServer(args.first_token_latency, args.tokens_per_second))
+                  for _ in range(args.ollama_backends)]
+        arxiv = stack.enter_context(FakeArxivServer(latency=args.arxiv_latency))
+        cache_dir = stack.enter_context(tempfile.TemporaryDirectory())
+        configure_environment(args, ollama, arxiv, cache_dir)
+        results = asyncio.run(benchmark(args))
+        results["total"]["ollama_requests"] = [server.requests for server in ollama]
+
+    print_report(results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump({k: v for k, v in results.items() if k != "total"}, f, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            regressions = compare_to_baseline(results, json.load(f), args.tolerance, args.slack)
+        if results["total"]["llm_rejected"]:
+            regressions.append(f"{results['total']['llm_rejected']:.0f} prompts rejected by the LLM queue")
+        if regressions:
+            print("Performance regressions against baseline:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print("No regressions against baseline")
+
+if __name__ == "__main__":
+    main()
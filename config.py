@@ -8,13 +8,80 @@ class Config:
     NEO4J_URI = os.getenv("NEO4J_URI", "neo4j+ssc://b451e670.databases.neo4j.io")
     NEO4J_USER = os.getenv("NEO4J_USER", "neo4j")
     NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD", "0KyT7Fxg-mo-R0i1y9jSfOX0NN9L-TTH_X7v1S9J1Qo")
+    NEO4J_BATCH_SIZE = int(os.getenv("NEO4J_BATCH_SIZE", "500"))
+    NEO4J_MAX_POOL_SIZE = int(os.getenv("NEO4J_MAX_POOL_SIZE", "50"))
+    NEO4J_ACQUISITION_TIMEOUT = float(os.getenv("NEO4J_ACQUISITION_TIMEOUT", "30"))  # seconds to wait for a pooled connection
+    NEO4J_MAX_CONNECTION_LIFETIME = float(os.getenv("NEO4J_MAX_CONNECTION_LIFETIME", "3600"))  # seconds
+    NEO4J_WARM_CONNECTIONS = int(os.getenv("NEO4J_WARM_CONNECTIONS", "4"))  # opened at startup
 
     # LLM configuration
     MODEL_NAME = os.getenv("MODEL_NAME", "mistral:latest")  # For Ollama
+    OLLAMA_HOST = os.getenv("OLLAMA_HOST")  # None uses the ollama client default
+    LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "2"))
+    LLM_MAX_QUEUE_SIZE = int(os.getenv("LLM_MAX_QUEUE_SIZE", "32"))
+    LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "120"))
+    OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "-1m")  # how long Ollama keeps models loaded; negative pins them
+    # Comma-separated Ollama hosts to spread generations over; empty uses OLLAMA_HOST
+    OLLAMA_HOSTS = [host.strip() for host in os.getenv("OLLAMA_HOSTS", "").split(",") if host.strip()]
+    SUMMARY_MODEL_NAME = os.getenv("SUMMARY_MODEL_NAME", "")  # smaller model for per-paper summaries; empty uses MODEL_NAME
+    LLM_MAX_FAILURES = int(os.getenv("LLM_MAX_FAILURES", "3"))  # consecutive failures before a host is ejected
+    LLM_EJECT_SECONDS = float(os.getenv("LLM_EJECT_SECONDS", "30"))
+    LLM_HEALTH_CHECK_INTERVAL = float(os.getenv("LLM_HEALTH_CHECK_INTERVAL", "10"))
+    QA_MAX_PAPERS = int(os.getenv("QA_MAX_PAPERS", "10"))
+
+    # Background enrichment of newly stored papers
+    ENRICHMENT_ENABLED = os.getenv("ENRICHMENT_ENABLED", "true").lower() == "true"
+    ENRICHMENT_WORKERS = int(os.getenv("ENRICHMENT_WORKERS", "1"))
+    ENRICHMENT_QUEUE_SIZE = int(os.getenv("ENRICHMENT_QUEUE_SIZE", "1000"))
+
+    # Precomputed RELATED_TO edges between stored papers
+    RELATIONS_ENABLED = os.getenv("RELATIONS_ENABLED", "true").lower() == "true"
+    RELATIONS_TOP_K = int(os.getenv("RELATIONS_TOP_K", "10"))  # neighbours kept per new paper
+    RELATIONS_MIN_WEIGHT = float(os.getenv("RELATIONS_MIN_WEIGHT", "0.2"))
+    RELATIONS_CANDIDATES = int(os.getenv("RELATIONS_CANDIDATES", "50"))  # lexical candidates scored per paper
+
+    # Review generation
+    REVIEW_MODE = os.getenv("REVIEW_MODE", "map_reduce")  # map_reduce or single
+    REVIEW_MAX_PAPERS = int(os.getenv("REVIEW_MAX_PAPERS", "50"))
+    REVIEW_FAN_IN = int(os.getenv("REVIEW_FAN_IN", "8"))
+    REVIEW_MAX_DEPTH = int(os.getenv("REVIEW_MAX_DEPTH", "3"))
+    JOB_WORKERS = int(os.getenv("JOB_WORKERS", "1"))
+    JOB_MAX_PENDING = int(os.getenv("JOB_MAX_PENDING", "100"))
+
+    # Passage retrieval for QA
+    RETRIEVAL_ENABLED = os.getenv("RETRIEVAL_ENABLED", "true").lower() == "true"
+    EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "nomic-embed-text")
+    EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))
+    QA_TOP_K = int(os.getenv("QA_TOP_K", "6"))
+    QA_MAX_SESSIONS = int(os.getenv("QA_MAX_SESSIONS", "1000"))
+    QA_SESSION_TTL = float(os.getenv("QA_SESSION_TTL", "1800"))  # idle seconds before a chat session expires
+    QA_SESSION_MAX_TOKENS = int(os.getenv("QA_SESSION_MAX_TOKENS", "8192"))  # longer contexts are rebuilt
+    VECTOR_INDEX_MMAP = os.getenv("VECTOR_INDEX_MMAP", "false").lower() == "true"
+
+    # arXiv configuration
+    ARXIV_API_URL = os.getenv("ARXIV_API_URL", "http://export.arxiv.org/api/query")
+    ARXIV_PAGE_SIZE = int(os.getenv("ARXIV_PAGE_SIZE", "50"))
+    ARXIV_MIN_INTERVAL = float(os.getenv("ARXIV_MIN_INTERVAL", "3"))  # seconds between arXiv API requests
+    SEARCH_MAX_RESULTS = int(os.getenv("SEARCH_MAX_RESULTS", "5"))
+    SEARCH_MODE = os.getenv("SEARCH_MODE", "local_first")  # local_first, remote or local
+    # Share of the query's terms a local index hit must contain to count toward a local answer
+    SEARCH_MIN_TERM_SHARE = float(os.getenv("SEARCH_MIN_TERM_SHARE", "0.6"))
+
+    # Local on-disk state (caches, indexes, queues)
+    CACHE_DIR = os.getenv("CACHE_DIR", "cache")
+    LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+    LLM_CACHE_MEMORY_ENTRIES = int(os.getenv("LLM_CACHE_MEMORY_ENTRIES", "256"))
+    LLM_CACHE_DISK_ENTRIES = int(os.getenv("LLM_CACHE_DISK_ENTRIES", "10000"))
+    LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+    PAPER_CACHE_ENABLED = os.getenv("PAPER_CACHE_ENABLED", "true").lower() == "true"
+    PAPER_CACHE_MAX_MB = float(os.getenv("PAPER_CACHE_MAX_MB", "64"))  # memory budget for cached paper reads
+    PAPER_CACHE_TTL = float(os.getenv("PAPER_CACHE_TTL", "600"))  # seconds a cached paper read is served
     
     # API configuration
     API_HOST = os.getenv("API_HOST", "localhost")
     API_PORT = int(os.getenv("API_PORT", "8000"))
+    TIMING_HEADERS = os.getenv("TIMING_HEADERS", "false").lower() == "true"  # Adds Server-Timing headers
+    WARMUP_RETRY_INTERVAL = float(os.getenv("WARMUP_RETRY_INTERVAL", "5"))  # seconds between failed warm-up attempts
     
     # Frontend configuration
     STREAMLIT_PORT = int(os.getenv("STREAMLIT_PORT", "8501"))
@@ -1,13 +1,54 @@
 import streamlit as st
 import requests
+from requests.adapters import HTTPAdapter
 from datetime import datetime
 import json
-from typing import List, Dict, Any
+import uuid
+from typing import List, Dict, Any, Optional
 import pandas as pd
+import time
+
+REQUEST_TIMEOUT = 30  # seconds, for quick status/submit calls
+POLL_INTERVAL = 2  # seconds between review job status checks
+PAGE_SIZE = 20  # papers per page in the papers list
+API_URL = "http://localhost:8000"  # Base URL for FastAPI backend
+STREAM_ERROR_MARKER = "\n\n[stream error] "  # ends a stream that failed after it started (see backend/api/main.py)
+
+@st.cache_resource
+def get_session() -> requests.Session:
+    # One pooled session per server process, so reruns reuse keep-alive connections
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+@st.cache_data(ttl=300, show_spinner=False)
+def fetch_timeline(topic: str, start_year: int, end_year: int, granularity: str) -> List[Dict[str, Any]]:
+    response = get_session().get(
+        f"{API_URL}/papers/timeline",
+        params={"topic": topic, "start_year": start_year, "end_year": end_year, "granularity": granularity},
+        timeout=REQUEST_TIMEOUT
+    )
+    response.raise_for_status()
+    return response.json()["buckets"]
+
+@st.cache_data(ttl=300, show_spinner=False)
+def fetch_papers_page(topic: str, start_year: int, end_year: int, page: int,
+                      page_size: int = PAGE_SIZE) -> Dict[str, Any]:
+    response = get_session().get(
+        f"{API_URL}/papers",
+        params={"topic": topic, "start_year": start_year, "end_year": end_year,
+                "page": page, "page_size": page_size},
+        timeout=REQUEST_TIMEOUT
+    )
+    response.raise_for_status()
+    return response.json()
 
 class ResearchAssistantUI:
     def __init__(self):
-        self.api_url = "http://localhost:8000"  # Base URL for FastAPI backend
+        self.api_url = API_URL
+        self.session = get_session()
         self.setup_session_state()
         self.setup_ui()
 
@@ -18,6 +59,15 @@ class ResearchAssistantUI:
             st.session_state.current_papers = []
         if 'current_topic' not in st.session_state:
             st.session_state.current_topic = ""
+        if 'review_job_id' not in st.session_state:
+            st.session_state.review_job_id = None
+        if 'review' not in st.session_state:
+            st.session_state.review = None
+        if 'year_range' not in st.session_state:
+            st.session_state.year_range = None
+        if 'chat_session_id' not in st.session_state:
+            # Lets the API keep the conversation (and the model's context) between questions
+            st.session_state.chat_session_id = uuid.uuid4().hex
 
     def setup_ui(self):
         st.title("Academic Research Assistant")
@@ -55,13 +105,20 @@ class ResearchAssistantUI:
 
     def search_papers(self, topic: str, start_year: int, end_year: int):
         try:
-            response = requests.post(
+            response = self.session.post(
                 f"{self.api_url}/search_papers",
-                json={"topic": topic, "start_year": start_year, "end_year": end_year}
+                json={"topic": topic, "start_year": start_year, "end_year": end_year},
+                timeout=REQUEST_TIMEOUT
             )
             if response.status_code == 200:
                 st.session_state.current_papers = response.json()["papers"]
                 st.session_state.current_topic = topic
+                st.session_state.year_range = (int(start_year), int(end_year))
+                # Questions about the new results start a new conversation
+                st.session_state.chat_session_id = uuid.uuid4().hex
+                # New search results may have been stored, so cached pages are stale
+                fetch_timeline.clear()
+                fetch_papers_page.clear()
                 st.success(f"Found {len(st.session_state.current_papers)} papers")
             else:
                 st.error("Failed to fetch papers")
@@ -69,24 +126,47 @@ class ResearchAssistantUI:
             st.error(f"Error: {str(e)}")
 
     def render_papers_timeline(self):
-        if not st.session_state.current_papers:
+        if not st.session_state.current_topic or not st.session_state.year_range:
             st.info("Search for a topic to see papers timeline")
             return
 
-        # Convert papers to DataFrame for better visualization
-        df = pd.DataFrame(st.session_state.current_papers)
-        df['published_date'] = pd.to_datetime(df['published_date'])
-        df = df.sort_values('published_date')
+        # The timeline and the list cover every stored paper for the topic, so both are
+        # aggregated and paginated by the backend instead of loaded into the page at once.
+        # The search stores its hits under the topic, so they are always among them.
+        topic = st.session_state.current_topic
+        start_year, end_year = st.session_state.year_range
 
-        # Create timeline visualization
         st.header("Papers Timeline")
-        fig = self.create_timeline_chart(df)
-        st.plotly_chart(fig)
+        granularity = st.radio("Group by", ["year", "month"], horizontal=True, key="timeline_granularity")
+        try:
+            buckets = fetch_timeline(topic, start_year, end_year, granularity)
+        except Exception as e:
+            st.error(f"Error: {str(e)}")
+            return
+        if buckets:
+            st.plotly_chart(self.create_timeline_chart(pd.DataFrame(buckets)))
 
-        # Display papers in a table
         st.header("Papers List")
-        for paper in st.session_state.current_papers:
-            with st.expander(f"{paper['title']} ({paper['published_date'][:10]})"):
+        total = sum(bucket["count"] for bucket in buckets)
+        pages = max(1, -(-total // PAGE_SIZE))
+        page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1, key="papers_page")
+        try:
+            result = fetch_papers_page(topic, start_year, end_year, int(page))
+        except Exception as e:
+            st.error(f"Error: {str(e)}")
+            return
+
+        if not result["papers"]:
+            st.info(f"No stored papers for '{topic}' in {start_year}-{end_year}")
+            return
+        first = (result["page"] - 1) * result["page_size"]
+        # Search hits are what the chat asks about, so they are marked in the wider list
+        found = {paper.get("id") or paper["title"] for paper in st.session_state.current_papers}
+        st.caption(f"Showing {first + 1}-{first + len(result['papers'])} of {result['total']} papers stored "
+                   f"for '{topic}'; the {len(found)} from your last search are marked ★ and used by the chat")
+        for paper in result["papers"]:
+            mark = "★ " if (paper.get("id") or paper["title"]) in found else ""
+            with st.expander(f"{mark}{paper['title']} ({paper['published_date'][:10]})"):
                 st.write(f"**Authors:** {', '.join(paper['authors'])}")
                 st.write(f"**Abstract:** {paper['abstract']}")
                 st.write(f"**URL:** {paper['url']}")
@@ -112,20 +192,21 @@ class ResearchAssistantUI:
             if prompt:
                 st.session_state.chat_history.append({"role": "user", "content": prompt})
                 
-                # Get response from API
+                # Stream the response from the API, rendering tokens as they arrive
                 try:
-                    response = requests.post(
-                        f"{self.api_url}/ask_question",
-                        json={
+                    answer = self.stream_to_placeholder(
+                        f"{self.api_url}/ask_question/stream",
+                        {
                             "text": prompt,
-                            "papers": [p["title"] for p in st.session_state.current_papers]
-                        }
+                            "papers": [p["title"] for p in st.session_state.current_papers],
+                            "session_id": st.session_state.chat_session_id
+                        },
+                        prefix="**Assistant:** "
                     )
-                    if response.status_code == 200:
-                        answer = response.json()["answer"]
+                    if answer:
                         st.session_state.chat_history.append({"role": "assistant", "content": answer})
-                    else:
-                        st.error("Failed to get response")
+                    elif answer is not None:
+                        st.error("Failed to get response: the model returned an empty answer")
                 except Exception as e:
                     st.error(f"Error: {str(e)}")
 
@@ -136,32 +217,98 @@ class ResearchAssistantUI:
             st.info("Search for a topic first to generate a review")
             return
 
+        # Reviews run as background jobs on the backend; the UI submits one and polls it
         if st.button("Generate Review"):
             try:
-                response = requests.post(
-                    f"{self.api_url}/generate_review",
-                    json={"topic": st.session_state.current_topic}
+                response = self.session.post(
+                    f"{self.api_url}/jobs/review",
+                    json={"topic": st.session_state.current_topic},
+                    timeout=REQUEST_TIMEOUT
                 )
                 if response.status_code == 200:
-                    review = response.json()["review"]
-                    st.markdown(review)
+                    st.session_state.review_job_id = response.json()["job_id"]
+                    st.session_state.review = None
                 else:
-                    st.error("Failed to generate review")
+                    st.error("Failed to start review generation")
             except Exception as e:
                 st.error(f"Error: {str(e)}")
 
+        if st.session_state.review_job_id:
+            if st.button("Cancel"):
+                try:
+                    self.session.delete(f"{self.api_url}/jobs/{st.session_state.review_job_id}", timeout=REQUEST_TIMEOUT)
+                except Exception as e:
+                    st.error(f"Error: {str(e)}")
+                st.session_state.review_job_id = None
+                st.info("Review generation cancelled")
+            else:
+                self.poll_review_job(st.session_state.review_job_id)
+
+        if st.session_state.review:
+            st.markdown(st.session_state.review)
+
+    def poll_review_job(self, job_id: str):
+        progress_bar = st.progress(0.0, text="Generating review...")
+        while True:
+            try:
+                response = self.session.get(f"{self.api_url}/jobs/{job_id}", timeout=REQUEST_TIMEOUT)
+                if response.status_code != 200:
+                    st.error("Failed to get review status")
+                    break
+                job = response.json()
+                progress_bar.progress(job["progress"], text=f"Generating review... ({job['status']})")
+
+                if job["status"] == "done":
+                    result = self.session.get(f"{self.api_url}/jobs/{job_id}/result", timeout=REQUEST_TIMEOUT)
+                    st.session_state.review = result.json()["review"]
+                    break
+                if job["status"] in ("failed", "cancelled"):
+                    st.error(f"Review generation {job['status']}: {job.get('error') or ''}")
+                    break
+            except Exception as e:
+                st.error(f"Error: {str(e)}")
+                break
+            time.sleep(POLL_INTERVAL)
+
+        st.session_state.review_job_id = None
+        progress_bar.empty()
+
+    @staticmethod
+    def stream_to_placeholder(url: str, payload: Dict[str, Any], prefix: str = "") -> Optional[str]:
+        # Renders a chunked text response incrementally and returns the full text, or None
+        # if the request failed or the stream ended with the API's error marker
+        placeholder = st.empty()
+        text = ""
+        # Only connecting is bounded: a long generation may legitimately pause between tokens
+        with get_session().post(url, json=payload, stream=True, timeout=(REQUEST_TIMEOUT, None)) as response:
+            if response.status_code != 200:
+                st.error(f"Failed to get response ({response.status_code})")
+                return None
+            response.encoding = response.encoding or "utf-8"
+            for chunk in response.iter_content(chunk_size=None, decode_unicode=True):
+                if chunk:
+                    text += chunk
+                    placeholder.markdown(prefix + text + "▌")
+        text, failed, error = text.partition(STREAM_ERROR_MARKER)
+        if failed:
+            placeholder.empty()
+            st.error(f"Generation failed: {error}")
+            return None
+        placeholder.markdown(prefix + text)
+        return text
+
     @staticmethod
     def create_timeline_chart(df: pd.DataFrame):
+        # df holds one row per period bucket ("period", "count") from /papers/timeline
         import plotly.express as px
         
-        fig = px.scatter(df, 
-                        x='published_date', 
-                        y=[1] * len(df),
-                        hover_data=['title', 'authors'],
-                        title='Papers Timeline')
+        fig = px.bar(df, 
+                     x='period', 
+                     y='count',
+                     labels={'period': 'Published', 'count': 'Papers'},
+                     title='Papers Timeline')
         
-        fig.update_traces(marker=dict(size=10))
-        fig.update_layout(yaxis_visible=False)
+        fig.update_layout(xaxis_type='category')
         
         return fig
 
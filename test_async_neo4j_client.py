@@ -0,0 +1,194 @@
+import asyncio
+from backend.database.async_neo4j_client import AsyncNeo4jClient
+from backend.database.neo4j_client import (
+    MERGE_PAPERS_QUERY, TAG_PAPERS_QUERY, PAPERS_BY_TITLES_QUERY, ENRICHED_PAPER_IDS_QUERY,
+    UPDATE_PAPER_METADATA_QUERY
+)
+from backend.database.search_index import BM25Index
+
+# Stand-ins for the neo4j driver, session, transaction and result objects. Every
+# query is recorded with its parameters and whether it ran in a read or a write
+# transaction; `respond(query, params)` supplies the records it returns.
+
+class FakeRecord(dict):
+    def data(self):
+        return dict(self)
+
+class FakeResult:
+    def __init__(self, records):
+        self.records = [FakeRecord(record) for record in records]
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for record in self.records:
+            yield record
+
+    async def single(self):
+        return self.records[0] if self.records else None
+
+    async def consume(self):
+        return None
+
+class FakeTransaction:
+    def __init__(self, driver, mode):
+        self.driver = driver
+        self.mode = mode
+
+    async def run(self, query, **params):
+        self.driver.queries.append((self.mode, query, params))
+        return FakeResult(self.driver.respond(query, params))
+
+class FakeSession:
+    def __init__(self, driver):
+        self.driver = driver
+
+    async def __aenter__(self):
+        self.driver.sessions += 1
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+    async def execute_read(self, work, *args):
+        return await work(FakeTransaction(self.driver, "read"), *args)
+
+    async def execute_write(self, work, *args):
+        return await work(FakeTransaction(self.driver, "write"), *args)
+
+    async def run(self, query, **params):
+        return await FakeTransaction(self.driver, "auto").run(query, **params)
+
+class FakeDriver:
+    def __init__(self, respond=lambda query, params: []):
+        self.respond = respond
+        self.queries = []
+        self.sessions = 0
+        self.closed = False
+
+    def session(self):
+        return FakeSession(self)
+
+    async def verify_connectivity(self):
+        pass
+
+    async def close(self):
+        self.closed = True
+
+def make_client(respond=lambda query, params: [], **kwargs):
+    # The real driver connects lazily, so it is simply swapped out before first use
+    client = AsyncNeo4jClient("bolt://localhost:7687", "neo4j", "password", **kwargs)
+    driver = FakeDriver(respond)
+    client.driver = driver
+    return client, driver
+
+def paper(index, topic="graphs"):
+    return {"id": f"2401.{index:05d}", "title": f"Paper {index}", "authors": ["A. Author"],
+            "abstract": "Graph neural networks", "published_date": f"2024-01-{index + 1:02d}",
+            "url": f"http://arxiv.org/pdf/2401.{index:05d}", "topic": topic}
+
+def test_add_papers_writes_batches_and_indexes():
+    async def run():
+        index = BM25Index()
+        client, driver = make_client(batch_size=2, search_index=index)
+        written = await client.add_papers([paper(i) for i in range(5)] + [{"abstract": "no key"}])
+        assert written == 5
+        assert [(mode, query) for mode, query, _ in driver.queries] == [("write", MERGE_PAPERS_QUERY)] * 3
+        rows = [row for _, _, params in driver.queries for row in params["rows"]]
+        assert [row["id"] for row in rows] == [f"2401.{i:05d}" for i in range(5)]
+        assert rows[0]["topic"] == "graphs" and "topic" not in rows[0]["props"]
+        assert rows[0]["props"]["year"] == 2024
+        assert len(index) == 5
+    asyncio.run(run())
+
+def test_reads_use_read_transactions():
+    def respond(query, params):
+        if "RETURN count(p) AS total" in query:
+            return [{"total": 3}]
+        if "RETURN p\n" in query:
+            return [{"p": paper(1)}, {"p": paper(0)}]
+        if "AS period" in query:
+            return [{"period": "2024", "count": 2}]
+        return []
+
+    async def run():
+        client, driver = make_client(respond)
+        papers = await client.get_papers_by_topic("graphs", 2023, 2024, limit=2, skip=4)
+        assert [p["id"] for p in papers] == ["2401.00001", "2401.00000"]
+        mode, query, params = driver.queries[-1]
+        assert mode == "read" and query.rstrip().endswith("LIMIT $limit")
+        assert params == {"topic": "graphs", "start_year": 2023, "end_year": 2024, "limit": 2, "skip": 4}
+
+        assert await client.count_papers_by_topic("graphs", 2023, 2024) == 3
+        assert await client.get_topic_timeline("graphs", 2023, 2024, granularity="month") == \
+            [{"period": "2024", "count": 2}]
+        assert driver.queries[-1][2]["length"] == 7
+        assert all(mode == "read" for mode, _, _ in driver.queries)
+    asyncio.run(run())
+
+def test_get_papers_by_titles_keeps_input_order():
+    def respond(query, params):
+        assert query == PAPERS_BY_TITLES_QUERY
+        return [{"index": 2, "id": "b", "title": "B"}, {"index": 0, "id": "a", "title": "A"}]
+
+    async def run():
+        client, driver = make_client(respond)
+        result = await client.get_papers_by_titles(["A", "missing", "B"])
+        assert [p["id"] for p in result["papers"]] == ["a", "b"]
+        assert result["missing"] == ["missing"]
+        assert "index" not in result["papers"][0]
+        # No titles, no round trip
+        assert await client.get_papers_by_titles([]) == {"papers": [], "missing": []}
+        assert driver.sessions == 1
+    asyncio.run(run())
+
+def test_topic_tagging_and_enrichment_lookups():
+    def respond(query, params):
+        if query == TAG_PAPERS_QUERY:
+            return [{"tagged": len(params["paper_ids"]) - 1}]
+        if query == ENRICHED_PAPER_IDS_QUERY:
+            return [{"id": params["paper_ids"][0]}]
+        return []
+
+    async def run():
+        client, driver = make_client(respond)
+        assert await client.tag_papers(["a", "b", "c"], "graphs") == 2
+        assert driver.queries[-1] == ("write", TAG_PAPERS_QUERY, {"paper_ids": ["a", "b", "c"], "topic": "graphs"})
+        assert await client.get_enriched_ids(["a", "b"]) == {"a"}
+        assert driver.queries[-1][0] == "read"
+        await client.update_paper_metadata("a", {"summary": "s"})
+        assert driver.queries[-1] == ("write", UPDATE_PAPER_METADATA_QUERY,
+                                      {"paper_id": "a", "metadata": {"summary": "s"}})
+        # Empty inputs are answered without opening a session
+        sessions = driver.sessions
+        assert await client.tag_papers([], "graphs") == 0
+        assert await client.get_enriched_ids([]) == set()
+        assert driver.sessions == sessions
+    asyncio.run(run())
+
+def test_related_papers():
+    def respond(query, params):
+        return [{"related": {"id": "b", "title": "B"}, "score": 0.5, "hops": 2}]
+
+    async def run():
+        client, driver = make_client(respond)
+        related = await client.get_related_papers("a", hops=2, limit=5)
+        assert related == [{"id": "b", "title": "B", "score": 0.5, "hops": 2}]
+        mode, _, params = driver.queries[-1]
+        assert mode == "read" and params["paper_id"] == "a" and params["limit"] == 5 and params["beam"] >= 5
+        try:
+            await client.get_related_papers("a", hops=10)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("hops above the maximum should be rejected")
+        await client.close()
+        assert driver.closed
+    asyncio.run(run())
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"{name}: ok")
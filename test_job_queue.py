@@ -0,0 +1,156 @@
+import asyncio
+import os
+import tempfile
+from backend.api.job_queue import JobQueue
+
+def make_path():
+    return os.path.join(tempfile.mkdtemp(), "jobs.sqlite3")
+
+async def wait_for_status(queue, job_id, status, timeout=2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while (job := await queue.get(job_id))["status"] != status:
+        if asyncio.get_running_loop().time() > deadline:
+            raise AssertionError(f"job stayed {job['status']}, expected {status}")
+        await asyncio.sleep(0.01)
+    return job
+
+def test_jobs_run_and_report_progress():
+    async def echo(payload, progress):
+        for step in range(4):
+            progress(step / 4)
+            await asyncio.sleep(0)
+        return {"echo": payload["value"]}
+
+    async def fail(payload, progress):
+        raise RuntimeError("model unavailable")
+
+    async def run():
+        queue = JobQueue(make_path(), {"echo": echo, "fail": fail})
+        queue.start()
+        done = await queue.submit("echo", {"value": 3})
+        failed = await queue.submit("fail", {})
+        await queue.queue.join()
+        job = await queue.get(done["id"])
+        assert job["status"] == "done" and job["progress"] == 1.0 and job["result"] == {"echo": 3}
+        job = await queue.get(failed["id"])
+        assert job["status"] == "failed" and job["error"] == "model unavailable"
+        assert await queue.get("missing") is None
+        try:
+            await queue.submit("unknown", {})
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("unknown job kinds should be rejected")
+        await queue.stop()
+        queue.close()
+    asyncio.run(run())
+
+def test_submit_dedupes_active_jobs():
+    release = None
+
+    async def slow(payload, progress):
+        await release.wait()
+        return payload
+
+    async def run():
+        nonlocal release
+        release = asyncio.Event()
+        queue = JobQueue(make_path(), {"review": slow})
+        queue.start()
+        first, second = await asyncio.gather(queue.submit("review", {"topic": "a"}, dedupe_key="a"),
+                                             queue.submit("review", {"topic": "a"}, dedupe_key="a"))
+        assert first["id"] == second["id"]
+        other = await queue.submit("review", {"topic": "b"}, dedupe_key="b")
+        assert other["id"] != first["id"]
+
+        release.set()
+        await queue.queue.join()
+        # A finished job no longer absorbs new submissions
+        again = await queue.submit("review", {"topic": "a"}, dedupe_key="a")
+        assert again["id"] != first["id"]
+        await queue.queue.join()
+        await queue.stop()
+        queue.close()
+    asyncio.run(run())
+
+def test_submit_rejects_when_full():
+    async def run():
+        queue = JobQueue(make_path(), {"review": lambda payload, progress: asyncio.sleep(0)}, max_pending=1)
+        # Not started, so nothing drains the queue
+        queue.queue = asyncio.Queue()
+        await queue.submit("review", {})
+        try:
+            await queue.submit("review", {})
+        except RuntimeError:
+            pass
+        else:
+            raise AssertionError("a full queue should reject new jobs")
+        queue.close()
+    asyncio.run(run())
+
+def test_cancel_running_and_queued_jobs():
+    started = None
+
+    async def forever(payload, progress):
+        started.set()
+        await asyncio.Event().wait()
+
+    async def run():
+        nonlocal started
+        started = asyncio.Event()
+        queue = JobQueue(make_path(), {"review": forever}, workers=1)
+        queue.start()
+        running = await queue.submit("review", {})
+        queued = await queue.submit("review", {})
+        await started.wait()
+
+        assert (await queue.cancel(queued["id"]))["status"] == "cancelled"
+        assert (await queue.cancel(running["id"]))["status"] == "cancelled"
+        await queue.queue.join()
+        assert (await queue.get(running["id"]))["status"] == "cancelled"
+        # Cancelling a finished job leaves it as it is
+        assert (await queue.cancel(running["id"]))["status"] == "cancelled"
+        assert await queue.cancel("missing") is None
+        await queue.stop()
+        queue.close()
+    asyncio.run(run())
+
+def test_interrupted_jobs_resume_after_restart():
+    path = make_path()
+    started = None
+
+    async def forever(payload, progress):
+        started.set()
+        await asyncio.Event().wait()
+
+    async def finish(payload, progress):
+        return {"resumed": payload["topic"]}
+
+    async def first_run():
+        nonlocal started
+        started = asyncio.Event()
+        queue = JobQueue(path, {"review": forever})
+        queue.start()
+        job = await queue.submit("review", {"topic": "graphs"}, dedupe_key="graphs")
+        await started.wait()
+        # Stopping the workers is not a cancellation: the job stays active
+        await queue.stop()
+        assert (await queue.get(job["id"]))["status"] == "running"
+        queue.close()
+        return job["id"]
+
+    async def second_run(job_id):
+        queue = JobQueue(path, {"review": finish})
+        queue.start()
+        job = await wait_for_status(queue, job_id, "done")
+        assert job["result"] == {"resumed": "graphs"}
+        await queue.stop()
+        queue.close()
+
+    asyncio.run(second_run(asyncio.run(first_run())))
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"{name}: ok")
@@ -1,5 +1,5 @@
 import asyncio
-from Backend.models.llm_manager import LLMManager  # Adjust import as per your directory
+from backend.models.llm_manager import LLMManager  # Adjust import as per your directory
 
 async def main():
     llm_manager = LLMManager(model_name="mistral:latest")
@@ -0,0 +1,123 @@
+import asyncio
+import socket
+from benchmarks.fakes import FakeOllamaServer
+from backend.models.llm_router import LLMRouter
+
+MODEL = "mistral:latest"
+
+def dead_host():
+    # A port nothing listens on, so connections are refused straight away
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return f"http://127.0.0.1:{sock.getsockname()[1]}"
+
+def test_least_outstanding_spreads_concurrent_calls():
+    async def run(servers):
+        router = LLMRouter([server.url for server in servers])
+        responses = await asyncio.gather(*(router.generate(model=MODEL, prompt=f"prompt {i}") for i in range(6)))
+        assert all(response["response"] for response in responses)
+        assert [server.requests for server in servers] == [3, 3]
+        assert all(backend.outstanding == 0 for backend in router.backends)
+
+        # A busier backend is passed over
+        router.backends[0].outstanding = 2
+        assert router.pick() is router.backends[1]
+        assert router.pick(exclude=[router.backends[1]]) is router.backends[0]
+
+    with FakeOllamaServer(first_token_latency=0.1) as first, FakeOllamaServer(first_token_latency=0.1) as second:
+        asyncio.run(run([first, second]))
+
+def test_failed_backend_is_retried_elsewhere_and_ejected():
+    async def run(server):
+        router = LLMRouter([dead_host(), server.url], max_failures=2, eject_seconds=60)
+        dead = router.backends[0]
+        for i in range(10):
+            response = await router.generate(model=MODEL, prompt=f"prompt {i}")
+            assert response["response"]
+            if not dead.available:
+                break
+        assert not dead.available and dead.failures == 2
+        # Once ejected the dead host is no longer tried first
+        requests = server.requests
+        for i in range(3):
+            await router.generate(model=MODEL, prompt="after")
+        assert server.requests == requests + 3 and dead.failures == 2
+        assert all(backend.outstanding == 0 for backend in router.backends)
+
+    with FakeOllamaServer(first_token_latency=0.0) as server:
+        asyncio.run(run(server))
+
+def test_all_backends_failing_raises():
+    async def run():
+        router = LLMRouter([dead_host(), dead_host()])
+        try:
+            await router.generate(model=MODEL, prompt="prompt")
+        except Exception as e:
+            assert all(backend.failures == 1 for backend in router.backends), e
+        else:
+            raise AssertionError("a call no backend could serve should raise")
+    asyncio.run(run())
+
+def test_affinity_sticks_to_the_previous_backend():
+    async def run(servers):
+        router = LLMRouter([server.url for server in servers])
+        for i in range(4):
+            await router.generate(model=MODEL, prompt=f"turn {i}", affinity="session")
+        counts = sorted(server.requests for server in servers)
+        assert counts == [0, 4]
+
+        # When its backend is ejected the session moves, and stays on the new one
+        used = router._affinity["session"]
+        used.ejected_until = float("inf")
+        for i in range(2):
+            await router.generate(model=MODEL, prompt=f"moved {i}", affinity="session")
+        assert router._affinity["session"] is not used
+        assert sorted(server.requests for server in servers) == [2, 4]
+
+    with FakeOllamaServer(first_token_latency=0.0) as first, FakeOllamaServer(first_token_latency=0.0) as second:
+        asyncio.run(run([first, second]))
+
+def test_stream_keeps_backend_busy_until_done():
+    async def run(server):
+        router = LLMRouter([server.url])
+        backend = router.backends[0]
+        chunks = await router.generate(model=MODEL, prompt="stream me", stream=True)
+        assert backend.outstanding == 1
+        text = []
+        async for chunk in chunks:
+            text.append(chunk["response"])
+            if chunk["done"]:
+                assert "context" in chunk
+        assert "".join(text) and backend.outstanding == 0
+
+        # Abandoning a stream early also releases the backend
+        chunks = await router.generate(model=MODEL, prompt="stream me", stream=True)
+        await chunks.__anext__()
+        await chunks.aclose()
+        assert backend.outstanding == 0
+
+    with FakeOllamaServer(first_token_latency=0.0, tokens_per_second=1000) as server:
+        asyncio.run(run(server))
+
+def test_warm_up_ejects_backends_that_fail():
+    async def run(server):
+        router = LLMRouter([dead_host(), server.url])
+        warm = await router.warm_up([MODEL], keep_alive="5m", timeout=5)
+        assert warm == [router.backends[1]]
+        assert not router.backends[0].available and router.backends[1].available
+
+        try:
+            await LLMRouter([dead_host()]).warm_up([MODEL], timeout=5)
+        except Exception:
+            pass
+        else:
+            raise AssertionError("warm-up with no reachable backend should raise")
+
+    with FakeOllamaServer(first_token_latency=0.0) as server:
+        asyncio.run(run(server))
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"{name}: ok")
@@ -0,0 +1,117 @@
+import asyncio
+import time
+from backend.database.paper_cache import CachedNeo4jClient, PaperCache
+
+def paper(index, topic="graphs"):
+    return {"id": f"2401.{index:05d}", "title": f"Paper {index}", "authors": ["A. Author"],
+            "abstract": "Graph neural networks", "published_date": f"2024-01-{index + 1:02d}",
+            "url": f"http://arxiv.org/pdf/2401.{index:05d}", "topic": topic}
+
+# Database client stand-in that counts round trips
+class CountingClient:
+    def __init__(self, papers):
+        self.papers = {p["id"]: dict(p) for p in papers}
+        self.calls = []
+
+    async def get_papers_by_topic(self, topic, start_year, end_year, limit=None, skip=0):
+        self.calls.append("topic")
+        return [dict(p) for p in self.papers.values() if p["topic"] == topic][skip:][:limit]
+
+    async def get_papers_by_titles(self, titles):
+        self.calls.append(("titles", tuple(titles)))
+        by_title = {p["title"]: p for p in self.papers.values()}
+        found = [dict(by_title.get(title) or self.papers[title]) for title in titles
+                 if title in by_title or title in self.papers]
+        return {"papers": found, "missing": [t for t in titles if t not in by_title and t not in self.papers]}
+
+    async def add_papers(self, papers, batch_size=None):
+        for p in papers:
+            self.papers[p["id"]] = dict(p)
+        return len(papers)
+
+    async def tag_papers(self, paper_ids, topic):
+        for paper_id in paper_ids:
+            self.papers[paper_id]["topic"] = topic
+        return len(paper_ids)
+
+    async def update_paper_metadata(self, paper_id, metadata):
+        self.papers[paper_id].update(metadata)
+
+    async def close(self):
+        pass
+
+def test_entries_are_copies_and_lru_bounded():
+    cache = PaperCache()
+    stored = cache.set(("title", "Paper 1"), [paper(1)])
+    first = stored[0].to_dict()
+    first["authors"].append("mutated")
+    assert cache.get(("title", "Paper 1"))[0].to_dict()["authors"] == ["A. Author"]
+
+    # A budget of roughly two entries keeps only the most recently used ones
+    small = PaperCache(max_bytes=stored[0].nbytes * 2 + 400)
+    small.set("a", [paper(1)])
+    small.set("b", [paper(2)])
+    small.get("a")
+    small.set("c", [paper(3)])
+    assert small.get("b") is None and small.get("a") is not None and small.get("c") is not None
+    assert small.stats()["evictions"] == 1
+
+def test_stale_generation_is_not_stored():
+    cache = PaperCache()
+    generation = cache.generation
+    # A write lands while the read that started before it is still in flight
+    cache.invalidate_paper("2401.00001")
+    cache.set(("title", "Paper 1"), [paper(1)], generation=generation)
+    assert cache.get(("title", "Paper 1")) is None
+    cache.set(("title", "Paper 1"), [paper(1)], generation=cache.generation)
+    assert cache.get(("title", "Paper 1")) is not None
+
+def test_entries_expire_after_ttl():
+    cache = PaperCache(ttl=0.05)
+    cache.set(("title", "Paper 1"), [paper(1)])
+    assert cache.get(("title", "Paper 1")) is not None
+    time.sleep(0.1)
+    assert cache.get(("title", "Paper 1")) is None
+    stats = cache.stats()
+    assert stats["expirations"] == 1 and stats["entries"] == 0 and stats["bytes"] == 0
+
+def test_reads_are_cached_and_writes_invalidate():
+    async def run():
+        db = CountingClient([paper(1), paper(2), paper(3, topic="vision")])
+        client = CachedNeo4jClient(db, PaperCache())
+
+        first = await client.get_papers_by_topic("graphs", 2023, 2024)
+        assert [p["id"] for p in first] == ["2401.00001", "2401.00002"]
+        await client.get_papers_by_topic("graphs", 2023, 2024)
+        assert db.calls == ["topic"]
+
+        # Only titles not cached yet go to the database, in one round trip
+        await client.get_papers_by_titles(["Paper 1"])
+        result = await client.get_papers_by_titles(["Paper 2", "Paper 1", "Unknown"])
+        assert [p["id"] for p in result["papers"]] == ["2401.00002", "2401.00001"]
+        assert result["missing"] == ["Unknown"]
+        assert db.calls[-1] == ("titles", ("Paper 2", "Unknown"))
+
+        # A new paper on the topic drops the topic query but not unrelated title lookups
+        await client.add_papers([paper(4)])
+        calls = len(db.calls)
+        assert len(await client.get_papers_by_topic("graphs", 2023, 2024)) == 3
+        await client.get_papers_by_titles(["Paper 1"])
+        assert len(db.calls) == calls + 1
+
+        # Tagging invalidates the target topic; metadata updates invalidate the paper
+        await client.tag_papers(["2401.00003"], "graphs")
+        assert len(await client.get_papers_by_topic("graphs", 2023, 2024)) == 4
+        await client.update_paper_metadata("2401.00001", {"summary": "updated"})
+        result = await client.get_papers_by_titles(["Paper 1"])
+        assert result["papers"][0]["summary"] == "updated"
+
+        await client.close()
+        assert len(client.cache) == 0
+    asyncio.run(run())
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"{name}: ok")
@@ -0,0 +1,95 @@
+import asyncio
+import os
+import sqlite3
+import tempfile
+import time
+from backend.models.response_cache import ResponseCache
+
+def make_cache(**kwargs):
+    directory = tempfile.mkdtemp()
+    return ResponseCache(os.path.join(directory, "responses.sqlite3"), **kwargs)
+
+def disk_keys(cache):
+    with sqlite3.connect(cache.path) as conn:
+        return {row[0] for row in conn.execute("SELECT key FROM responses")}
+
+def test_make_key_covers_model_prompt_and_options():
+    key = ResponseCache.make_key("mistral", "prompt", {"temperature": 0})
+    assert key == ResponseCache.make_key("mistral", "prompt", {"temperature": 0})
+    assert key != ResponseCache.make_key("phi3", "prompt", {"temperature": 0})
+    assert key != ResponseCache.make_key("mistral", "prompt", {"temperature": 1})
+    assert ResponseCache.make_key("mistral", "prompt") == ResponseCache.make_key("mistral", "prompt", {})
+
+def test_memory_tier_is_lru():
+    cache = ResponseCache(max_memory_entries=2)
+    cache.set("a", "A")
+    cache.set("b", "B")
+    assert cache.get("a") == "A"
+    cache.set("c", "C")
+    # "b" was the least recently used entry
+    assert cache.get("b") is None
+    assert cache.get("a") == "A" and cache.get("c") == "C"
+    stats = cache.stats()
+    assert stats["memory_entries"] == 2 and stats["memory_hits"] == 3 and stats["misses"] == 1
+
+def test_entries_expire_after_ttl():
+    cache = make_cache(ttl=0.05)
+    cache.set("a", "A")
+    assert cache.get("a") == "A"
+    time.sleep(0.1)
+    assert cache.get("a") is None
+    # The expired row is deleted from disk as well, and the count follows
+    assert disk_keys(cache) == set()
+    assert cache.stats()["disk_entries"] == 0
+    cache.close()
+
+def test_disk_tier_survives_restart_and_backs_memory():
+    cache = make_cache(max_memory_entries=1)
+    cache.set("a", "A")
+    cache.set("b", "B")
+    # "a" fell out of memory but is still on disk
+    assert cache.get("a") == "A"
+    assert cache.stats()["disk_hits"] == 1
+    cache.close()
+
+    reopened = ResponseCache(cache.path, max_memory_entries=4)
+    assert reopened.stats()["disk_entries"] == 2
+    assert reopened.preload() == 2
+    assert reopened.get("b") == "B" and reopened.stats()["memory_hits"] == 1
+    reopened.close()
+
+def test_disk_eviction_drops_least_recently_used():
+    cache = make_cache(max_memory_entries=1, max_disk_entries=3)
+    for key in "abc":
+        cache.set(key, key.upper())
+        time.sleep(0.01)
+    # Reading "a" from disk makes it recently used; the access is written with the next insert
+    assert cache.get("a") == "A"
+    time.sleep(0.01)
+    cache.set("d", "D")
+    assert disk_keys(cache) == {"a", "c", "d"}
+    assert cache.stats()["disk_entries"] == 3
+    # Replacing an existing key does not change the count
+    cache.set("d", "D2")
+    assert cache.stats()["disk_entries"] == 3 and len(disk_keys(cache)) == 3
+    cache.close()
+
+def test_async_get_and_set():
+    async def run():
+        cache = make_cache(max_memory_entries=1)
+        await cache.aset("a", "A")
+        await cache.aset("b", "B")
+        assert await cache.aget("a") == "A"
+        assert await cache.aget("missing") is None
+        stats = cache.stats()
+        assert stats["disk_hits"] == 1 and stats["misses"] == 1
+        cache.clear()
+        assert await cache.aget("b") is None and cache.stats()["disk_entries"] == 0
+        cache.close()
+    asyncio.run(run())
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"{name}: ok")
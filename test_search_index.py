@@ -0,0 +1,88 @@
+import asyncio
+import os
+import tempfile
+from backend.database.search_index import BM25Index, tokenize
+
+def paper(index, title, abstract, year=2024):
+    return {"id": f"2401.{index:05d}", "title": title, "abstract": abstract, "authors": ["A. Author"],
+            "published_date": f"{year}-01-01", "url": f"http://arxiv.org/pdf/2401.{index:05d}"}
+
+PAPERS = [
+    paper(1, "Graph neural networks for molecules", "Message passing over molecular graphs."),
+    paper(2, "Reinforcement learning for robotics", "Policy gradients on real robots.", year=2021),
+    paper(3, "Scaling graph learning", "Sampling subgraphs to train large graph models."),
+    paper(4, "Learning rate schedules", "Warmup and decay for deep learning.", year=2019),
+]
+
+def make_index(**kwargs):
+    index = BM25Index(**kwargs)
+    index.add_papers(PAPERS)
+    return index
+
+def test_tokenize_drops_stopwords_and_punctuation():
+    assert tokenize("The Graph-based model, for 3D data!") == ["graph", "model", "3d", "data"]
+
+def test_search_ranks_and_filters_by_year():
+    index = make_index()
+    results = index.search("graph neural networks")
+    assert [r["id"] for r in results][:2] == ["2401.00001", "2401.00003"]
+    assert results[0]["score"] > results[1]["score"]
+    # Title matches weigh more than the same term in an abstract
+    assert index.search("molecules")[0]["id"] == "2401.00001"
+    assert [r["id"] for r in index.search("learning", start_year=2020, end_year=2022)] == ["2401.00002"]
+    assert index.search("learning", limit=1)[0]["id"] in {p["id"] for p in PAPERS}
+    assert index.search("quantum chromodynamics") == []
+
+def test_min_term_share_drops_incidental_matches():
+    index = make_index()
+    # Three papers mention "learning"; only one also mentions "reinforcement"
+    assert len(index.search("reinforcement learning")) == 3
+    assert [r["id"] for r in index.search("reinforcement learning", min_term_share=0.6)] == ["2401.00002"]
+    assert index.search("reinforcement quantum physics", min_term_share=0.6) == []
+
+def test_re_adding_a_paper_replaces_it():
+    index = make_index()
+    index.add_papers([paper(1, "Protein folding", "Structure prediction.")])
+    assert len(index) == len(PAPERS)
+    assert [r["id"] for r in index.search("molecules")] == []
+    assert index.search("protein")[0]["id"] == "2401.00001"
+    assert index.add_papers([{"abstract": "no key"}]) == 0
+
+def test_more_like_this_excludes_the_paper_itself():
+    index = make_index()
+    similar = index.more_like_this("2401.00001", limit=2)
+    assert similar and similar[0]["id"] == "2401.00003"
+    assert "2401.00001" not in {r["id"] for r in similar}
+    assert index.more_like_this("missing") == []
+
+def test_save_and_deferred_load():
+    path = os.path.join(tempfile.mkdtemp(), "search_index.pkl")
+    index = make_index(path=path)
+    index.save()
+
+    deferred = BM25Index(path, load=False)
+    assert len(deferred) == 0
+    # Papers added before the load are kept, and a save before it never truncates the file
+    deferred.add_papers([paper(5, "Diffusion models", "Denoising score matching.")])
+    deferred.save()
+    assert len(BM25Index(path)) == len(PAPERS)
+    assert deferred.preload() == len(PAPERS) + 1
+    assert deferred.search("diffusion")[0]["id"] == "2401.00005"
+    deferred.save()
+    assert len(BM25Index(path)) == len(PAPERS) + 1
+
+def test_asearch_matches_search():
+    async def run():
+        index = make_index()
+        assert await index.asearch("graph learning", min_term_share=0.5) == \
+            index.search("graph learning", min_term_share=0.5)
+        # Large indexes are searched in a worker thread with the same result
+        index.INLINE_SEARCH_DOCS = 0
+        assert await index.asearch("graph learning", limit=2) == index.search("graph learning", limit=2)
+    asyncio.run(run())
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"{name}: ok")